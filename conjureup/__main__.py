@@ -1,3 +1,3 @@
-from app import main
+from conjureup.app import main
 
 main()
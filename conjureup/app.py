@@ -14,8 +14,6 @@ import textwrap
 import uuid
 
 import raven
-import yaml
-from juju.model import CharmStore
 from kv import KV
 from prettytable import PrettyTable
 from raven.transport.requests import RequestsHTTPTransport
@@ -24,7 +22,21 @@ from ubuntui.ev import EventLoop
 from ubuntui.palette import STYLES
 
 from conjureup import __version__ as VERSION
-from conjureup import charm, consts, controllers, errors, events, juju, utils
+from conjureup import (
+    charm,
+    checkpoint,
+    consts,
+    controllers,
+    errors,
+    events,
+    fleet,
+    juju,
+    log,
+    plan,
+    registry,
+    utils,
+    yamlio
+)
 from conjureup.app_config import app
 from conjureup.download import (
     EndpointType,
@@ -32,9 +44,9 @@ from conjureup.download import (
     download,
     download_local,
     download_or_sync_registry,
+    download_registry_spell,
     get_remote_url
 )
-from conjureup.log import setup_logging
 from conjureup.models.addon import AddonModel
 from conjureup.models.conjurefile import Conjurefile
 from conjureup.models.provider import load_schema
@@ -54,6 +66,13 @@ def parse_options(argv):
     parser.add_argument('-d', '--debug', action='store_true',
                         dest='debug', default=False,
                         help='Enable debug logging.')
+    parser.add_argument('--log-level', dest='log_level',
+                        choices=log.LOG_LEVELS,
+                        help='Level of the records logged, overriding '
+                        '--debug.')
+    parser.add_argument('--log-format', dest='log_format',
+                        choices=log.LOG_FORMATS, default='text',
+                        help='Write the log as text, or as JSON lines.')
     parser.add_argument('--show-env', action='store_true',
                         dest='show_env',
                         help='Shows what environment variables are used '
@@ -126,10 +145,35 @@ def parse_options(argv):
     parser.add_argument('--bundle-remove', type=pathlib.Path,
                         help="Path to a bundle fragment file which will be "
                              "subtracted from the spell's bundle")
+    parser.add_argument('--addon', dest='selected_addons', action='append',
+                        metavar='ADDON',
+                        help="Deploy this addon of the spell with it, "
+                        "rather than picking addons. Can be given "
+                        "multiple times.")
     parser.add_argument('--gen-config', action='store_true',
                         dest='gen_config',
                         help='Prints a skeleton Conjurefile to stdout')
 
+    parser.add_argument('--resume', action='store_true', dest='resume',
+                        help='Continue the last headless run of this spell, '
+                        'reusing its controller and model and skipping '
+                        'work it already completed.')
+    parser.add_argument('--plan', action='store_true', dest='plan',
+                        help='Print what a headless run would deploy and '
+                        'run, without contacting any controller.')
+    parser.add_argument('--fleet', dest='fleet', action='append',
+                        metavar='TARGET',
+                        help='Deploy the spell to this target as part of a '
+                        'fleet, either a path to a Conjurefile or '
+                        '<cloud>[/<region>][:<controller>[:<model>]]. '
+                        'Can be given multiple times; targets are deployed '
+                        'concurrently and headless.')
+    parser.add_argument('--fleet-jobs', dest='fleet_jobs',
+                        type=utils.positive_int,
+                        default=4,
+                        help='Number of fleet targets to deploy at the '
+                        'same time.')
+
     # Channels
     parser.add_argument('--channel', type=str,
                         choices=charm.CHANNELS,
@@ -185,6 +229,60 @@ def apply_proxy():
         os.environ['https_proxy'] = app.conjurefile['https-proxy']
 
 
+def setup_provider():
+    """ Loads the provider for the cloud[/region] given in the conjurefile
+    """
+    cloud = None
+    region = None
+    if '/' in app.conjurefile['cloud']:
+        parse_cli_cloud = app.conjurefile['cloud'].split('/')
+        cloud, region = parse_cli_cloud
+        app.log.debug(
+            "Region found {} for cloud {}".format(cloud, region))
+    else:
+        cloud = app.conjurefile['cloud']
+
+    cloud_types = juju.get_cloud_types_by_name()
+    if cloud not in cloud_types:
+        utils.error('Unknown cloud: {}'.format(cloud))
+        sys.exit(1)
+
+    app.provider = load_schema(cloud_types[cloud])
+
+    try:
+        app.provider.load(cloud)
+    except errors.SchemaCloudError as e:
+        utils.error(e)
+        sys.exit(1)
+
+    if region:
+        app.provider.region = region
+
+
+def resume_last_run():
+    """ Points a resumed run at the controller and model of the last run
+    """
+    last = checkpoint.target()
+    if last is None:
+        utils.warning("No previous run of {} to resume, starting a new "
+                      "one.".format(app.config['spell']))
+        return
+    if last['cloud'] != app.provider.cloud:
+        utils.error("The last run of {} was on {}, not {}.".format(
+            app.config['spell'], last['cloud'], app.provider.cloud))
+        sys.exit(1)
+    for key in ['controller', 'model']:
+        if app.conjurefile[key] and app.conjurefile[key] != last[key]:
+            utils.error("The last run of {} used {} {}, not {}.".format(
+                app.config['spell'], key, last[key], app.conjurefile[key]))
+            sys.exit(1)
+        app.conjurefile[key] = last[key]
+    if last['region'] and not app.provider.region:
+        app.provider.region = last['region']
+    utils.info("Resuming deployment to {}:{}".format(last['controller'],
+                                                     last['model']))
+
+
 def show_env():
     """ Shows environment variables from post deploy actions
     """
@@ -252,10 +350,10 @@ def main():
 
     try:
         app.conjurefile = Conjurefile.load(opts.conf_file)
+        app.conjurefile.merge_argv(opts, opt_defaults)
     except ValueError as e:
         print(str(e))
         sys.exit(1)
-    app.conjurefile.merge_argv(opts, opt_defaults)
 
     if app.conjurefile['gen-config']:
         Conjurefile.print_tpl()
@@ -274,15 +372,24 @@ def main():
     app.env['KV_DB'] = kv_db
     app.config = {'metadata': None}
 
-    app.log = setup_logging(app,
-                            os.path.join(app.conjurefile['cache-dir'],
-                                         'conjure-up.log'),
-                            app.conjurefile.get('debug', False))
+    app.log = log.setup_logging(app,
+                                os.path.join(app.conjurefile['cache-dir'],
+                                             'conjure-up.log'),
+                                app.conjurefile.get('debug', False),
+                                app.conjurefile['log-level'],
+                                app.conjurefile['log-format'])
 
     # Make sure juju paths are setup
     juju.set_bin_path()
     juju.set_wait_path()
 
+    # Load clouds, regions and credentials while the spell is prepared,
+    # for the cloud picker. Runs given a cloud, plans and fleets (whose
+    # targets run in their own process) only load what they use.
+    if not (app.conjurefile.is_valid or app.conjurefile['plan'] or
+            app.conjurefile['fleet']):
+        juju.catalogue.preload()
+
     app.no_track = app.conjurefile['no-track']
     app.no_report = app.conjurefile['no-report']
 
@@ -326,14 +433,19 @@ def main():
                 "{}".format(spells_dir))
             sys.exit(1)
 
-    with open(spells_index_path) as fp:
-        app.spells_index = yaml.safe_load(fp.read())
+    app.registry = registry.load_index(spells_dir)
+    if app.registry is not None:
+        app.spells_index = app.registry.spells_index
+        app.addons_aliases = app.registry.addons_aliases
+    else:
+        with open(spells_index_path) as fp:
+            app.spells_index = yamlio.load(fp)
 
-    addons_aliases_index_path = os.path.join(app.config['spells-dir'],
-                                             'addons-aliases.yaml')
-    if os.path.exists(addons_aliases_index_path):
-        with open(addons_aliases_index_path) as fp:
-            app.addons_aliases = yaml.safe_load(fp.read())
+        addons_aliases_index_path = os.path.join(app.config['spells-dir'],
+                                                 'addons-aliases.yaml')
+        if os.path.exists(addons_aliases_index_path):
+            with open(addons_aliases_index_path) as fp:
+                app.addons_aliases = yamlio.load(fp)
 
     spell_name = spell
     app.endpoint_type = detect_endpoint(app.conjurefile['spell'])
@@ -348,9 +460,7 @@ def main():
         utils.set_chosen_spell(addon['spell'],
                                os.path.join(app.conjurefile['cache-dir'],
                                             addon['spell']))
-        download_local(os.path.join(app.config['spells-dir'],
-                                    addon['spell']),
-                       app.config['spell-dir'])
+        download_registry_spell(addon['spell'], app.config['spell-dir'])
         utils.set_spell_metadata()
         StepModel.load_spell_steps()
         AddonModel.load_spell_addons()
@@ -361,16 +471,23 @@ def main():
 
     elif app.endpoint_type == EndpointType.LOCAL_SEARCH:
         spells = utils.find_spells_matching(app.conjurefile['spell'])
-
+        suggestions = []
         if len(spells) == 0:
+            suggestions = utils.search_spells(app.conjurefile['spell'])
+
+        if len(spells) == 0 and (len(suggestions) == 0 or
+                                 app.conjurefile.is_valid):
             utils.error("Can't find a spell matching '{}'".format(
                 app.conjurefile['spell']))
+            if suggestions:
+                utils.info("Did you mean: {}".format(
+                    ', '.join(spell['key'] for _, spell in suggestions)))
             sys.exit(1)
 
         # One result means it was a direct match and we can copy it
         # now. Changing the endpoint type then stops us from showing
-        # the picker UI. More than one result means we need to show
-        # the picker UI and will defer the copy to
+        # the picker UI. More than one result, or only partial matches,
+        # means we need to show the picker UI and will defer the copy to
         # SpellPickerController.finish(), so nothing to do here.
         if len(spells) == 1:
             app.log.debug("found spell {}".format(spells[0][1]))
@@ -378,9 +495,7 @@ def main():
             utils.set_chosen_spell(spell_name,
                                    os.path.join(app.conjurefile['cache-dir'],
                                                 spell['key']))
-            download_local(os.path.join(app.config['spells-dir'],
-                                        spell['key']),
-                           app.config['spell-dir'])
+            download_registry_spell(spell['key'], app.config['spell-dir'])
             utils.set_spell_metadata()
             StepModel.load_spell_steps()
             AddonModel.load_spell_addons()
@@ -426,6 +541,16 @@ def main():
         StepModel.load_spell_steps()
         AddonModel.load_spell_addons()
 
+    if app.conjurefile['selected-addons'] and \
+            app.endpoint_type not in [None, EndpointType.LOCAL_SEARCH]:
+        unknown = sorted(set(app.conjurefile['selected-addons']) -
+                         set(app.addons))
+        if unknown:
+            utils.error("Unknown addon(s) for {}: {}".format(
+                app.config['spell'], ', '.join(unknown)))
+            sys.exit(1)
+        app.selected_addons = list(app.conjurefile['selected-addons'])
+
     app.env['CONJURE_UP_CACHEDIR'] = app.conjurefile['cache-dir']
     app.env['PATH'] = "/snap/bin:{}".format(app.env['PATH'])
 
@@ -436,6 +561,31 @@ def main():
 
         show_env()
 
+    if app.conjurefile['plan']:
+        if app.endpoint_type in [None, EndpointType.LOCAL_SEARCH]:
+            utils.error("Please specify a spell to plan.")
+            sys.exit(1)
+
+        if app.conjurefile.is_valid:
+            setup_provider()
+        sys.exit(plan.main())
+
+    if app.conjurefile['fleet']:
+        if app.endpoint_type in [None, EndpointType.LOCAL_SEARCH]:
+            utils.error("Please specify a spell for fleet mode.")
+            sys.exit(1)
+
+        sys.exit(fleet.main(app.conjurefile['fleet'],
+                            app.conjurefile['fleet-jobs']))
+
+    if app.conjurefile['resume']:
+        if not app.conjurefile.is_valid:
+            utils.error("Only headless runs can be resumed, please "
+                        "specify a cloud.")
+            sys.exit(1)
+    elif 'spell' in app.config:
+        checkpoint.clear()
+
     app.sentry = raven.Client(
         dsn=SENTRY_DSN,
         release=VERSION,
@@ -449,39 +599,17 @@ def main():
     app.loop.add_signal_handler(signal.SIGINT, events.Shutdown.set)
 
     # Enable charmstore querying
-    app.juju.charmstore = CharmStore(app.loop)
+    app.juju.charmstore = charm.CachingCharmStore(app.loop)
     try:
         if app.conjurefile.is_valid:
-            cloud = None
-            region = None
-            if '/' in app.conjurefile['cloud']:
-                parse_cli_cloud = app.conjurefile['cloud'].split('/')
-                cloud, region = parse_cli_cloud
-                app.log.debug(
-                    "Region found {} for cloud {}".format(cloud,
-                                                          region))
-            else:
-                cloud = app.conjurefile['cloud']
-
-            cloud_types = juju.get_cloud_types_by_name()
-            if cloud not in cloud_types:
-                utils.error('Unknown cloud: {}'.format(cloud))
-                sys.exit(1)
+            setup_provider()
 
             if app.endpoint_type in [None, EndpointType.LOCAL_SEARCH]:
                 utils.error("Please specify a spell for headless mode.")
                 sys.exit(1)
 
-            app.provider = load_schema(cloud_types[cloud])
-
-            try:
-                app.provider.load(cloud)
-            except errors.SchemaCloudError as e:
-                utils.error(e)
-                sys.exit(1)
-
-            if region:
-                app.provider.region = region
+            if app.conjurefile['resume']:
+                resume_last_run()
 
             app.headless = True
             app.ui = None
@@ -125,6 +125,12 @@ class AppConfig:
     # Spells index
     spells_index = None
 
+    # Search index over the spells index (see spellsearch.py)
+    spells_search = None
+
+    # Compiled spells registry (see registry.py)
+    registry = None
+
     # Password for sudo, if needed
     sudo_pass = None
 
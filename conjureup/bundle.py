@@ -5,8 +5,7 @@ spec
 from collections import Mapping
 from itertools import chain
 
-import yaml
-
+from conjureup import yamlio
 from conjureup.consts import spell_types
 
 
@@ -172,8 +171,12 @@ class Bundle(dict):
     def to_yaml(self):
         """ Returns yaml dump of bundle
         """
-        return yaml.dump(self.to_dict(),
-                         default_flow_style=False)
+        return yamlio.dump(self.to_dict())
+
+    def dump(self, path):
+        """ Writes the bundle to path as yaml, as it is emitted
+        """
+        yamlio.dump_file(self.to_dict(), path)
 
     def to_dict(self):
         """ Returns dictionary representation
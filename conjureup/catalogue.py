@@ -0,0 +1,155 @@
+""" Cloud catalogue
+
+Keeps the clouds, regions and credentials known to the local juju client
+in a single in-memory index. Everything is loaded concurrently in the
+background as soon as conjure-up starts, so the clouds, credentials and
+regions screens read from memory instead of forking juju each time.
+"""
+
+import copy
+import threading
+from concurrent.futures import Future
+
+# Number of juju commands run at the same time while preloading
+CATALOGUE_WORKERS = 4
+# Cloud types that have no regions to pick from
+REGIONLESS_CLOUD_TYPES = ['localhost', 'lxd', 'maas', 'manual']
+
+
+class CloudCatalogue:
+    """ In-memory index of clouds, their regions and credentials
+
+    Arguments:
+    load_clouds: callable returning the list-clouds output
+    load_credentials: callable returning the credentials by cloud
+    load_regions: callable returning the regions of a single cloud
+
+    Every accessor blocks until the data it needs has been loaded, loading
+    it right away if preload() wasn't called, and hands out a copy that
+    callers are free to modify. Failed loads aren't cached.
+    """
+
+    def __init__(self, load_clouds, load_credentials, load_regions,
+                 workers=CATALOGUE_WORKERS):
+        self._load_clouds = load_clouds
+        self._load_credentials = load_credentials
+        self._load_regions = load_regions
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.RLock()
+        self._clouds = None
+        self._credentials = None
+        self._regions = {}
+
+    def _submit(self, fn, *args):
+        """ Runs fn in the background, at most workers at a time
+
+        The threads are daemons rather than those of a ThreadPoolExecutor,
+        which are joined at exit: a run that ends early must not wait for
+        juju commands whose output nobody will read.
+        """
+        future = Future()
+
+        def run():
+            with self._slots:
+                if not future.set_running_or_notify_cancel():
+                    return
+                try:
+                    result = fn(*args)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+
+        threading.Thread(target=run, daemon=True).start()
+        return future
+
+    def _clouds_future(self):
+        with self._lock:
+            if self._clouds is None:
+                self._clouds = self._submit(self._load_clouds)
+            return self._clouds
+
+    def _credentials_future(self):
+        with self._lock:
+            if self._credentials is None:
+                self._credentials = self._submit(self._load_credentials)
+            return self._credentials
+
+    def _regions_future(self, cloud, info=None):
+        with self._lock:
+            if cloud not in self._regions:
+                self._regions[cloud] = self._submit(self._find_regions,
+                                                    cloud, info)
+            return self._regions[cloud]
+
+    def _find_regions(self, cloud, info=None):
+        if info is None:
+            info = self._clouds_future().result().get(cloud, {})
+        if 'regions' in info:
+            # list-clouds already told us
+            return info['regions'] or {}
+        if info.get('type') in REGIONLESS_CLOUD_TYPES:
+            return {}
+        return self._load_regions(cloud)
+
+    def _preload_regions(self, clouds_future):
+        if clouds_future.exception() is not None:
+            return
+        for cloud, info in clouds_future.result().items():
+            self._regions_future(cloud, info)
+
+    def _result(self, future, forget):
+        try:
+            return copy.deepcopy(future.result())
+        except Exception:
+            with self._lock:
+                forget()
+            raise
+
+    def preload(self):
+        """ Starts loading the clouds, the regions of every cloud and the
+        credentials in the background
+        """
+        self._credentials_future()
+        self._clouds_future().add_done_callback(self._preload_regions)
+
+    def invalidate(self, clouds=True, credentials=True):
+        """ Forgets what has been loaded, e.g. after adding a cloud or a
+        credential
+        """
+        with self._lock:
+            if clouds:
+                self._clouds = None
+                self._regions = {}
+            if credentials:
+                self._credentials = None
+
+    def clouds(self):
+        """ Returns the list-clouds output
+        """
+        future = self._clouds_future()
+
+        def forget():
+            if self._clouds is future:
+                self._clouds = None
+        return self._result(future, forget)
+
+    def credentials(self):
+        """ Returns the credentials of every cloud
+        """
+        future = self._credentials_future()
+
+        def forget():
+            if self._credentials is future:
+                self._credentials = None
+        return self._result(future, forget)
+
+    def regions(self, cloud):
+        """ Returns the regions of cloud
+        """
+        future = self._regions_future(cloud)
+
+        def forget():
+            if self._regions.get(cloud) is future:
+                del self._regions[cloud]
+        return self._result(future, forget)
@@ -3,15 +3,73 @@
 Api for the charmstore:
 https://github.com/juju/charmstore/blob/v5/docs/API.md
 """
+import asyncio
+import os
 import os.path as path
+from functools import partial
 
 import requests
-import yaml
+import theblues.errors
+from juju.model import CharmStore
 
-cs = 'https://api.jujucharms.com/v5'
+from conjureup import yamlio
+
+cs = os.environ.get('CHARMSTORE', 'https://api.jujucharms.com/v5')
 CHANNELS = ['stable', 'candidate', 'beta', 'edge']
 
 
+class CachingCharmStore(CharmStore):
+    """ CharmStore client that remembers charm lookups
+
+    Charm ids and entities don't change during a run, so a bundle's charms
+    can be resolved while the controller bootstraps and the deploy then
+    finds them already answered.
+    """
+
+    # attempts and seconds between them when the charmstore has a server
+    # error, as CharmStore does for the calls it wraps
+    ATTEMPTS = 3
+    RETRY_DELAY = 1
+
+    def __init__(self, loop, cs_timeout=20):
+        super().__init__(loop, cs_timeout)
+        self._cs.url = cs
+        self._lookups = {}
+
+    async def _call(self, method, *args, **kwargs):
+        fn = partial(getattr(self._cs, method), *args, **kwargs)
+        for attempt in range(1, self.ATTEMPTS + 1):
+            try:
+                return await self.loop.run_in_executor(None, fn)
+            except theblues.errors.ServerError:
+                if attempt == self.ATTEMPTS:
+                    raise
+                await asyncio.sleep(self.RETRY_DELAY, loop=self.loop)
+
+    def _lookup(self, method, *args, **kwargs):
+        key = (method, args, tuple(sorted(kwargs.items())))
+        if key not in self._lookups:
+            self._lookups[key] = asyncio.ensure_future(
+                self._call(method, *args, **kwargs), loop=self.loop)
+        return self._lookups[key]
+
+    async def _cached(self, method, *args, **kwargs):
+        lookup = self._lookup(method, *args, **kwargs)
+        try:
+            return await asyncio.shield(lookup, loop=self.loop)
+        except Exception:
+            # don't remember failures, the next call will retry
+            self._lookups = {k: v for k, v in self._lookups.items()
+                             if v is not lookup}
+            raise
+
+    async def entityId(self, charm, *args, **kwargs):
+        return await self._cached('entityId', charm, *args, **kwargs)
+
+    async def entity(self, charm, *args, **kwargs):
+        return await self._cached('entity', charm, *args, **kwargs)
+
+
 def get_file(bundle, dst):
     """ Pulls a single file from the charmstore
     """
@@ -36,7 +94,7 @@ def get_bundle(bundle_name, channel='stable'):
     bundle_channel_info = get_channel_info(bundle_name, channel)
     bundle = "{}-{}".format(bundle_name,
                             bundle_channel_info['Revision'])
-    return yaml.safe_load(get_file(bundle, 'bundle.yaml'))
+    return yamlio.load(get_file(bundle, 'bundle.yaml'))
 
 
 def get_channel_info(bundle_name, channel='stable'):
@@ -0,0 +1,75 @@
+""" Checkpoints for resumable headless runs
+
+Each milestone of a run (controller bootstrapped, model added, bundle
+deployed, model settled and every step phase) is recorded in the state
+database as it completes. A run started with --resume picks its
+controller and model back up from there and skips the recorded work.
+"""
+
+import hashlib
+
+from conjureup import yamlio
+from conjureup.app_config import app
+
+BOOTSTRAP = 'bootstrap'
+ADD_MODEL = 'add-model'
+DEPLOY = 'deploy'
+SETTLED = 'settled'
+
+
+def _prefix():
+    return "conjure-up.{}.checkpoint.".format(app.config['spell'])
+
+
+def step_checkpoint(step, phase):
+    return 'step.{}.{}'.format(step.name, phase.value)
+
+
+def record(name, **data):
+    """ Marks a milestone of the current spell's run as done
+    """
+    app.state[_prefix() + name] = data
+    app.log.debug('Checkpoint {}: {}'.format(name, data))
+
+
+def get(name):
+    """ Returns the data recorded with a milestone, or None if it hasn't
+    been reached
+    """
+    return app.state.get(_prefix() + name)
+
+
+def resumed(name):
+    """ Returns the data recorded with a milestone if this run is resuming
+    and the milestone was reached before, otherwise None
+    """
+    if not app.conjurefile.get('resume'):
+        return None
+    return get(name)
+
+
+def forget(name):
+    """ Forgets a single milestone
+    """
+    app.state.pop(_prefix() + name, None)
+
+
+def clear():
+    """ Forgets all milestones of the current spell
+    """
+    prefix = _prefix()
+    for key in [key for key in app.state if key.startswith(prefix)]:
+        del app.state[key]
+
+
+def target():
+    """ Returns the cloud, controller and model of the last run, if any
+    """
+    return get(ADD_MODEL) or get(BOOTSTRAP)
+
+
+def bundle_hash(bundle):
+    """ Returns a digest of the bundle as it would be deployed
+    """
+    return hashlib.sha256(
+        yamlio.dump(bundle.to_dict()).encode('utf8')).hexdigest()
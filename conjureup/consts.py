@@ -19,6 +19,12 @@ ALLOWED_CONSTRAINTS = [
     'virt-type'
 ]
 
+# Minimum Juju versions for optional CLI behaviour, see utils.juju_supports
+JUJU_CAPABILITIES = {
+    # `juju list-clouds --local`
+    'list-clouds-local': '2.5.0',
+}
+
 
 class spell_types:
     JUJU = 'juju'
@@ -37,15 +37,12 @@ c.finish()
 
 from functools import lru_cache
 from importlib import import_module
+from itertools import chain
+from pathlib import Path
 
-from conjureup import events, consts
+from conjureup import charm, consts, events, log, yamlio
 from conjureup.app_config import app
-import yaml
-from conjureup import charm
-from conjureup.utils import slurp
 from conjureup.bundle import Bundle
-from pathlib import Path
-from itertools import chain
 
 
 def setup_metadata_controller():
@@ -66,13 +63,14 @@ def _setup_snap_metadata_controller():
     bundle_custom_filename = spell_dir / 'bundle-custom.yaml'
     if bundle_filename.exists():
         # Load bundle data early so we can merge any additional charm options
-        bundle_data = Bundle(yaml.load(bundle_filename.read_text()),
+        bundle_data = Bundle(yamlio.load_file(bundle_filename, mutable=True),
                              spell_type=app.metadata.spell_type)
     else:
         bundle_data = Bundle(spell_type=app.metadata.spell_type)
 
     if bundle_custom_filename.exists():
-        bundle_custom = yaml.load(slurp(bundle_custom_filename))
+        bundle_custom = yamlio.load_file(bundle_custom_filename,
+                                         mutable=True)
         bundle_data.apply(bundle_custom)
 
     for name in app.selected_addons:
@@ -86,17 +84,19 @@ def _setup_snap_metadata_controller():
         if not (step.bundle_add or step.bundle_remove):
             continue
         if step.bundle_remove:
-            fragment = yaml.safe_load(step.bundle_remove.read_text())
+            fragment = yamlio.load_file(step.bundle_remove, mutable=True)
             bundle_data.subtract(fragment)
         if step.bundle_add:
-            fragment = yaml.safe_load(step.bundle_add.read_text())
+            fragment = yamlio.load_file(step.bundle_add, mutable=True)
             bundle_data.apply(fragment)
 
     if app.conjurefile['bundle-remove']:
-        fragment = yaml.safe_load(app.conjurefile['bundle-remove'].read_text())
+        fragment = yamlio.load_file(app.conjurefile['bundle-remove'],
+                                    mutable=True)
         bundle_data.subtract(fragment)
     if app.conjurefile['bundle-add']:
-        fragment = yaml.safe_load(app.conjurefile['bundle-add'].read_text())
+        fragment = yamlio.load_file(app.conjurefile['bundle-add'],
+                                    mutable=True)
         bundle_data.apply(fragment)
 
     app.current_bundle = bundle_data
@@ -112,7 +112,7 @@ def _setup_juju_metadata_controller():
     bundle_custom_filename = spell_dir / 'bundle-custom.yaml'
     if bundle_filename.exists():
         # Load bundle data early so we can merge any additional charm options
-        bundle_data = Bundle(yaml.load(bundle_filename.read_text()))
+        bundle_data = Bundle(yamlio.load_file(bundle_filename, mutable=True))
     else:
         bundle_name = app.metadata.bundle_name
         if bundle_name is None:
@@ -127,7 +127,8 @@ def _setup_juju_metadata_controller():
         bundle_data = Bundle(charm.get_bundle(bundle_name, bundle_channel))
 
     if bundle_custom_filename.exists():
-        bundle_custom = yaml.load(slurp(bundle_custom_filename))
+        bundle_custom = yamlio.load_file(bundle_custom_filename,
+                                         mutable=True)
         bundle_data.apply(bundle_custom)
 
     for name in app.selected_addons:
@@ -141,17 +142,19 @@ def _setup_juju_metadata_controller():
         if not (step.bundle_add or step.bundle_remove):
             continue
         if step.bundle_remove:
-            fragment = yaml.safe_load(step.bundle_remove.read_text())
+            fragment = yamlio.load_file(step.bundle_remove, mutable=True)
             bundle_data.subtract(fragment)
         if step.bundle_add:
-            fragment = yaml.safe_load(step.bundle_add.read_text())
+            fragment = yamlio.load_file(step.bundle_add, mutable=True)
             bundle_data.apply(fragment)
 
     if app.conjurefile['bundle-remove']:
-        fragment = yaml.safe_load(app.conjurefile['bundle-remove'].read_text())
+        fragment = yamlio.load_file(app.conjurefile['bundle-remove'],
+                                    mutable=True)
         bundle_data.subtract(fragment)
     if app.conjurefile['bundle-add']:
-        fragment = yaml.safe_load(app.conjurefile['bundle-add'].read_text())
+        fragment = yamlio.load_file(app.conjurefile['bundle-add'],
+                                    mutable=True)
         bundle_data.apply(fragment)
 
     app.current_bundle = bundle_data
@@ -172,6 +175,8 @@ def use(controller):
         # we don't want to allow any new controllers to be rendered
         return NoopController()
 
+    log.set_context(phase=controller)
+
     if app.metadata and hasattr(app.metadata, 'spell_type'):
         spell_type = app.metadata.spell_type
     else:
@@ -2,7 +2,7 @@ import os
 
 from conjureup import controllers, utils
 from conjureup.app_config import app
-from conjureup.download import EndpointType, download_local
+from conjureup.download import EndpointType, download_registry_spell
 from conjureup.models.addon import AddonModel
 from conjureup.models.step import StepModel
 from conjureup.ui.views.spellpicker import SpellPickerView
@@ -15,9 +15,7 @@ class SpellPickerController:
             utils.set_chosen_spell(spellname,
                                    os.path.join(app.conjurefile['cache-dir'],
                                                 spellname))
-            download_local(os.path.join(app.config['spells-dir'],
-                                        spellname),
-                           app.config['spell-dir'])
+            download_registry_spell(spellname, app.config['spell-dir'])
             utils.set_spell_metadata()
             StepModel.load_spell_steps()
             AddonModel.load_spell_addons()
@@ -29,7 +27,8 @@ class SpellPickerController:
         if app.endpoint_type is None:
             spells += utils.find_spells()
         elif app.endpoint_type == EndpointType.LOCAL_SEARCH:
-            spells = utils.find_spells_matching(app.conjurefile['spell'])
+            spells = utils.find_spells_matching(app.conjurefile['spell']) \
+                or utils.search_spells(app.conjurefile['spell'])
         else:
             raise Exception("Unexpected endpoint type {}".format(
                 app.endpoint_type))
@@ -49,7 +48,8 @@ class SpellPickerController:
         view = SpellPickerView(app,
                                sorted(spells,
                                       key=spellcatsorter),
-                               self.finish)
+                               self.finish,
+                               search=utils.spell_search_index().search)
         view.show()
 
 
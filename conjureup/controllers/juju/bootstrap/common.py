@@ -1,25 +1,123 @@
+import asyncio
+from fnmatch import fnmatchcase
 from pathlib import Path
 
-from conjureup import errors, events, juju
+from conjureup import checkpoint, errors, events, juju
 from conjureup.app_config import app
+from conjureup.controllers.juju.deploy import common as deploy_common
 from conjureup.telemetry import track_event
 
+# Seconds a pooled controller has to list its models to be considered
+POOL_PROBE_TIMEOUT = 10
+# Pooled controllers hosting this many models are considered full
+DEFAULT_POOL_MAX_MODELS = 20
+
+
+def pool_candidates(existing_controllers, patterns, cloud, region=None):
+    """ Returns the existing controllers matching any of the pool patterns
+    that live on the given cloud and region
+    """
+    return sorted(
+        name for name, info in existing_controllers.items()
+        if any(fnmatchcase(name, pattern) for pattern in patterns) and
+        info.get('cloud') == cloud and
+        (region is None or info.get('region') == region))
+
+
+async def probe_controller(name, model, max_models,
+                           timeout=POOL_PROBE_TIMEOUT):
+    """ Checks that a controller answers and has room for another model
+
+    Returns the controller name, or None if it can't be used.
+    """
+    try:
+        models = (await juju.list_models(name, timeout))['models']
+    except (asyncio.TimeoutError, LookupError) as e:
+        app.log.debug('Pooled controller {} unavailable: {}'.format(name, e))
+        return None
+    if any(m.get('short-name', m['name']) == model for m in models):
+        app.log.debug('Pooled controller {} already has a model {}'.format(
+            name, model))
+        return None
+    live = [m for m in models
+            if m.get('short-name', m['name']) != 'controller' and
+            m.get('life') != 'dying']
+    if len(live) >= max_models:
+        app.log.debug('Pooled controller {} is full'.format(name))
+        return None
+    return name
+
+
+async def pick_pooled_controller(candidates, model, max_models):
+    """ Probes all candidates at once, returning the first to qualify
+    """
+    probes = [asyncio.ensure_future(probe_controller(name, model,
+                                                     max_models))
+              for name in candidates]
+    try:
+        for probe in asyncio.as_completed(probes):
+            name = await probe
+            if name is not None:
+                return name
+        return None
+    finally:
+        for probe in probes:
+            probe.cancel()
+
 
 class BaseBootstrapController:
     msg_cb = NotImplementedError()
+    # validates the bundle and resolves its charms, awaited by the deploy
+    prepare_task = None
 
     def is_existing_controller(self):
         controllers = juju.get_controllers()['controllers']
         return app.provider.controller in controllers
 
     async def run(self):
+        # bundle preparation doesn't need the controller, so it overlaps
+        # with bootstrapping it
+        self.prepare_task = app.loop.create_task(
+            deploy_common.prepare_bundle(self.emit))
         await app.provider.configure_tools()
 
+        if not app.is_jaas and not self.is_existing_controller():
+            await self.use_pooled_controller()
+
         if app.is_jaas or self.is_existing_controller():
             await self.do_add_model()
         else:
             await self.do_bootstrap()
 
+    async def use_pooled_controller(self):
+        """ Switches to a healthy controller from the configured pool, if
+        there is one, instead of bootstrapping a new controller
+        """
+        patterns = app.conjurefile.get('controller-pool') or []
+        if not patterns:
+            return
+        candidates = pool_candidates(juju.get_controllers()['controllers'],
+                                     patterns,
+                                     app.provider.cloud,
+                                     app.provider.region)
+        if not candidates:
+            app.log.info('No pooled controllers on {}'.format(
+                app.provider.cloud))
+            return
+        self.emit('Checking pooled controllers: {}'.format(
+            ', '.join(candidates)))
+        controller = await pick_pooled_controller(
+            candidates,
+            app.provider.model,
+            app.conjurefile.get('controller-pool-max-models',
+                                DEFAULT_POOL_MAX_MODELS))
+        if controller is None:
+            self.emit('No pooled controller available.')
+            return
+        track_event("Juju Controller Pool", "Reused", "")
+        self.emit('Using pooled controller {}.'.format(controller))
+        app.provider.controller = controller
+
     async def do_add_model(self):
         if await juju.model_available():
             self.emit('Connecting to Juju model {}...'.format(
@@ -39,6 +137,9 @@ class BaseBootstrapController:
             track_event("Juju Add Model", "Done", "{}{}".format(
                 cloud_with_region, 'on JAAS' if app.is_jaas else ''))
             self.emit('Juju model created.')
+            # nothing from an earlier run can have happened in a new model
+            checkpoint.clear()
+            self.record_checkpoint(checkpoint.ADD_MODEL)
         events.Bootstrapped.set()
 
     async def do_bootstrap(self):
@@ -66,10 +167,20 @@ class BaseBootstrapController:
 
         self.emit('Bootstrap complete.')
         track_event("Juju Bootstrap", "Done", "")
+        checkpoint.clear()
+        self.record_checkpoint(checkpoint.BOOTSTRAP)
 
         await juju.connect_model()  # login to newly created (default) model
         events.Bootstrapped.set()
 
+    def record_checkpoint(self, name):
+        checkpoint.record(name,
+                          cloud=app.provider.cloud,
+                          region=app.provider.region,
+                          credential=app.provider.credential,
+                          controller=app.provider.controller,
+                          model=app.provider.model)
+
     def emit(self, msg):
         app.log.info(msg)
         self.msg_cb(msg)
@@ -12,6 +12,12 @@ from conjureup.ui.views.cloud import CloudView
 
 from .common import BaseCloudController
 
+# Backoff bounds, in seconds, for retrying while LXD can't be reached
+LXD_RETRY_MIN = 1
+LXD_RETRY_MAX = 30
+# Seconds to wait for an LXD event before re-checking anyway
+LXD_EVENT_TIMEOUT = 30
+
 
 class CloudsController(BaseCloudController):
     cancel_monitor = asyncio.Event()
@@ -85,8 +91,12 @@ class CloudsController(BaseCloudController):
     async def _monitor_localhost(self, provider):
         """ Checks that localhost/lxd is available and listening,
         updates widget accordingly
-        """
 
+        While LXD is reachable but not usable we re-check whenever it
+        reports an event; while it is unreachable we retry with an
+        exponential backoff.
+        """
+        delay = LXD_RETRY_MIN
         while not self.cancel_monitor.is_set():
             try:
                 provider._set_lxd_dir_env()
@@ -107,8 +117,15 @@ class CloudsController(BaseCloudController):
                 return
             except errors.LXDError as e:
                 self.view._update_localhost_widget(False, e.message)
-            await run_with_interrupt(asyncio.sleep(2),
-                                     self.cancel_monitor)
+            watched = await run_with_interrupt(
+                provider.wait_for_change(LXD_EVENT_TIMEOUT),
+                self.cancel_monitor)
+            if watched is False:
+                await run_with_interrupt(asyncio.sleep(delay),
+                                         self.cancel_monitor)
+                delay = min(delay * 2, LXD_RETRY_MAX)
+            else:
+                delay = LXD_RETRY_MIN
 
     def prev_screen(self):
         self.cancel_monitor.set()
@@ -1,8 +1,6 @@
 from os import path
 
-import yaml
-
-from conjureup import controllers, juju, utils
+from conjureup import controllers, juju, utils, yamlio
 from conjureup.app_config import app
 from conjureup.consts import CUSTOM_PROVIDERS, cloud_types
 from conjureup.ui.views.credentials import (
@@ -79,7 +77,7 @@ class CredentialsController(common.BaseCredentialsController):
                                                          utils.gen_hash())
 
         try:
-            existing_creds = yaml.safe_load(open(cred_path))
+            existing_creds = yamlio.load_file(cred_path, mutable=True)
         except:
             existing_creds = {'credentials': {}}
 
@@ -93,9 +91,8 @@ class CredentialsController(common.BaseCredentialsController):
                 app.provider.credential: self._format_creds()
             }
 
-        with open(cred_path, 'w') as cred_f:
-            cred_f.write(yaml.safe_dump(existing_creds,
-                                        default_flow_style=False))
+        yamlio.dump_file(existing_creds, cred_path)
+        juju.catalogue.invalidate(clouds=False)
 
         # Persist input fields in current provider, this is so we
         # can login to the provider for things like querying VSphere
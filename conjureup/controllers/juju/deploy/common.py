@@ -4,17 +4,82 @@ from datetime import datetime
 
 import websockets
 
-from conjureup import events, juju, utils
+from conjureup import checkpoint, controllers, events, juju
 from conjureup.app_config import app
+from conjureup.bundle import BundleInvalidFragment
+
+# Number of charms looked up in the charmstore at the same time
+RESOLVE_CONCURRENCY = 8
+
+
+def validate_bundle(bundle):
+    """ Checks the bundle for mistakes that would otherwise only be
+    reported by the controller
+    """
+    names = set()
+    for application in bundle.applications:
+        if 'charm' not in application:
+            raise BundleInvalidFragment(
+                "Application {} has no charm".format(application.name))
+        names.add(application.name)
+    for relation in bundle.relations:
+        for endpoint in relation:
+            if endpoint.split(':')[0] not in names:
+                raise BundleInvalidFragment(
+                    "Relation {} refers to unknown application {}".format(
+                        relation, endpoint))
+
+
+async def prepare_bundle(msg_cb):
+    """ Validates the bundle and resolves its charms against the charmstore
+
+    Nothing here needs the controller, so this runs while it bootstraps;
+    the charmstore lookups are remembered for when the bundle is deployed.
+    """
+    bundle = app.current_bundle
+    validate_bundle(bundle)
+
+    charms = sorted(set(application.charm
+                        for application in bundle.applications
+                        if application.charm.startswith('cs:')))
+    sem = asyncio.Semaphore(RESOLVE_CONCURRENCY)
+
+    async def _resolve(charm):
+        async with sem:
+            try:
+                return await app.juju.charmstore.entityId(charm)
+            except Exception as e:
+                # the deploy will resolve it again and report any problem
+                app.log.debug('Unable to resolve {}: {}'.format(charm, e))
+
+    resolved = await asyncio.gather(*[_resolve(charm) for charm in charms])
+    app.log.debug('Resolved charms: {}'.format(dict(zip(charms, resolved))))
+    msg_cb('Resolved {} charms.'.format(len(charms)))
+    events.BundlePrepared.set()
 
 
 async def do_deploy(msg_cb):
     await events.ModelConnected.wait()
+    prepare_task = controllers.use('bootstrap').prepare_task
+    if prepare_task is not None:
+        # raises whatever stopped the bundle from being prepared
+        await prepare_task
+    await events.BundlePrepared.wait()
 
     for step in app.steps:
         await step.before_deploy(msg_cb=msg_cb)
     events.PreDeployComplete.set()
 
+    bundle_hash = checkpoint.bundle_hash(app.current_bundle)
+    deployed = checkpoint.resumed(checkpoint.DEPLOY)
+    if deployed and deployed['bundle_hash'] == bundle_hash and \
+            _is_bundle_deployed():
+        msg = 'Applications already deployed by a previous run.'
+        app.log.info(msg)
+        msg_cb(msg)
+        events.DeploymentComplete.set()
+        return
+
     msg = 'Deploying Applications.'
     app.log.info(msg)
     msg_cb(msg)
@@ -24,7 +89,7 @@ async def do_deploy(msg_cb):
                       '{}-deployed-{}.yaml'.format(
                           app.env['CONJURE_UP_SPELL'],
                           datetimestr))
-    utils.spew(fn, app.current_bundle.to_yaml())
+    app.current_bundle.dump(fn)
     for attempt in range(3):
         try:
             await app.juju.client.deploy(fn)
@@ -34,20 +99,38 @@ async def do_deploy(msg_cb):
                 raise
             await asyncio.sleep(1)
 
+    checkpoint.record(checkpoint.DEPLOY, bundle_hash=bundle_hash)
+    checkpoint.forget(checkpoint.SETTLED)
     events.DeploymentComplete.set()
 
 
+def _is_bundle_deployed():
+    """ Checks that the live model has every application of the bundle
+    """
+    deployed = set(app.juju.client.applications.keys())
+    return all(application.name in deployed
+               for application in app.current_bundle.applications)
+
+
 async def wait_for_applications(msg_cb):
     await events.DeploymentComplete.wait()
 
     for step in app.steps:
         await step.before_wait(msg_cb=msg_cb)
 
+    if checkpoint.resumed(checkpoint.SETTLED) is not None:
+        msg = 'Model already settled in a previous run.'
+        app.log.info(msg)
+        msg_cb(msg)
+        events.ModelSettled.set()
+        return
+
     msg = 'Waiting for deployment to settle.'
     app.log.info(msg)
     msg_cb(msg)
 
     await juju.wait_for_deployment()
+    checkpoint.record(checkpoint.SETTLED)
 
     events.ModelSettled.set()
     msg = 'Model settled.'
@@ -32,19 +32,26 @@ class DeployController:
             await asyncio.sleep(1)
 
     def _build_view_data(self, applications):
+        # the model's application and unit lists are rebuilt on every
+        # access, so they are read once per refresh
+        juju_apps = app.juju.client.applications
+        juju_units = {}
+        for unit in app.juju.client.units.values():
+            juju_units.setdefault(unit.application, []).append(unit)
+
         view_data = {}
         for service in applications:
             units = {}
             view_data[service.name] = {'units': units}
             num_units = service.num_units
-            if service.name in app.juju.client.applications:
-                juju_app = app.juju.client.applications[service.name]
-                num_units = max(service.num_units, len(juju_app.units))
+            if service.name in juju_apps:
+                app_units = juju_units.get(service.name, [])
+                num_units = max(service.num_units, len(app_units))
             else:
-                juju_app = None
+                app_units = []
             for unit_num in range(num_units):
-                if juju_app and len(juju_app.units) > unit_num:
-                    unit = juju_app.units[unit_num]
+                if len(app_units) > unit_num:
+                    unit = app_units[unit_num]
                     name = unit.name
                     public_address = unit.public_address
                     machine = unit.machine_id
@@ -0,0 +1,162 @@
+import asyncio
+import re
+from datetime import datetime, timedelta, timezone
+from fnmatch import fnmatchcase
+
+from conjureup import juju
+
+# Number of controllers asked for their models at the same time
+INVENTORY_CONCURRENCY = 4
+# Seconds to wait for a controller to list its models
+INVENTORY_TIMEOUT = 20
+# Number of models destroyed at the same time in batch mode
+DESTROY_CONCURRENCY = 8
+# Models matched by --older-than when no --match pattern is given
+DEFAULT_MATCH = 'conjure-*'
+
+_RELATIVE_SINCE = re.compile(r'^(\d+) (second|minute|hour|day)s? ago$')
+_SINCE_FORMATS = ['%Y-%m-%dT%H:%M:%SZ',
+                  '%Y-%m-%d %H:%M:%SZ',
+                  '%d %b %Y %H:%M:%S%z',
+                  '%Y-%m-%d']
+
+
+def parse_since(since, now=None):
+    """ Parses the status `since` of a model as reported by list-models,
+    which is either a timestamp or a friendly duration like '3 hours ago'
+
+    Returns an aware datetime, or None if since can't be parsed
+    """
+    now = now or datetime.now(timezone.utc)
+    since = str(since).strip()
+    if since == 'just now':
+        return now
+    match = _RELATIVE_SINCE.match(since)
+    if match:
+        count, unit = match.groups()
+        return now - timedelta(**{unit + 's': int(count)})
+    for fmt in _SINCE_FORMATS:
+        try:
+            when = datetime.strptime(since, fmt)
+        except ValueError:
+            continue
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return when
+    return None
+
+
+def model_name(model):
+    return model.get('short-name', model['name'])
+
+
+def parse_pattern(pattern, current_controller=None):
+    """ Splits a controller:model glob, defaulting to the current controller
+    """
+    controller, sep, model = pattern.rpartition(':')
+    if not sep:
+        controller = current_controller or '*'
+    return controller, model
+
+
+def select_controllers(controller_names, patterns, current_controller=None):
+    """ Returns the controllers that may hold a model matching patterns
+    """
+    globs = [parse_pattern(pattern, current_controller)[0]
+             for pattern in patterns]
+    return sorted(name for name in controller_names
+                  if any(fnmatchcase(name, glob) for glob in globs))
+
+
+def select_models(inventory, patterns, older_than=None,
+                  current_controller=None, now=None):
+    """ Picks the models to destroy
+
+    Arguments:
+    inventory: dict of controller name to its list-models output
+    patterns: controller:model globs to match
+    older_than: only match models whose status hasn't changed for this
+                many days
+    current_controller: controller of patterns without one
+
+    Returns:
+    Sorted list of (controller, model) names. Controller models and
+    models that are already dying are never matched.
+    """
+    now = now or datetime.now(timezone.utc)
+    globs = [parse_pattern(pattern, current_controller)
+             for pattern in patterns]
+    targets = []
+    for controller, models in inventory.items():
+        for model in models.get('models', []):
+            name = model_name(model)
+            if name == 'controller' or model.get('life') == 'dying':
+                continue
+            if not any(fnmatchcase(controller, cglob) and
+                       fnmatchcase(name, mglob)
+                       for cglob, mglob in globs):
+                continue
+            if older_than is not None:
+                since = parse_since(
+                    model.get('status', {}).get('since', ''), now)
+                if since is None or \
+                        now - since < timedelta(days=older_than):
+                    continue
+            targets.append((controller, name))
+    return sorted(targets)
+
+
+async def load_inventory(controller_names, on_models, on_unreachable,
+                         concurrency=INVENTORY_CONCURRENCY,
+                         timeout=INVENTORY_TIMEOUT):
+    """ Lists the models of every controller concurrently
+
+    on_models is called with the controller name and its list-models
+    output as each controller answers; on_unreachable with the controller
+    name and a reason when it doesn't.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _load_models(cname):
+        async with sem:
+            try:
+                models = await juju.list_models(cname, timeout)
+            except asyncio.TimeoutError:
+                on_unreachable(cname, 'timed out')
+                return
+            except LookupError as e:
+                on_unreachable(cname, str(e).strip())
+                return
+        on_models(cname, models)
+
+    await asyncio.gather(*[_load_models(cname)
+                           for cname in controller_names])
+
+
+async def destroy_models(targets, msg_cb, concurrency=DESTROY_CONCURRENCY,
+                         wait=True):
+    """ Destroys (controller, model) targets with a bounded pool of workers
+
+    Returns the list of targets that failed to be destroyed.
+    """
+    sem = asyncio.Semaphore(concurrency)
+    failed = []
+
+    async def _destroy(controller, model):
+        target = '{}:{}'.format(controller, model)
+        async with sem:
+            msg_cb('Destroying model {}'.format(target))
+            try:
+                await juju.destroy_model(controller, model, wait=wait)
+            except Exception as e:
+                failed.append((controller, model))
+                msg_cb('Failed to destroy model {}: {}'.format(target, e))
+                return
+        if wait:
+            msg_cb('Model {} has been removed'.format(target))
+        else:
+            msg_cb('Model {} is dying'.format(target))
+
+    await asyncio.gather(*[_destroy(controller, model)
+                           for controller, model in targets])
+    return failed
@@ -3,32 +3,47 @@ from conjureup.app_config import app
 from conjureup.telemetry import track_screen
 from conjureup.ui.views.destroy import DestroyView
 
+from . import common
+
 
 class Destroy:
 
     def __init__(self):
         self.view = None
+        self.inventory_task = None
 
     def finish(self, controller, model):
+        if self.inventory_task:
+            self.inventory_task.cancel()
         return controllers.use('destroyconfirm').render(controller, model)
 
+    def _unreachable(self, controller, reason):
+        app.log.warning('Unable to list models of {}: {}'.format(controller,
+                                                                 reason))
+        self.view.set_unreachable(controller, reason)
+
     def render(self):
-        models_map = {}
         existing_controllers = juju.get_controllers()['controllers']
-        for cname, d in existing_controllers.items():
-            models_map[cname] = juju.get_models(cname)
 
         track_screen("Destroy Controller")
         excerpt = ("Press [ENTER] on the highlighted item to destroy")
-        view = DestroyView(app,
-                           models=models_map,
-                           cb=self.finish)
+        self.view = DestroyView(app,
+                                models={},
+                                controllers=existing_controllers.keys(),
+                                cb=self.finish)
 
         app.ui.set_header(
             title="Choose a deployment to teardown",
             excerpt=excerpt
         )
-        app.ui.set_body(view)
+        app.ui.set_body(self.view)
+        if self.inventory_task:
+            self.inventory_task.cancel()
+        # render progressively as each controller answers
+        self.inventory_task = app.loop.create_task(
+            common.load_inventory(existing_controllers.keys(),
+                                  self.view.set_models,
+                                  self._unreachable))
 
 
 _controller_class = Destroy
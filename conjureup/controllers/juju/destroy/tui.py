@@ -2,9 +2,16 @@ from conjureup import events, juju, utils
 from conjureup.app_config import app
 from conjureup.telemetry import track_event
 
+from . import common
+
 
 class Destroy:
     def render(self):
+        if app.conjurefile['match'] or app.conjurefile['older-than']:
+            app.loop.create_task(self.do_batch_destroy(
+                app.conjurefile['match'] or [common.DEFAULT_MATCH],
+                app.conjurefile['older-than']))
+            return
         app.loop.create_task(self.do_destroy(app.conjurefile['model'],
                                              app.conjurefile['controller']))
 
@@ -16,5 +23,46 @@ class Destroy:
         utils.info("Model has been removed")
         events.Shutdown.set(0)
 
+    async def do_batch_destroy(self, patterns, older_than):
+        current_controller = juju.get_current_controller()
+        controller_names = common.select_controllers(
+            juju.get_controllers().get('controllers', {}).keys(),
+            patterns, current_controller)
+
+        inventory = {}
+
+        def _unreachable(controller, reason):
+            utils.warning("Skipping controller {}: {}".format(controller,
+                                                              reason))
+
+        utils.info("Listing models in {} controller(s)".format(
+            len(controller_names)))
+        await common.load_inventory(controller_names,
+                                    inventory.__setitem__,
+                                    _unreachable)
+        targets = common.select_models(inventory, patterns, older_than,
+                                       current_controller)
+        if not targets:
+            utils.info("No models matched")
+            events.Shutdown.set(0)
+            return
+
+        track_event("Destroying models", "Destroy", str(len(targets)))
+        utils.info("Destroying {} model(s)".format(len(targets)))
+        failed = await common.destroy_models(
+            targets, utils.info,
+            concurrency=app.conjurefile['jobs'],
+            wait=not app.conjurefile['no-wait'])
+        if failed:
+            utils.error("Failed to destroy {} of {} model(s)".format(
+                len(failed), len(targets)))
+            events.Shutdown.set(1)
+            return
+        utils.info("All {} model(s) have been {}".format(
+            len(targets),
+            'marked for removal' if app.conjurefile['no-wait']
+            else 'removed'))
+        events.Shutdown.set(0)
+
 
 _controller_class = Destroy
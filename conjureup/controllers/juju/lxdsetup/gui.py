@@ -37,8 +37,9 @@ class LXDSetupController(common.BaseLXDSetupController):
                 'Unable to set the default profiles parent network'
                 'device: {}'.format(e.stderr))
             raise
-        phys_iface_addr = utils.get_physical_network_ipaddr(
-            network['name'])
+        # LXD may have only just given the bridge its address
+        bridge = utils.get_network_interface(network['name'], refresh=True)
+        phys_iface_addr = bridge.ipv4 if bridge else None
         try:
             iface = ipaddress.IPv4Interface("{}/24".format(phys_iface_addr))
         except ipaddress.AddressValueError:
@@ -1,10 +1,53 @@
+import asyncio
 import os
 from datetime import datetime
 from subprocess import CalledProcessError
 
-from conjureup import errors, events, utils
+from conjureup import errors, events, snapcache, utils
 from conjureup.app_config import app
 
+# Number of snaps allowed to be fetched from the store at the same time
+DOWNLOAD_CONCURRENCY = 4
+
+
+async def fetch_snap(snap_cache, _app, sem, msg_cb):
+    """ Fetches a single snap into the cache and acks its assertions
+
+    Returns the path to the cached snap file.
+    """
+    async with sem:
+        entry = await snap_cache.fetch(_app.snap, _app.channel, msg_cb)
+
+    # Acking the assertions lets snapd verify the signature of the
+    # cached file at install time, so we don't need --dangerous.
+    ret, _, err = await utils.arun(
+        ['sudo', 'snap', 'ack', str(entry.assertion)])
+    if ret > 0:
+        raise errors.DeploymentFailure(err)
+    msg_cb('Verified snap {}'.format(_app.snap))
+    return entry.snap
+
+
+async def install_snaps(applications, snap_files, msg_cb):
+    """ Installs downloaded snaps, one `snap install` per application
+    """
+    for _app, snap_file in zip(applications, snap_files):
+        msg_cb('Installing snap {}'.format(_app.snap))
+        cmd = ['sudo', 'snap', 'install', str(snap_file)]
+        if hasattr(_app, 'confinement') and _app.confinement:
+            cmd += ['--{}'.format(_app.confinement)]
+        ret, out, err = await utils.arun(cmd, cb_stdout=msg_cb)
+        if ret > 0:
+            raise errors.DeploymentFailure(err)
+
+        # a snap installed from a file tracks no channel, point it back
+        # at the one it was fetched from so that it refreshes from there
+        ret, out, err = await utils.arun(
+            ['sudo', 'snap', 'switch', '--channel', _app.channel, _app.snap])
+        if ret > 0:
+            raise errors.DeploymentFailure(err)
+        msg_cb('Installed snap {}'.format(_app.snap))
+
 
 async def do_deploy(msg_cb):
     for step in app.steps:
@@ -20,23 +63,28 @@ async def do_deploy(msg_cb):
                       '{}-deployed-{}.yaml'.format(
                           app.env['CONJURE_UP_SPELL'],
                           datetimestr))
-    utils.spew(fn, app.current_bundle.to_yaml())
+    app.current_bundle.dump(fn)
+
+    snap_cache = snapcache.SnapCache(app.env['CONJURE_UP_CACHEDIR'])
+    applications = app.current_bundle.applications
+    sem = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
     try:
-        for _app in app.current_bundle.applications:
-            cmd = ['sudo', 'snap', 'install',
-                   _app.snap, '--channel', _app.channel]
-            if hasattr(_app, 'confinement') and _app.confinement:
-                cmd += ['--{}'.format(_app.confinement)]
-            ret, out, err = await utils.arun(
-                cmd,
-                cb_stdout=msg_cb)
-            if ret > 0:
-                raise errors.DeploymentFailure(err)
+        snap_files = await asyncio.gather(*[
+            fetch_snap(snap_cache, _app, sem, msg_cb)
+            for _app in applications])
+        await install_snaps(applications, snap_files, msg_cb)
     except CalledProcessError as e:
         app.log.error(
             "Could not snap install application: {}".format(e))
         raise
 
+    snap_cache.prune(
+        max_size=app.conjurefile.get('snap-cache-max-size',
+                                     snapcache.DEFAULT_MAX_SIZE),
+        max_age=app.conjurefile.get('snap-cache-max-age',
+                                    snapcache.DEFAULT_MAX_AGE),
+        keep=[snap_file.parent for snap_file in snap_files])
+
     events.DeploymentComplete.set()
 
 
@@ -16,6 +16,7 @@ from ubuntui.palette import STYLES
 from conjureup import __version__ as VERSION
 from conjureup import controllers, events, juju, utils
 from conjureup.app_config import app
+from conjureup.controllers.juju.destroy.common import DESTROY_CONCURRENCY
 from conjureup.log import setup_logging
 from conjureup.models.conjurefile import Conjurefile
 from conjureup.ui import ConjureUI
@@ -44,6 +45,25 @@ def parse_options(argv):
     parser.add_argument('model', nargs='?',
                         help="Name of a juju model to target. "
                         "A controller is required.")
+    parser.add_argument('-m', '--match', dest='match', action='append',
+                        metavar='CONTROLLER:MODEL',
+                        help='Destroy all models matching this glob, eg. '
+                        '"ci-*:conjure-*". Can be given multiple times. '
+                        'Models without a controller are looked up in the '
+                        'current controller.')
+    parser.add_argument('--older-than', dest='older_than', type=int,
+                        metavar='DAYS',
+                        help='Only destroy matching models that have been '
+                        'in the same state for at least DAYS days. Without '
+                        '--match, all conjure-* models of the current '
+                        'controller are considered.')
+    parser.add_argument('-j', '--jobs', dest='jobs', type=utils.positive_int,
+                        default=DESTROY_CONCURRENCY,
+                        help='Number of models to destroy at the same '
+                        'time when matching models.')
+    parser.add_argument('--no-wait', action='store_true', dest='no_wait',
+                        help='Return as soon as matched models are dying '
+                        'instead of waiting for them to be removed.')
     parser.add_argument('-c', '--conf-file', dest='conf_file',
                         help='Path to configuration file', action='append',
                         type=pathlib.Path)
@@ -113,7 +133,8 @@ def main():
     app.loop.create_task(_start())
 
     try:
-        if app.conjurefile['controller'] and app.conjurefile['model']:
+        if (app.conjurefile['controller'] and app.conjurefile['model']) or \
+                app.conjurefile['match'] or app.conjurefile['older-than']:
             app.headless = True
             app.ui = None
             app.env['CONJURE_UP_HEADLESS'] = "1"
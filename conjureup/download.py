@@ -12,6 +12,7 @@ from progressbar import (
     UnknownLength
 )
 
+from conjureup import registry
 from conjureup.app_config import app
 from conjureup.consts import UNSPECIFIED_SPELL
 from conjureup.utils import chdir, run
@@ -51,18 +52,34 @@ def remote_exists(path):
     return requests.head(path).ok
 
 
-def download_local(src, dst):
+def download_local(src, dst, compiled=None):
     """ Copies spell from local filesystem into cache
+
+    Arguments:
+    src: spell directory
+    dst: cache location of the spell
+    compiled: the spell already compiled (see registry.py), if it is
+              known, to save compiling it again for its manifest
     """
     try:
         shutil.rmtree(dst, ignore_errors=True)
         app.log.debug("Path is local filesystem, copying {} to {}".format(
             src, dst))
         shutil.copytree(src, dst)
-        return
     except Exception as e:
         app.log.debug("Failed to download local spell: {}".format(e))
         raise e
+    registry.write_manifest(dst, compiled)
+
+
+def download_registry_spell(key, dst):
+    """ Copies a spell of the registry into cache
+    """
+    compiled = None
+    if app.registry is not None:
+        compiled = app.registry.spell(key)
+    download_local(os.path.join(app.config['spells-dir'], key), dst,
+                   compiled)
 
 
 def download_requests_stream(request_stream, destination, message=None):
@@ -121,6 +138,7 @@ def download(src, dst, purge_top_level=True):
         bsdtar_cmd += "-C {}".format(dst)
         app.log.debug("Extracting spell: {}".format(bsdtar_cmd))
         run(bsdtar_cmd, shell=True, check=True, env=app.env)
+        registry.write_manifest(dst)
     except CalledProcessError as e:
         raise Exception("Unable to download {}: {}".format(src, e))
 
@@ -169,6 +187,8 @@ def download_or_sync_registry(remote_registry, spells_dir, branch='master'):
     spells_dir: cache location of local spells directory
     branch: switch to branch
 
+    Once synced, the registry is compiled (see registry.py) unless it is
+    at the same commit as last time.
     """
     def clone():
         run("git clone -q --depth 1 --no-single-branch {} {}".format(
@@ -192,3 +212,4 @@ def download_or_sync_registry(remote_registry, spells_dir, branch='master'):
             "Failed to update spells registry, re-pulling fresh copy.")
         shutil.rmtree(spells_dir)
         clone()
+    registry.load_index(spells_dir)
@@ -7,9 +7,8 @@ from pathlib import Path
 from ubuntui.ev import EventLoop
 from urwid import ExitMainLoop
 
-from conjureup import errors, utils
+from conjureup import errors, telemetry, utils
 from conjureup.app_config import app
-from conjureup.telemetry import track_exception
 
 
 class Event(asyncio.Event):
@@ -106,6 +105,7 @@ Bootstrapped = Event('Bootstrapped')
 ModelAvailable = Event('ModelAvailable')
 ModelConnected = Event('ModelConnected')
 PreDeployComplete = Event('PreDeployComplete')
+BundlePrepared = Event('BundlePrepared')
 MachinePending = NamedEvent('MachinePending')
 MachineCreated = NamedEvent('MachineCreated')
 AppMachinesCreated = NamedEvent('AppMachinesCreated')
@@ -152,7 +152,7 @@ def handle_exception(loop, context):
     if any(pred(exc) for pred in NOTRACK_EXCEPTIONS):
         app.log.debug('Would not track exception: {}'.format(exc))
     if not (app.no_report or any(pred(exc) for pred in NOTRACK_EXCEPTIONS)):
-        track_exception(str(exc))
+        telemetry.track_exception(str(exc))
         utils.sentry_report(exc_info=exc_info)
 
     msg = 'Unhandled exception'
@@ -200,6 +200,9 @@ async def shutdown_watcher():
                 app.log.debug('Cancelling pending task: {}'.format(task))
                 task.cancel()
         await asyncio.sleep(0.1)  # give tasks a chance to see the cancel
+
+        # send any queued usage and error reports
+        telemetry.flush()
     except Exception as e:
         app.log.exception('Error in cleanup code: {}'.format(e))
     app.loop.stop()
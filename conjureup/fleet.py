@@ -0,0 +1,182 @@
+""" Fleet mode
+
+Deploys the chosen spell to several clouds/models at once. The registry
+sync, spell download and charmstore bundle download happen once in the
+parent process; every target then runs as a headless conjure-up with its
+own cache directory, state database, Conjurefile and logs, at most `jobs`
+of them at a time. They are separate processes because conjure-up keeps
+a run's provider, state, environment and controllers in the app
+singleton, so each target still pays for its own startup; this
+process's event loop drives them all.
+"""
+
+import asyncio
+import re
+import sys
+from pathlib import Path
+
+from conjureup import charm, utils, yamlio
+from conjureup.app_config import app
+from conjureup.consts import spell_types
+
+# Options that only make sense for the fleet process itself, or that are
+# handed to each target explicitly rather than through its Conjurefile
+_PARENT_ONLY_KEYS = ['bundle-add', 'bundle-remove', 'cache-dir', 'cloud',
+                     'conf-file', 'controller', 'fleet', 'fleet-jobs',
+                     'gen-config', 'model', 'no-sync', 'selected-addons',
+                     'show-env', 'spell', 'spells-dir']
+
+
+class FleetTarget:
+    """ A single cloud/controller/model to deploy to
+    """
+
+    def __init__(self, label, overrides):
+        self.label = label
+        self.overrides = overrides
+        self.cache_dir = Path(app.conjurefile['cache-dir']) / 'fleet' / label
+        self.returncode = None
+
+    @classmethod
+    def parse(cls, spec):
+        """ Loads a target from either a Conjurefile path or a
+        cloud[/region][:controller[:model]] string
+        """
+        path = Path(spec).expanduser()
+        if path.is_file():
+            overrides = yamlio.load(path.read_text())
+            if not isinstance(overrides, dict):
+                raise ValueError(
+                    'Unable to load {}: contents are not a mapping'.format(
+                        path))
+            label = path.stem
+        else:
+            overrides = dict(zip(['cloud', 'controller', 'model'],
+                                 spec.split(':', 2)))
+            label = spec
+        if not overrides.get('cloud'):
+            raise ValueError('No cloud given for fleet target {}'.format(
+                spec))
+        return cls(re.sub(r'[^\w.-]+', '-', label), overrides)
+
+    @property
+    def log_path(self):
+        return self.cache_dir / 'output.log'
+
+    def conjurefile(self):
+        """ Returns the Conjurefile contents for this target: the fleet's
+        options with the target's own on top
+        """
+        conf = {k: str(v) if isinstance(v, Path) else v
+                for k, v in app.conjurefile.items()
+                if k not in _PARENT_ONLY_KEYS}
+        conf.update(self.overrides)
+        return conf
+
+    def command(self, conf_path):
+        cmd = [sys.executable, '-m', 'conjureup', '--no-sync',
+               '--spells-dir', app.conjurefile['spells-dir'],
+               '--cache-dir', str(self.cache_dir),
+               '-c', str(conf_path)]
+        for key in ['bundle-add', 'bundle-remove']:
+            if app.conjurefile[key]:
+                cmd += ['--{}'.format(key), str(app.conjurefile[key])]
+        # addons chosen through an alias, which the target doesn't get
+        for addon in app.selected_addons:
+            cmd += ['--addon', addon]
+        cmd.append(app.config['spell-dir'])
+        return cmd
+
+    async def run(self, sem):
+        async with sem:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            conf_path = self.cache_dir / 'Conjurefile'
+            yamlio.dump_file(self.conjurefile(), conf_path)
+            utils.info('[{}] Starting, logging to {}'.format(self.label,
+                                                             self.log_path))
+
+            def _output(line):
+                app.log.debug('[{}] {}'.format(self.label, line.rstrip()))
+
+            self.returncode, _, _ = await utils.arun(
+                self.command(conf_path),
+                stdout=str(self.log_path),
+                stderr=str(self.cache_dir / 'error.log'),
+                cb_stdout=_output)
+        if self.returncode == 0:
+            utils.info('[{}] Completed'.format(self.label))
+        else:
+            utils.error('[{}] Failed, see {} and {}'.format(
+                self.label, self.log_path,
+                self.cache_dir / 'conjure-up.log'))
+
+
+def prefetch_bundle(targets):
+    """ Downloads the spell's bundle from the charmstore once for the
+    whole fleet, rather than once per target
+
+    The bundle is written to the spell, which every target copies, so it
+    is only done when all the targets use the same channel.
+    """
+    if app.metadata.spell_type != spell_types.JUJU or \
+            not app.metadata.bundle_name:
+        return
+    bundle_path = Path(app.config['spell-dir']) / 'bundle.yaml'
+    if bundle_path.exists():
+        return
+    channels = set(target.conjurefile().get('channel') or 'stable'
+                   for target in targets)
+    if len(channels) != 1:
+        return
+    channel = channels.pop()
+    app.log.debug('Pulling bundle for {} from channel {} for the '
+                  'fleet'.format(app.metadata.bundle_name, channel))
+    yamlio.dump_file(charm.get_bundle(app.metadata.bundle_name, channel),
+                     bundle_path)
+
+
+async def run_fleet(targets, jobs):
+    sem = asyncio.Semaphore(jobs)
+    await asyncio.gather(*[target.run(sem) for target in targets])
+    return [target for target in targets if target.returncode != 0]
+
+
+def main(specs, jobs):
+    """ Runs every target of the fleet, returning the exit code
+    """
+    try:
+        targets = [FleetTarget.parse(spec) for spec in specs]
+    except ValueError as e:
+        utils.error(str(e))
+        return 1
+    labels = [target.label for target in targets]
+    duplicates = sorted(set(label for label in labels
+                            if labels.count(label) > 1))
+    if duplicates:
+        utils.error('Duplicate fleet targets: {}'.format(
+            ', '.join(duplicates)))
+        return 1
+
+    if jobs < 1:
+        utils.error('The number of fleet jobs must be at least 1')
+        return 1
+    try:
+        prefetch_bundle(targets)
+    except Exception as e:
+        utils.error('Unable to download the bundle: {}'.format(e))
+        return 1
+
+    utils.info('Deploying {} to {} target(s), {} at a time'.format(
+        app.config['spell'], len(targets), jobs))
+    loop = asyncio.get_event_loop()
+    try:
+        failed = loop.run_until_complete(run_fleet(targets, jobs))
+    finally:
+        loop.close()
+    if failed:
+        utils.error('{} of {} target(s) failed: {}'.format(
+            len(failed), len(targets),
+            ', '.join(target.label for target in failed)))
+        return 1
+    utils.info('All {} target(s) completed'.format(len(targets)))
+    return 0
@@ -8,14 +8,14 @@ from pathlib import Path
 from subprocess import DEVNULL, PIPE, CalledProcessError
 from tempfile import NamedTemporaryFile
 
-import yaml
 from juju.client.jujudata import FileJujuData
 from juju.controller import Controller
 from juju.model import Model
 from melddict import MeldDict
 
-from conjureup import consts, errors, events, utils
+from conjureup import consts, errors, events, utils, yamlio
 from conjureup.app_config import app
+from conjureup.catalogue import CloudCatalogue
 from conjureup.utils import is_linux, juju_path, run, spew
 
 
@@ -83,7 +83,7 @@ def read_config(name):
     abs_path = os.path.join(juju_path(), "{}.yaml".format(name))
     if not os.path.isfile(abs_path):
         raise Exception("Cannot load {}".format(abs_path))
-    return yaml.safe_load(open(abs_path))
+    return yamlio.load_file(abs_path, mutable=True)
 
 
 def get_bootstrap_config(controller_name):
@@ -121,10 +121,8 @@ def get_controller(id):
     Arguments:
     id: controller id
     """
-    if 'controllers' in get_controllers() \
-       and id in get_controllers()['controllers']:
-        return get_controllers()['controllers'][id]
-    return None
+    controllers = get_controllers() or {}
+    return (controllers.get('controllers') or {}).get(id)
 
 
 def get_controller_in_cloud(cloud):
@@ -171,12 +169,21 @@ async def connect_model():
         raise Exception("No model selected.")
 
     app.juju.client = Model(app.loop)
+    _share_charmstore(app.juju.client)
     model_name = '{}:{}'.format(app.provider.controller,
                                 app.provider.model)
     await app.juju.client.connect(model_name)
     events.ModelConnected.set()
 
 
+def _share_charmstore(model):
+    """ Lets the model reuse the charm lookups done while preparing the
+    bundle instead of repeating them from its own charmstore client
+    """
+    if app.juju.charmstore is not None:
+        model._charmstore = app.juju.charmstore
+
+
 async def create_model():
     """ Creates the selected model.
     """
@@ -195,15 +202,15 @@ async def create_model():
             region=app.provider.region,
             credential_name=app.provider.credential,
             config=app.conjurefile.get('model-config', None))
+        _share_charmstore(app.juju.client)
         events.ModelConnected.set()
     finally:
         await controller.disconnect()
 
 
-async def bootstrap(controller, cloud, model='conjure-up', credential=None):
-    """ Performs juju bootstrap
-
-    If not LXD pass along the newly defined credentials
+def bootstrap_cmd(controller, cloud, model='conjure-up', credential=None):
+    """ Returns the juju bootstrap command line for the current provider
+    and conjurefile
 
     Arguments:
     controller: name of your controller
@@ -251,6 +258,21 @@ async def bootstrap(controller, cloud, model='conjure-up', credential=None):
 
     if app.conjurefile['debug']:
         cmd.append("--debug")
+    return cmd
+
+
+async def bootstrap(controller, cloud, model='conjure-up', credential=None):
+    """ Performs juju bootstrap
+
+    If not LXD pass along the newly defined credentials
+
+    Arguments:
+    controller: name of your controller
+    cloud: name of local or public cloud to deploy to
+    model: name of default model to create
+    credential: credentials key
+    """
+    cmd = bootstrap_cmd(controller, cloud, model, credential)
     app.log.debug("bootstrap cmd: {}".format(cmd))
 
     log_file = '{}-bootstrap'.format(app.provider.controller)
@@ -323,6 +345,8 @@ def autoload_credentials():
             app.juju.bin_path), shell=True, check=True)
     except CalledProcessError:
         return False
+    finally:
+        catalogue.invalidate(clouds=False)
     return True
 
 
@@ -358,6 +382,10 @@ def get_credentials():
     Returns:
     Dict of credentials by cloud.
     """
+    return catalogue.credentials()
+
+
+def _read_credentials():
     try:
         return FileJujuData().credentials()
     except FileNotFoundError:
@@ -373,6 +401,10 @@ def get_regions(cloud):
     Returns:
     Dictionary of all known regions for cloud
     """
+    return catalogue.regions(cloud)
+
+
+def _list_regions(cloud):
     sh = run('{} list-regions {} --format yaml'.format(app.juju.bin_path,
                                                        cloud),
              shell=True, stdout=PIPE, stderr=PIPE)
@@ -382,7 +414,7 @@ def get_regions(cloud):
         raise Exception("Unable to list regions: {}".format(stderr))
     if 'no regions' in stdout:
         return {}
-    result = yaml.safe_load(stdout)
+    result = yamlio.load(stdout)
     if not isinstance(result, dict):
         msg = 'Unexpected response from regions: {}'.format(result)
         app.log.error(msg)
@@ -397,13 +429,19 @@ def get_clouds():
     Returns:
     Dictionary of all known clouds including newly created MAAS/Local
     """
-    sh = run('{} list-clouds --local --format yaml'.format(app.juju.bin_path),
-             shell=True, stdout=PIPE, stderr=PIPE)
+    return catalogue.clouds()
+
+
+def _list_clouds():
+    cmd = '{} list-clouds --format yaml'.format(app.juju.bin_path)
+    if utils.juju_supports('list-clouds-local'):
+        cmd += ' --local'
+    sh = run(cmd, shell=True, stdout=PIPE, stderr=PIPE)
     if sh.returncode > 0:
         raise Exception(
             "Unable to list clouds: {}".format(sh.stderr.decode('utf8'))
         )
-    return yaml.safe_load(sh.stdout.decode('utf8')) or {}
+    return yamlio.load(sh.stdout.decode('utf8')) or {}
 
 
 def get_compatible_clouds(cloud_types=None):
@@ -440,7 +478,7 @@ def get_compatible_clouds(cloud_types=None):
     addons_dir = Path(app.config['spell-dir']) / 'addons'
     for addon in app.selected_addons:
         addon_file = addons_dir / addon / 'metadata.yaml'
-        addon_meta = yaml.safe_load(addon_file.read_text())
+        addon_meta = yamlio.load_file(addon_file)
         whitelist.update(addon_meta.get('cloud-whitelist', []))
         blacklist.update(addon_meta.get('cloud-blacklist', []))
 
@@ -511,7 +549,7 @@ def add_cloud(name, config):
     app.log.debug(_config)
     with NamedTemporaryFile(mode='w', encoding='utf-8',
                             delete=False) as tempf:
-        output = yaml.safe_dump(_config, default_flow_style=False)
+        output = yamlio.dump(_config)
         spew(tempf.name, output)
         sh = run('{} add-cloud {} {}'.format(app.juju.bin_path,
                                              name, tempf.name),
@@ -519,6 +557,7 @@ def add_cloud(name, config):
         if sh.returncode > 0:
             raise Exception(
                 "Unable to add cloud: {}".format(sh.stderr.decode('utf8')))
+    catalogue.invalidate(credentials=False)
 
 
 def get_cloud(name):
@@ -529,11 +568,15 @@ def get_cloud(name):
     Returns:
     Dictionary of cloud attributes
     """
-    if name in get_clouds().keys():
-        return get_clouds()[name]
+    clouds = get_clouds()
+    if name in clouds:
+        return clouds[name]
     raise LookupError("Unable to locate cloud: {}".format(name))
 
 
+catalogue = CloudCatalogue(_list_clouds, _read_credentials, _list_regions)
+
+
 def constraints_to_dict(constraints):
     """
     Parses a constraint string into a dict. If tags and spaces are found they
@@ -595,8 +638,8 @@ def get_controller_info(name=None):
     sh_out = sh.stdout.decode('utf8')
     sh_err = sh.stderr.decode('utf8')
     try:
-        data = yaml.safe_load(sh_out)
-    except yaml.parser.ParserError:
+        data = yamlio.load(sh_out)
+    except yamlio.YAMLError:
         data = None
     if sh.returncode != 0 or not data:
         raise Exception("Unable to get info for "
@@ -616,7 +659,7 @@ def get_controllers():
     if sh.returncode > 0:
         raise LookupError(
             "Unable to list controllers: {}".format(sh.stderr.decode('utf8')))
-    env = yaml.safe_load(sh.stdout.decode('utf8'))
+    env = yamlio.load(sh.stdout.decode('utf8'))
     return env
 
 
@@ -645,7 +688,7 @@ def get_accounts():
         raise Exception(
             "Unable to find: {}".format(env))
     with open(env, 'r') as c:
-        env = yaml.load(c)
+        env = yamlio.load(c)
         return env['controllers']
     raise Exception("Unable to find accounts")
 
@@ -668,23 +711,48 @@ def get_model(controller, name):
         "Unable to find model: {}".format(name))
 
 
-async def destroy_model(controller, model):
+async def destroy_model(controller, model, wait=True, poll_interval=5):
     """ Destroys a model within a controller
 
     Arguments:
     controller: name of controller
     model: name of model to destroy
+    wait: wait for the model to be removed, otherwise return as soon as
+          the controller reports the model as dying
+    poll_interval: seconds between checks for a dying model
     """
     proc = await asyncio.create_subprocess_exec(
         'juju', 'destroy-model', '-y', ':'.join([controller, model]),
         stdout=DEVNULL, stderr=PIPE)
-    _, stderr = await proc.communicate()
+    communicate = asyncio.ensure_future(proc.communicate())
+    while not wait:
+        done, _ = await asyncio.wait([communicate], timeout=poll_interval)
+        if done:
+            break
+        if await _is_model_dying(controller, model):
+            # the controller carries on with the removal on its own
+            proc.terminate()
+            communicate.cancel()
+            await proc.wait()
+            return
+    _, stderr = await communicate
     if proc.returncode > 0:
         raise Exception(
             "Unable to destroy model: {}".format(stderr.decode('utf8')))
     events.ModelAvailable.clear()
 
 
+async def _is_model_dying(controller, model):
+    try:
+        models = (await list_models(controller, 30))['models']
+    except (asyncio.TimeoutError, LookupError):
+        return False
+    for m in models:
+        if m.get('short-name', m['name']) == model:
+            return m['life'] == 'dying'
+    return True
+
+
 def get_models(controller):
     """ List available models
 
@@ -700,10 +768,36 @@ def get_models(controller):
     if sh.returncode > 0:
         raise LookupError(
             "Unable to list models: {}".format(sh.stderr.decode('utf8')))
-    out = yaml.safe_load(sh.stdout.decode('utf8'))
+    out = yamlio.load(sh.stdout.decode('utf8'))
     return out
 
 
+async def list_models(controller, timeout=None):
+    """ List available models without blocking the event loop
+
+    Arguments:
+    controller: existing controller to get models for
+    timeout: seconds to wait for the controller to answer, after which
+             juju is killed and asyncio.TimeoutError raised
+
+    Returns:
+    List of known models
+    """
+    proc = await asyncio.create_subprocess_exec(
+        app.juju.bin_path, 'list-models', '--format', 'yaml',
+        '-c', controller, stdout=PIPE, stderr=PIPE)
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        proc.kill()
+        await proc.wait()
+        raise
+    if proc.returncode > 0:
+        raise LookupError(
+            "Unable to list models: {}".format(stderr.decode('utf8')))
+    return yamlio.load(stdout.decode('utf8'))
+
+
 def get_current_model():
     try:
         return get_models()['current-model']
@@ -714,17 +808,7 @@ def get_current_model():
 def version():
     """ Returns version of Juju
     """
-    sh = run('{} version'.format(
-        app.juju.bin_path),
-        shell=True, stdout=PIPE, stderr=PIPE)
-    if sh.returncode > 0:
-        raise Exception(
-            "Unable to get Juju Version: {}".format(sh.stderr.decode('utf8')))
-    out = sh.stdout.decode('utf8')
-    if isinstance(out, list):
-        return out.pop()
-    else:
-        return out
+    return str(utils.juju_version())
 
 
 async def wait_for_deployment(retries=3):
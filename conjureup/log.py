@@ -1,49 +1,170 @@
+""" Logging setup
+
+Records are handed to a queue on the thread that logs them, and written
+to the log file and syslog by a background thread, so logging never
+blocks the event loop on disk or syslog I/O. Whatever is still queued is
+written out when the process exits.
+
+The log file is plain text, or JSON lines with the context set by
+set_context() (such as the controller being rendered) in every entry.
+"""
+
+import atexit
+import json
 import logging
 import os
+import queue
 import stat
-from logging.handlers import SysLogHandler, TimedRotatingFileHandler
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    SysLogHandler,
+    TimedRotatingFileHandler
+)
 
 from conjureup import consts
 
+LOG_LEVELS = ['debug', 'info', 'warning', 'error']
+LOG_FORMATS = ['text', 'json']
+
+_context = {}
+_listener = None
+
+
+def set_context(**fields):
+    """ Adds fields to the context of the following records, a field set
+    to None is removed
+    """
+    global _context
+    context = dict(_context, **fields)
+    # replaced rather than updated, records refer to the one they got
+    _context = {k: v for k, v in context.items() if v is not None}
+
+
+class JSONFormatter(logging.Formatter):
+    """ Formats records as JSON objects, one per line
+    """
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'name': record.name,
+            'file': record.filename,
+            'line': record.lineno,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'context', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        # only the message is merged with its arguments here, as they may
+        # change before the writer thread gets to them; the rest of the
+        # formatting, tracebacks included, happens on that thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class _AppFilter(logging.Filter):
+    """ Passes the records of the conjure-up logger
+    """
+
+    def filter(self, record):
+        return getattr(record, 'app', False)
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
 
-def setup_logging(app, logfile, debug=True):
+
+def setup_logging(app, logfile, debug=True, level=None, fmt='text'):
+    """ Sets up logging to logfile and syslog
+
+    debug: log records of other libraries at DEBUG rather than INFO
+    level: level of all records, overriding debug
+    fmt: 'text' or 'json' (see LOG_FORMATS)
+    """
     old_factory = logging.getLogRecordFactory()
+    names = {}
 
     def spell_record_factory(*args, **kwargs):
         record = old_factory(*args, **kwargs)
-        if record.name != 'conjure-up':
+        record.app = record.name == 'conjure-up'
+        if not record.app:
             record.filename = '{}: {}'.format(record.name, record.filename)
         spell_name = app.config.get('spell', consts.UNSPECIFIED_SPELL)
-        record.name = 'conjure-up/{}'.format(spell_name)
+        name = names.get(spell_name)
+        if name is None:
+            name = names[spell_name] = 'conjure-up/{}'.format(spell_name)
+        record.name = name
+        record.context = _context
         return record
 
+    if getattr(old_factory, 'conjure_up', False):
+        # set up again, wrap the factory conjure-up replaced
+        old_factory = old_factory.conjure_up
+    spell_record_factory.conjure_up = old_factory
     logging.setLogRecordFactory(spell_record_factory)
 
     cmdslog = TimedRotatingFileHandler(logfile,
                                        when='D',
                                        interval=1,
                                        backupCount=7)
-    cmdslog.setFormatter(logging.Formatter(
-        "%(asctime)s [%(levelname)s] %(name)s - "
-        "%(filename)s:%(lineno)d - %(message)s"))
+    if fmt == 'json':
+        cmdslog.setFormatter(JSONFormatter())
+    else:
+        cmdslog.setFormatter(logging.Formatter(
+            "%(asctime)s [%(levelname)s] %(name)s - "
+            "%(filename)s:%(lineno)d - %(message)s"))
+    handlers = [cmdslog]
+
+    if os.path.exists('/dev/log'):
+        st_mode = os.stat('/dev/log').st_mode
+        if stat.S_ISSOCK(st_mode):
+            syslog_h = SysLogHandler(address='/dev/log')
+            syslog_h.set_name('conjure-up')
+            syslog_h.addFilter(_AppFilter())
+            handlers.append(syslog_h)
 
     root_logger = logging.getLogger()
     app_logger = logging.getLogger('conjure-up')
 
-    if debug:
+    if level is not None:
+        level = logging.getLevelName(level.upper()) \
+            if isinstance(level, str) else level
+        app_logger.setLevel(level)
+        root_logger.setLevel(level)
+    elif debug:
         app_logger.setLevel(logging.DEBUG)
         root_logger.setLevel(logging.DEBUG)
     else:
-        # always use DEBUG level for app, for now
+        # always use DEBUG level for app, unless told otherwise
         app_logger.setLevel(logging.DEBUG)
         root_logger.setLevel(logging.INFO)
 
-    root_logger.addHandler(cmdslog)
-    if os.path.exists('/dev/log'):
-        st_mode = os.stat('/dev/log').st_mode
-        if stat.S_ISSOCK(st_mode):
-            syslog_h = SysLogHandler(address='/dev/log')
-            syslog_h.set_name('conjure-up')
-            app_logger.addHandler(syslog_h)
+    global _listener
+    if _listener is None:
+        atexit.register(_stop_listener)
+    else:
+        _stop_listener()
+    for handler in root_logger.handlers[:]:
+        if isinstance(handler, _QueueHandler):
+            root_logger.removeHandler(handler)
+
+    records = queue.Queue()
+    root_logger.addHandler(_QueueHandler(records))
+    _listener = QueueListener(records, *handlers,
+                              respect_handler_level=True)
+    _listener.start()
 
     return app_logger
@@ -1,8 +1,7 @@
 from itertools import chain
 from pathlib import Path
 
-import yaml
-
+from conjureup import registry, yamlio
 from conjureup.app_config import app
 from conjureup.models.step import StepModel
 
@@ -15,6 +14,11 @@ class AddonModel:
         """
         app.addons.clear()
         app.selected_addons.clear()
+        compiled = registry.current_spell()
+        if compiled is not None:
+            for name, addon in sorted(compiled['addons'].items()):
+                app.addons[name] = AddonModel(name, addon)
+            return
         addons_dir = Path(app.config['spell-dir']) / 'addons'
         for addon_path in sorted(addons_dir.glob('*')):
             if addon_path.is_dir():
@@ -29,9 +33,21 @@ class AddonModel:
         return list(chain.from_iterable(
             addon.steps for addon in cls.selected_addons()))
 
-    def __init__(self, name):
+    def __init__(self, name, compiled=None):
+        """ Loads an addon, from its compiled version (see registry.py) if
+        given, otherwise from the spell directory
+        """
         self.name = name
         self.path = Path(app.config['spell-dir']) / 'addons' / name
+        if compiled is not None:
+            self.metadata = compiled['metadata']
+            self.bundle = compiled['bundle']
+            self.steps = [StepModel.load(self.path / 'steps' / step['name'],
+                                         source=self.friendly_name,
+                                         addon_name=name,
+                                         manifest=step)
+                          for step in compiled['steps']]
+            return
         self.metadata = self._read('metadata.yaml')
         self.bundle = self._read('bundle.yaml')
         self.steps = [StepModel.load(step_path,
@@ -45,7 +61,7 @@ class AddonModel:
         filepath = self.path / filename
         if not filepath.exists():
             return {}
-        return yaml.safe_load(filepath.read_text())
+        return yamlio.load_file(filepath, mutable=True)
 
     @property
     def friendly_name(self):
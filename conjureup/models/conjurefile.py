@@ -1,9 +1,16 @@
 import textwrap
 from pathlib import Path
 
-import yaml
 from melddict import MeldDict
 
+from conjureup import log, yamlio
+
+# Options whose values, from a Conjurefile too, must be one of these
+CHOICES = {
+    'log-level': log.LOG_LEVELS,
+    'log-format': log.LOG_FORMATS,
+}
+
 
 class ConjurefileException(Exception):
     pass
@@ -36,6 +43,14 @@ class Conjurefile(MeldDict):
     # controller.
     # controller: us-dc1
 
+    # (Optional) Controllers to reuse instead of bootstrapping a new one.
+    # Any controller matching one of these names or globs on the target
+    # cloud/region, which answers quickly and hosts fewer than
+    # controller-pool-max-models models, may be used.
+    # controller-pool:
+    #   - warm-aws-*
+    # controller-pool-max-models: 20
+
     # (Optional) Model name. This can be any arbitrary name of your Juju Model
     # model: k8s-1
 
@@ -73,6 +88,11 @@ class Conjurefile(MeldDict):
     # Debugging
     debug: false
 
+    # Logging: level of the records logged (debug, info, warning, error),
+    # and whether the log is written as text or as JSON lines
+    # log-level: info
+    # log-format: json
+
     # Reporting
     # no-track: false
     # no-report: false
@@ -105,13 +125,19 @@ class Conjurefile(MeldDict):
     # Add a Juju bundle fragment overlay
     # bundle-add: /home/user/my-bundle-fragment.yaml
 
+    # (Optional) Snap cache limits for snap spells. Snaps not used for
+    # snap-cache-max-age days are pruned, then the least recently used ones
+    # until the cache fits in snap-cache-max-size bytes.
+    # snap-cache-max-size: 5368709120
+    # snap-cache-max-age: 30
+
     # (Optional) Bundle Remove
     # Remove a section of a spells bundle fragment
     # bundle-remove: /home/user/my-bundle-remove-fragment.yaml
     """
 
     def __init__(self):
-        initial_data = yaml.safe_load(
+        initial_data = yamlio.load(
             textwrap.dedent(Conjurefile.__doc__.strip()))
         super().__init__(self.add(initial_data))
 
@@ -132,7 +158,7 @@ class Conjurefile(MeldDict):
         cf = Conjurefile()
         for p in paths:
             try:
-                new_data = yaml.safe_load(p.read_text())
+                new_data = yamlio.load(p.read_text())
                 if not isinstance(new_data, dict):
                     raise ValueError('contents are not a mapping')
             except Exception as e:
@@ -144,6 +170,9 @@ class Conjurefile(MeldDict):
         """
         Overrides options in the conjurefile with
         those passed in via sys.argv
+
+        Raises ValueError if an option listed in CHOICES, from either,
+        isn't one of its choices.
         """
         argv_dict = vars(argv)
         defaults_dict = vars(defaults)
@@ -158,6 +187,10 @@ class Conjurefile(MeldDict):
             else:
                 # opt was overridden, so CLI takes precedence
                 self[fk] = v
+        for k, choices in CHOICES.items():
+            if self.get(k) is not None and self[k] not in choices:
+                raise ValueError('Invalid {} {!r}, choose from {}'.format(
+                    k, self[k], ', '.join(choices)))
 
     @property
     def is_valid(self):
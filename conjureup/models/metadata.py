@@ -3,8 +3,7 @@
 This is the information found metadata.yaml in the
 current spells top-level directory
 """
-import yaml
-
+from conjureup import yamlio
 from conjureup.consts import spell_types
 
 
@@ -63,6 +62,5 @@ class SpellMetadata(dict):
         """ Load spell metadata
         """
         if path.exists():
-            return SpellMetadata(
-                yaml.safe_load(path.read_text()))
+            return SpellMetadata(yamlio.load_file(path, mutable=True))
         raise SpellMetadataException("Unable to parse spell metadata.")
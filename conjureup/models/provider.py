@@ -1,11 +1,15 @@
+import asyncio
 import ipaddress
 import json
+import os
+import socket
 from collections import OrderedDict
 from functools import partial
 from pathlib import Path
 from subprocess import CalledProcessError
 from urllib.parse import urljoin, urlparse
 
+import websockets
 from pkg_resources import parse_version
 from ubuntui.widgets.input import PasswordEditor, StringEditor, YesNo
 from urwid import Text
@@ -328,6 +332,129 @@ class MAAS(BaseProvider):
         return (True, None)
 
 
+class LXDAPIError(Exception):
+    "An error response from the LXD API"
+
+
+class LXDClient:
+    """ Client for the LXD REST API over its unix socket
+
+    Requests are made over a single persistent HTTP/1.1 connection, which
+    is reopened if LXD closes it.
+    """
+
+    def __init__(self, socket_path):
+        self.socket_path = str(socket_path)
+        self._reader = None
+        self._writer = None
+        self._lock = None
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+
+    async def query(self, url, method='GET', body=None):
+        """ Performs a request and returns the response metadata
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            for attempt in range(2):
+                reconnected = self._writer is None
+                if reconnected:
+                    self._reader, self._writer = \
+                        await asyncio.open_unix_connection(self.socket_path)
+                try:
+                    response = await self._request(method, url, body)
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    self.close()
+                    # only retry if a previously open connection went stale
+                    if reconnected or attempt > 0:
+                        raise
+        if response.get('type') == 'error':
+            raise LXDAPIError('{} {}: {}'.format(method, url,
+                                                 response.get('error')))
+        return response.get('metadata')
+
+    async def _request(self, method, url, body):
+        data = b'' if body is None else json.dumps(body).encode('utf8')
+        request = ('{} {} HTTP/1.1\r\n'
+                   'Host: lxd\r\n'
+                   'Content-Type: application/json\r\n'
+                   'Content-Length: {}\r\n\r\n').format(method, url, len(data))
+        self._writer.write(request.encode('utf8') + data)
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionResetError('LXD closed the connection')
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self._reader.readline()).split(b';')[0], 16)
+                chunk = await self._reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            payload = b''.join(chunks)
+        elif 'content-length' in headers:
+            payload = await self._reader.readexactly(
+                int(headers['content-length']))
+        else:
+            payload = await self._reader.read()
+            headers['connection'] = 'close'
+
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return json.loads(payload.decode('utf8'))
+
+    async def wait_for_event(self, timeout, actions=None):
+        """ Waits up to timeout seconds for LXD to report a lifecycle event
+        on its /1.0/events stream, or for the stream to be closed by LXD
+
+        actions: prefixes of the lifecycle actions to wait for, e.g.
+                 'network-', any action if not given
+        """
+        loop = asyncio.get_event_loop()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            await loop.sock_connect(sock, self.socket_path)
+            # logging and operation events are sent for any activity of
+            # any container, only lifecycle ones say what changed
+            ws = await websockets.connect(
+                'ws://lxd/1.0/events?type=lifecycle', sock=sock)
+        except Exception:
+            sock.close()
+            raise
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                event = await asyncio.wait_for(ws.recv(),
+                                               deadline - loop.time())
+                try:
+                    action = json.loads(event)['metadata']['action']
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if actions is None or action.startswith(tuple(actions)):
+                    return
+        except (asyncio.TimeoutError, websockets.ConnectionClosed):
+            pass
+        finally:
+            await ws.close()
+
+
 class Localhost(BaseProvider):
     def __init__(self):
         super().__init__()
@@ -337,11 +464,23 @@ class Localhost(BaseProvider):
         self.minimum_support_version = parse_version('3.0.0')
         self.available = False
         self.lxc_bin = None
+        self.lxd_socket_dir = None
+        self._lxd_client = None
+        # lxc binaries found compatible, see is_client_compatible
+        self._compatible_lxc_bins = set()
 
     def _set_lxd_dir_env(self):
         """ Sets and updates correct environment
+
+        $LXC and $LXD_DIR, when set, take precedence over the installed
+        LXD, as $JUJU does for juju.
         """
-        if Path('/snap/bin/lxd').exists():
+        if os.environ.get('LXC'):
+            self.lxd_socket_dir = Path(os.environ.get(
+                'LXD_DIR', '/var/snap/lxd/common/lxd'))
+            app.env['LXD_DIR'] = str(self.lxd_socket_dir)
+            self.lxc_bin = os.environ['LXC']
+        elif Path('/snap/bin/lxd').exists():
             self.lxd_socket_dir = Path('/var/snap/lxd/common/lxd')
             app.env['LXD_DIR'] = str(self.lxd_socket_dir)
             self.lxc_bin = '/snap/bin/lxc'
@@ -354,6 +493,18 @@ class Localhost(BaseProvider):
         app.log.debug("LXD environment set: binary {} lxd_dir {}".format(
             self.lxc_bin, self.lxd_socket_dir))
 
+    @property
+    def lxd_client(self):
+        """ LXD API client bound to the socket in the current LXD_DIR
+        """
+        socket_path = self.lxd_socket_dir / 'unix.socket'
+        if self._lxd_client is None or \
+           self._lxd_client.socket_path != str(socket_path):
+            if self._lxd_client is not None:
+                self._lxd_client.close()
+            self._lxd_client = LXDClient(socket_path)
+        return self._lxd_client
+
     async def query(self, segment='', method="GET"):
         """ Query lxc api server
 
@@ -364,33 +515,24 @@ class Localhost(BaseProvider):
         else:
             segment_prefix = Path('/1.0')
             url = str(segment_prefix / segment)
-        out, err = None, None
+        if self.lxd_socket_dir is None:
+            raise errors.LXDBinaryNotFoundError()
+        app.log.debug("LXD query: {} {}".format(method, url))
         try:
-            if not self.lxc_bin:
-                raise errors.LXDBinaryNotFoundError()
-            cmd = [self.lxc_bin, 'query', '--wait', url]
-            app.log.debug("LXD query cmd: {}".format(" ".join(cmd)))
-            _, out, err = await utils.arun(cmd)
-            return json.loads(out)
-        except json.decoder.JSONDecodeError:
-            # log what we got for out and err; it's possible the user may
-            # get a different result when they run it manually
-            app.log.error('LXD Parse error: stdout: {}'.format(out))
-            app.log.error('LXD Parse error: stderr: {}'.format(err))
+            return await self.lxd_client.query(url, method)
+        except ValueError as e:
+            app.log.error('LXD Parse error: {}'.format(e))
             raise errors.LXDParseError(self.lxc_bin)
-        except FileNotFoundError:
-            raise errors.LXDBinaryNotFoundError()
-        except CalledProcessError as e:
+        except (OSError, asyncio.IncompleteReadError, LXDAPIError) as e:
             app.log.error(e)
             raise errors.LXDCompatibilityError()
 
     async def get_networks(self):
         """ Grabs lxc network bridges from api
         """
-        networks = await self.query('networks')
+        networks = await self.query('networks?recursion=1')
         bridges = OrderedDict()
-        for net in networks:
-            net_info = await self.query(net)
+        for net_info in networks:
             if 'config' in net_info and 'ipv6.address' in net_info['config']:
                 # Juju doesn't support ipv6
                 if net_info['config']['ipv6.address'] != 'none':
@@ -404,12 +546,11 @@ class Localhost(BaseProvider):
     async def get_storage_pools(self):
         """ Grabs lxc storage pools from api
         """
-        pools = await self.query('storage-pools')
+        pools = await self.query('storage-pools?recursion=1')
         _pools = OrderedDict()
         for pool in pools:
-            pool_path = Path(pool)
-            _pools[pool_path.stem] = await self.query(pool)
-            if pool_path.stem == 'default':
+            _pools[pool['name']] = pool
+            if pool['name'] == 'default':
                 _pools.move_to_end('default', last=False)
         return _pools
 
@@ -426,18 +567,45 @@ class Localhost(BaseProvider):
         except errors.LXDError:
             return False
 
+    async def wait_for_change(self, timeout):
+        """ Waits for LXD to change its networks or storage pools, or to
+        be restarted
+
+        Returns False without waiting if the LXD socket can't be reached.
+        """
+        if self.lxd_socket_dir is None:
+            return False
+        try:
+            await self.lxd_client.wait_for_event(
+                timeout, actions=['network-', 'storage-pool-'])
+        except (OSError, websockets.InvalidHandshake) as e:
+            app.log.debug("Unable to watch LXD events: {}".format(e))
+            return False
+        return True
+
     async def is_client_compatible(self):
         """ Checks if LXC version is compatible with conjure-up
+
+        A compatible binary is remembered for the life of this provider,
+        as the clouds screen checks again on every LXD event. An
+        incompatible one is checked again every time, so that refreshing
+        the lxd snap is noticed.
         """
+        if self.lxc_bin in self._compatible_lxc_bins:
+            return True
         try:
             _, out, err = await utils.arun([self.lxc_bin, '--version'])
             server_ver = out.strip()
-            return parse_version(server_ver) >= self.minimum_support_version
+            compatible = (parse_version(server_ver) >=
+                          self.minimum_support_version)
         except FileNotFoundError:
             return False
         except CalledProcessError as e:
             app.log.error(e)
             return False
+        if compatible:
+            self._compatible_lxc_bins.add(self.lxc_bin)
+        return compatible
 
 
 class Azure(BaseProvider):
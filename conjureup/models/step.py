@@ -1,12 +1,12 @@
 """ Step model
 """
-import os
+from collections import ChainMap
 from pathlib import Path
+from types import MappingProxyType
 
 import aiofiles
-import yaml
 
-from conjureup import juju
+from conjureup import checkpoint, juju, registry
 from conjureup.app_config import app
 from conjureup.consts import PHASES, spell_types
 from conjureup.telemetry import track_event
@@ -19,6 +19,15 @@ class StepModel:
         spell_name = app.metadata.friendly_name
         steps_dir = Path(app.config['spell-dir']) / 'steps'
         app.steps = []
+        compiled = registry.current_spell()
+        if compiled is not None:
+            for manifest in compiled['steps']:
+                step = StepModel.load(steps_dir / manifest['name'],
+                                      source=spell_name,
+                                      manifest=manifest)
+                app.steps.append(step)
+            app.log.debug('steps: {}'.format(app.steps))
+            return
         for step_dir in sorted(steps_dir.glob('*')):
             if not step_dir.is_dir():
                 continue
@@ -27,16 +36,20 @@ class StepModel:
         app.log.debug('steps: {}'.format(app.steps))
 
     @classmethod
-    def load(cls, step_meta_path, source, addon_name=None):
+    def load(cls, step_meta_path, source, addon_name=None, manifest=None):
+        """ Loads a step from its compiled manifest (see registry.py),
+        compiling it from the step directory if not given
+        """
         step_name = step_meta_path.stem
         step_ex_path = step_meta_path.parent / step_name
-        if not (step_ex_path / 'metadata.yaml').is_file():
+        if manifest is None:
+            manifest = registry.compile_step(step_ex_path)
+        if manifest['metadata'] is None:
             raise ValidationError(
                 'The {} step {} has no metadata'.format(source, step_name))
-        step_metadata = yaml.load(
-            (step_meta_path / 'metadata.yaml').read_text())
-        step = StepModel(step_metadata, step_name, step_ex_path, source)
-        if not any(step._has_phase(phase) for phase in PHASES):
+        step = StepModel(manifest['metadata'], step_name, step_ex_path,
+                         source, manifest['phases'])
+        if not step.phases:
             raise ValidationError(
                 'The {} step {} has no implementation'.format(source,
                                                               step_name))
@@ -59,7 +72,18 @@ class StepModel:
             step.set_state('result', None, phase)
         return step
 
-    def __init__(self, step, name, step_path, source):
+    def __init__(self, step, name, step_path, source, phases=None):
+        """
+        phases: mapping of the phases the step implements to whether
+                their script is executable, as found in its manifest.
+                The step directory is probed if not given.
+        """
+        if phases is None:
+            phases = registry.step_phases(step_path)
+        # all later phase checks are answered from here, without touching
+        # the filesystem again
+        self.phases = {PHASES(phase): executable
+                       for phase, executable in phases.items()}
         self.title = step.get('title', '')
         self.description = step.get('description', '')
         self.result = ''
@@ -80,7 +104,7 @@ class StepModel:
         return self.step_path / phase.value
 
     def _has_phase(self, phase):
-        return self._build_phase_path(phase).is_file()
+        return phase in self.phases
 
     @property
     def has_validate_input(self):
@@ -194,19 +218,70 @@ class StepModel:
             return None
         return bundle_remove_path
 
-    async def run(self, phase, msg_cb, event_name=None):
+    def phase_env(self, phase):
+        """ Returns the environment a phase of this step runs with
+
+        The step inputs are layered over the provider and the step's own
+        variables, over app.env. The result is a read-only snapshot and
+        app.env is left untouched, so steps can run side by side.
+        """
         # Define STEP_NAME for use in determining where to store
         # our step results,
         #  state set "conjure-up.$SPELL_NAME.$STEP_NAME.result" "val"
-        app.env['CONJURE_UP_STEP'] = self.name
-        app.env['CONJURE_UP_PHASE'] = phase.value
+        step_env = {
+            'CONJURE_UP_STEP': self.name,
+            'CONJURE_UP_PHASE': phase.value,
+            'CONJURE_UP_SPELLSDIR': app.conjurefile['spells-dir'],
+            'CONJURE_UP_SESSION_ID': app.session_id,
+        }
+
+        provider_env = {}
+        if app.metadata.spell_type == spell_types.JUJU:
+            cloud_types = juju.get_cloud_types_by_name()
+            provider_type = cloud_types[app.provider.cloud]
+
+            provider_env['JUJU_CLOUD'] = app.provider.cloud or ''
+            provider_env['JUJU_PROVIDERTYPE'] = provider_type
+            # not all providers have a credential, e.g., localhost
+            provider_env['JUJU_CREDENTIAL'] = app.provider.credential or ''
+            provider_env['JUJU_CONTROLLER'] = app.provider.controller
+            provider_env['JUJU_MODEL'] = app.provider.model
+            provider_env['JUJU_REGION'] = app.provider.region or ''
+
+            if provider_type == "maas":
+                provider_env['MAAS_ENDPOINT'] = app.maas.endpoint
+                provider_env['MAAS_APIKEY'] = app.maas.api_key
+
+        inputs = {}
+        for step_name, step_data in app.steps_data.items():
+            for key, value in step_data.items():
+                inputs[key.upper()] = str(value)
+
+        env = {}
+        for key, value in ChainMap(inputs, provider_env, step_env,
+                                   app.env).items():
+            if value is None:
+                app.log.warning('Env {} is None; '
+                                'replacing with empty string'.format(key))
+                value = ''
+            env[key] = value
+        return MappingProxyType(env)
 
+    async def run(self, phase, msg_cb, event_name=None):
         step_path = self._build_phase_path(phase)
 
-        if not step_path.is_file():
+        if not self._has_phase(phase):
             return
 
-        if not os.access(str(step_path), os.X_OK):
+        done = checkpoint.resumed(checkpoint.step_checkpoint(self, phase))
+        if done is not None:
+            msg = "Skipping {} step: {} {}, done by a previous run.".format(
+                self.source, self.name, phase.value)
+            app.log.info(msg)
+            msg_cb(msg)
+            return done['result']
+
+        if not self.phases[phase]:
             app.log.error(
                 'Unable to run {} step {} {}, it is not executable'.format(
                     self.source, step_path.stem, phase.value))
@@ -230,40 +305,14 @@ class StepModel:
                 'passwordless sudo required',
             ))
 
-        app.env['CONJURE_UP_SPELLSDIR'] = app.conjurefile['spells-dir']
-        app.env['CONJURE_UP_SESSION_ID'] = app.session_id
-
-        if app.metadata.spell_type == spell_types.JUJU:
-            cloud_types = juju.get_cloud_types_by_name()
-            provider_type = cloud_types[app.provider.cloud]
-
-            app.env['JUJU_CLOUD'] = app.provider.cloud or ''
-            app.env['JUJU_PROVIDERTYPE'] = provider_type
-            # not all providers have a credential, e.g., localhost
-            app.env['JUJU_CREDENTIAL'] = app.provider.credential or ''
-            app.env['JUJU_CONTROLLER'] = app.provider.controller
-            app.env['JUJU_MODEL'] = app.provider.model
-            app.env['JUJU_REGION'] = app.provider.region or ''
-
-            if provider_type == "maas":
-                app.env['MAAS_ENDPOINT'] = app.maas.endpoint
-                app.env['MAAS_APIKEY'] = app.maas.api_key
-
-        for step_name, step_data in app.steps_data.items():
-            for key, value in step_data.items():
-                app.env[key.upper()] = str(step_data[key])
-
-        for key, value in app.env.items():
-            if value is None:
-                app.log.warning('Env {} is None; '
-                                'replacing with empty string'.format(key))
-                app.env[key] = ''
+        env = self.phase_env(phase)
 
         app.log.debug("Storing environment")
+        stored = ''.join('{}="{}" '.format(k.upper(), v)
+                         for k, v in env.items()
+                         if 'JUJU' in k or 'MAAS' in k or 'CONJURE' in k)
         async with aiofiles.open(step_path + ".env", 'w') as outf:
-            for k, v in app.env.items():
-                if 'JUJU' in k or 'MAAS' in k or 'CONJURE' in k:
-                    await outf.write("{}=\"{}\" ".format(k.upper(), v))
+            await outf.write(stored)
 
         app.log.debug("Executing script: {}".format(step_path))
 
@@ -272,6 +321,7 @@ class StepModel:
         ret, out_log, err_log = await arun([step_path],
                                            stdout=out_path,
                                            stderr=err_path,
+                                           env=env,
                                            cb_stdout=msg_cb)
 
         if ret != 0:
@@ -302,7 +352,10 @@ class StepModel:
         if event_name is not None:
             track_event(event_name, "Done", "")
 
-        return self.get_state('result', phase)
+        result = self.get_state('result', phase)
+        checkpoint.record(checkpoint.step_checkpoint(self, phase),
+                          result=result)
+        return result
 
 
 class ValidationError(Exception):
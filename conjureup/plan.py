@@ -0,0 +1,145 @@
+""" Deployment planner
+
+Works out what a headless run would do from the spell, the conjurefile
+and the local juju client configuration, without bootstrapping,
+connecting to a controller or running any step.
+"""
+
+from collections import OrderedDict
+
+from conjureup import controllers, juju, utils, yamlio
+from conjureup.app_config import app
+from conjureup.consts import PHASES, cloud_types, spell_types
+from conjureup.controllers.juju.credentials.common import (
+    BaseCredentialsController
+)
+from conjureup.controllers.juju.regions.common import BaseRegionsController
+
+
+def application_plan(bundle):
+    """ Returns the charm or snap and unit count of each application, plus
+    the number of machines the bundle will need
+    """
+    applications = OrderedDict()
+    machines = len(bundle.machines)
+    for application in sorted(bundle.applications, key=lambda a: a.name):
+        if bundle.spell_type == spell_types.SNAP:
+            applications[application.name] = {
+                'snap': application.snap,
+                'channel': application.channel,
+            }
+            continue
+        applications[application.name] = {
+            'charm': application.charm,
+            'units': application.num_units,
+        }
+        if application.to:
+            applications[application.name]['to'] = application.to
+        elif not bundle.machines:
+            # every unit without a placement directive gets its own machine
+            machines += application.num_units
+    return applications, machines
+
+
+def step_plan(steps, cloud_type=None):
+    """ Returns the steps to run and, for each phase in the order they run
+    in, the steps implementing it
+    """
+    planned = []
+    phases = OrderedDict((phase.value, []) for phase in PHASES)
+    for step in steps:
+        skipped = bool(cloud_type and step.cloud_whitelist and
+                       cloud_type not in step.cloud_whitelist)
+        planned.append({
+            'name': step.name,
+            'title': step.title,
+            'source': step.source,
+            'skipped': skipped,
+        })
+        if skipped:
+            continue
+        for phase in PHASES:
+            if step._has_phase(phase):
+                phases[phase.value].append(step.name)
+    return planned, OrderedDict((k, v) for k, v in phases.items() if v)
+
+
+def bootstrap_plan():
+    """ Returns where the spell would be deployed, and the bootstrap
+    command line if a new controller would be needed
+    """
+    provider = app.provider
+    if provider.cloud_type != cloud_types.LOCAL:
+        BaseCredentialsController().load_credentials()
+    regions = BaseRegionsController()
+    if not provider.region and regions.regions:
+        provider.region = regions.default_region
+
+    provider.controller = app.conjurefile['controller'] or \
+        "conjure-up-{}-{}".format(provider.cloud, utils.gen_hash())
+    provider.model = app.conjurefile['model'] or utils.gen_model()
+    existing = juju.get_controller(provider.controller) is not None
+
+    cloud_with_region = provider.cloud
+    if provider.region:
+        cloud_with_region = '/'.join([provider.cloud, provider.region])
+    plan = OrderedDict([
+        ('cloud', cloud_with_region),
+        ('controller', provider.controller),
+        ('existing-controller', existing),
+        ('model', provider.model),
+        ('credential', provider.credential),
+        ('bootstrap', None),
+    ])
+    if not existing and app.metadata.spell_type == spell_types.JUJU:
+        plan['bootstrap'] = juju.bootstrap_cmd(provider.controller,
+                                               cloud_with_region,
+                                               provider.model,
+                                               provider.credential)
+    return plan
+
+
+def build_plan():
+    """ Composes the full plan for the chosen spell
+    """
+    controllers.setup_metadata_controller()
+    bundle = app.current_bundle
+    cloud_type = app.provider.cloud_type if app.provider else None
+
+    applications, machines = application_plan(bundle)
+    steps, phases = step_plan(app.all_steps, cloud_type)
+
+    plan = OrderedDict([('spell', app.config['spell'])])
+    if app.provider:
+        plan.update(bootstrap_plan())
+    plan.update([
+        ('machines', machines),
+        ('units', sum(a.get('units', 0) for a in applications.values())),
+        ('applications', applications),
+        ('steps', steps),
+        ('phases', phases),
+        ('bundle', bundle.to_dict()),
+    ])
+    return plan
+
+
+class _PlanDumper(yamlio.Dumper):
+    pass
+
+
+_PlanDumper.add_representer(
+    OrderedDict,
+    lambda dumper, data: dumper.represent_dict(data.items()))
+
+
+def main():
+    """ Prints the plan as YAML, returning the exit code
+    """
+    try:
+        plan = build_plan()
+    except Exception as e:
+        app.log.exception('Unable to plan deployment')
+        utils.error('Unable to plan deployment: {}'.format(e))
+        return 1
+    print(yamlio.dump(plan, Dumper=_PlanDumper))
+    return 0
@@ -0,0 +1,409 @@
+""" Compiled spells registry index
+
+Parsing the registry on every launch means reading spells-index.yaml,
+addons-aliases.yaml and, once a spell is picked, the metadata of the
+spell, its steps and its addons. Instead, all of that is parsed once per
+registry commit, right after the registry is synced, and written to a
+single file in the registry checkout.
+
+The file starts with a small header holding the registry commit, a
+fingerprint of the files the header is built from, both indexes and
+where each spell is stored, with a fingerprint of the spell's files. The
+spells themselves are encoded separately and only decoded, straight
+from a memory map, when one is used. Everything is JSON, so a planted
+index can't run code. The index is only used while the commit and the
+header's fingerprint match, and a spell only while its own fingerprint
+does, so local edits to a registry are never hidden by it, and only
+the spells used are walked to find out.
+
+When a spell is copied into the cache, its compiled version is written
+next to it as its manifest, so the spell, its steps and addons are then
+loaded without parsing or probing any of its files, for as long as none
+of them change.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+
+from conjureup import yamlio
+from conjureup.app_config import app
+from conjureup.consts import PHASES
+
+INDEX_FILE = 'registry-index.bin'
+MANIFEST_FILE = '.conjure-up-manifest'
+INDEX_VERSION = 4
+
+_MAGIC = b'CONJURE-REGISTRY\n'
+_HEADER_LEN = struct.Struct('>Q')
+
+
+def registry_commit(spells_dir):
+    """ Returns the commit the registry checkout in spells_dir is at, or
+    None if it isn't a git checkout
+
+    Reads the git metadata directly so that checking the compiled index
+    is still current doesn't need to fork git.
+    """
+    git_dir = Path(spells_dir) / '.git'
+    try:
+        head = (git_dir / 'HEAD').read_text().strip()
+    except OSError:
+        return None
+    if not head.startswith('ref: '):
+        return head
+    ref = head[len('ref: '):]
+    try:
+        return (git_dir / ref).read_text().strip()
+    except OSError:
+        pass
+    try:
+        packed_refs = (git_dir / 'packed-refs').read_text().splitlines()
+    except OSError:
+        return None
+    for line in packed_refs:
+        if line.endswith(' ' + ref):
+            return line.split(' ', 1)[0]
+    return None
+
+
+def fingerprint(top, exclude=()):
+    """ Returns a digest of the names, sizes, modes and modification
+    times of the files under top, which changes with any local edit
+
+    Entries of top starting with one of exclude are left out.
+    """
+    digest = hashlib.sha1()
+
+    def walk(path, relpath):
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+        for entry in entries:
+            if not relpath and entry.name.startswith(exclude):
+                continue
+            name = relpath + entry.name
+            if entry.is_dir(follow_symlinks=False):
+                walk(entry.path, name + '/')
+                continue
+            st = entry.stat(follow_symlinks=False)
+            digest.update('{}\0{}\0{}\0{}\n'.format(
+                name, st.st_size, st.st_mode, st.st_mtime_ns).encode(
+                    'utf8', 'surrogateescape'))
+
+    walk(str(top), '')
+    return digest.hexdigest()
+
+
+def _sources_fingerprint(spells_dir, keys):
+    """ Returns a digest of the files the index header is built from: the
+    registry indexes and the metadata of the indexed spells
+
+    Only these are stat'ed, so checking the index is current doesn't walk
+    the registry; the rest of a spell is checked when it is used.
+    """
+    digest = hashlib.sha1()
+    names = ['spells-index.yaml', 'addons-aliases.yaml']
+    names += ['{}/metadata.yaml'.format(key) for key in keys]
+    for name in names:
+        try:
+            st = os.stat(os.path.join(str(spells_dir), name))
+            stamp = (st.st_size, st.st_mode, st.st_mtime_ns)
+        except FileNotFoundError:
+            stamp = None
+        digest.update('{}\0{}\n'.format(name, stamp).encode(
+            'utf8', 'surrogateescape'))
+    return digest.hexdigest()
+
+
+def _encode(data):
+    """ Returns data as JSON, or None if it doesn't survive the round
+    trip unchanged (e.g. YAML dates or integer keys)
+    """
+    try:
+        blob = json.dumps(data).encode('utf8')
+    except (TypeError, ValueError):
+        return None
+    if json.loads(blob.decode('utf8')) != data:
+        return None
+    return blob
+
+
+def _load_yaml(path):
+    if not path.is_file():
+        return {}
+    return yamlio.load(path.read_text()) or {}
+
+
+def step_phases(step_dir):
+    """ Returns the phases a step implements, mapped to whether their
+    script is executable
+    """
+    phases = {}
+    for phase in PHASES:
+        phase_path = step_dir / phase.value
+        if phase_path.is_file():
+            phases[phase.value] = os.access(str(phase_path), os.X_OK)
+    return phases
+
+
+def compile_step(step_dir):
+    """ Returns the manifest of a step: its name, parsed metadata (None
+    if it has none) and implemented phases
+    """
+    metadata = None
+    if (step_dir / 'metadata.yaml').is_file():
+        metadata = _load_yaml(step_dir / 'metadata.yaml')
+    return {
+        'name': step_dir.name,
+        'metadata': metadata,
+        'phases': step_phases(step_dir),
+    }
+
+
+def _compile_steps(steps_dir):
+    return [compile_step(step_dir)
+            for step_dir in sorted(steps_dir.glob('*'))
+            if step_dir.is_dir()]
+
+
+def compile_spell(spell_dir):
+    """ Returns everything needed to load a spell without reading any of
+    its files
+    """
+    if not (spell_dir / 'metadata.yaml').is_file():
+        raise FileNotFoundError('{} has no metadata.yaml'.format(spell_dir))
+    addons = {}
+    for addon_dir in sorted((spell_dir / 'addons').glob('*')):
+        if not addon_dir.is_dir():
+            continue
+        addons[addon_dir.name] = {
+            'metadata': _load_yaml(addon_dir / 'metadata.yaml'),
+            'bundle': _load_yaml(addon_dir / 'bundle.yaml'),
+            'steps': _compile_steps(addon_dir / 'steps'),
+        }
+    return {
+        'metadata': _load_yaml(spell_dir / 'metadata.yaml'),
+        'steps': _compile_steps(spell_dir / 'steps'),
+        'addons': addons,
+    }
+
+
+def _clouds(metadata):
+    return {key: metadata[key]
+            for key in ['spell-type', 'cloud-whitelist', 'cloud-blacklist']
+            if key in metadata}
+
+
+def compile_index(spells_dir, commit=None):
+    """ Parses the registry in spells_dir and writes its compiled index
+
+    Spells that fail to parse, or can't be stored as JSON, are left out,
+    and are read from disk as usual when used.
+    """
+    spells_dir = Path(spells_dir)
+    commit = commit or registry_commit(spells_dir)
+    spells_index = _load_yaml(spells_dir / 'spells-index.yaml')
+    addons_aliases = _load_yaml(spells_dir / 'addons-aliases.yaml')
+
+    blobs = []
+    entries = {}
+    clouds = {}
+    offset = 0
+    keys = sorted(set(spell['key']
+                      for cat_dict in spells_index.values()
+                      for spell in cat_dict.get('spells', [])))
+    for key in keys:
+        try:
+            tree = _spell_fingerprint(spells_dir / key)
+            spell = compile_spell(spells_dir / key)
+        except (OSError, yamlio.YAMLError) as e:
+            app.log.debug('Not indexing spell {}: {}'.format(key, e))
+            continue
+        blob = _encode(spell)
+        if blob is None:
+            app.log.debug('Not indexing spell {}: not representable '
+                          'as JSON'.format(key))
+            continue
+        entries[key] = [offset, len(blob), tree]
+        clouds[key] = _clouds(spell['metadata'])
+        offset += len(blob)
+        blobs.append(blob)
+
+    header = _encode({
+        'version': INDEX_VERSION,
+        'commit': commit,
+        'fingerprint': _sources_fingerprint(spells_dir, sorted(entries)),
+        'spells-index': spells_index,
+        'addons-aliases': addons_aliases,
+        'clouds': clouds,
+        'entries': entries,
+    })
+    if header is None:
+        raise ValueError('The registry indexes are not representable '
+                         'as JSON')
+
+    # several runs sharing a registry may compile it at the same time
+    with NamedTemporaryFile(dir=str(spells_dir), prefix=INDEX_FILE,
+                            delete=False) as fp:
+        fp.write(_MAGIC)
+        fp.write(_HEADER_LEN.pack(len(header)))
+        fp.write(header)
+        for blob in blobs:
+            fp.write(blob)
+    os.replace(fp.name, str(spells_dir / INDEX_FILE))
+    app.log.debug('Compiled registry index of {} spells at {}'.format(
+        len(entries), commit))
+
+
+class RegistryIndex:
+    """ A compiled registry index, mapped into memory
+    """
+
+    def __init__(self, path):
+        self.spells_dir = Path(path).parent
+        self._current = {}
+        with open(str(path), 'rb') as fp:
+            self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        start = len(_MAGIC)
+        if self._mmap[:start] != _MAGIC:
+            raise ValueError('Not a registry index: {}'.format(path))
+        header_len, = _HEADER_LEN.unpack_from(self._mmap, start)
+        start += _HEADER_LEN.size
+        header = json.loads(
+            self._mmap[start:start + header_len].decode('utf8'))
+        self._data_start = start + header_len
+        self.version = header['version']
+        self.commit = header['commit']
+        self.fingerprint = header['fingerprint']
+        self.spells_index = header['spells-index']
+        self.addons_aliases = header['addons-aliases']
+        self.clouds = header['clouds']
+        self.entries = header['entries']
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def spell(self, key):
+        """ Returns a fresh copy of the compiled spell, or None if it isn't
+        indexed or was changed since
+        """
+        if key not in self.entries:
+            return None
+        offset, length, tree = self.entries[key]
+        if key not in self._current:
+            try:
+                self._current[key] = tree == _spell_fingerprint(
+                    self.spells_dir / key)
+            except OSError:
+                self._current[key] = False
+        if not self._current[key]:
+            return None
+        start = self._data_start + offset
+        return json.loads(self._mmap[start:start + length].decode('utf8'))
+
+
+def _open_index(path, commit):
+    try:
+        index = RegistryIndex(path)
+    except (OSError, ValueError, KeyError, TypeError, struct.error):
+        return None
+    if index.version != INDEX_VERSION or index.commit != commit:
+        return None
+    try:
+        tree = _sources_fingerprint(index.spells_dir, sorted(index.entries))
+    except OSError as e:
+        app.log.debug('Unable to check registry index: {}'.format(e))
+        return None
+    if index.fingerprint != tree:
+        return None
+    return index
+
+
+def load_index(spells_dir, compile=True):
+    """ Returns the compiled index of the registry in spells_dir, or None
+    if there's no current one
+
+    If compile is set, an index that is missing, was compiled from
+    another commit or predates local changes to the registry indexes or
+    to the metadata of a spell is (re)compiled first. Other local changes
+    to a spell only leave that spell out of the index, see
+    RegistryIndex.spell.
+    """
+    commit = registry_commit(spells_dir)
+    if commit is None:
+        return None
+    path = Path(spells_dir) / INDEX_FILE
+    index = _open_index(path, commit)
+    if index is None and compile:
+        try:
+            compile_index(spells_dir, commit)
+        except (OSError, ValueError, yamlio.YAMLError) as e:
+            app.log.debug('Unable to compile registry index: {}'.format(e))
+            return None
+        index = _open_index(path, commit)
+    return index
+
+
+def _spell_fingerprint(spell_dir):
+    return fingerprint(spell_dir, exclude=(MANIFEST_FILE,))
+
+
+def write_manifest(spell_dir, compiled=None):
+    """ Writes the manifest of the spell copied into spell_dir, compiling
+    it first unless given
+
+    A spell that fails to compile, or can't be stored as JSON, is left
+    without a manifest and loaded from its files as usual, reporting the
+    error there.
+    """
+    path = Path(spell_dir) / MANIFEST_FILE
+    try:
+        if compiled is None:
+            compiled = compile_spell(Path(spell_dir))
+        blob = _encode(compiled)
+        if blob is None:
+            raise ValueError('not representable as JSON')
+        header = json.dumps({
+            'version': INDEX_VERSION,
+            'fingerprint': _spell_fingerprint(spell_dir),
+        }).encode('utf8')
+        with path.open('wb') as fp:
+            fp.write(header + b'\n')
+            fp.write(blob)
+    except (OSError, ValueError, yamlio.YAMLError) as e:
+        app.log.debug('Not writing manifest of {}: {}'.format(spell_dir, e))
+        if path.exists():
+            path.unlink()
+
+
+def read_manifest(spell_dir):
+    """ Returns a fresh copy of the compiled spell from the manifest in
+    spell_dir, or None if there isn't a usable one
+
+    The manifest is only used if none of the files of the spell changed
+    since it was written.
+    """
+    try:
+        with (Path(spell_dir) / MANIFEST_FILE).open('rb') as fp:
+            header = json.loads(fp.readline().decode('utf8'))
+            if header.get('version') != INDEX_VERSION or \
+                    header.get('fingerprint') != \
+                    _spell_fingerprint(spell_dir):
+                return None
+            return json.loads(fp.read().decode('utf8'))
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def current_spell():
+    """ Returns the compiled version of the chosen spell, or None if it
+    has no manifest
+    """
+    spell_dir = app.config.get('spell-dir')
+    if spell_dir is None:
+        return None
+    return read_manifest(spell_dir)
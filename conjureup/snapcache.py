@@ -0,0 +1,257 @@
+""" Local cache of snaps downloaded for snap spells
+
+Snaps are stored under `<cache-dir>/snaps/<name>/<channel>/<revision>/`
+together with the `.assert` file fetched alongside them, so a spell
+deployed again against an unchanged channel revision is installed without
+touching the store. A cache directory copied onto a machine ahead of time
+works the same way with no network access at all.
+"""
+import base64
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from conjureup import errors, utils
+from conjureup.app_config import app
+
+# Defaults for `snap-cache-max-size` (bytes) and
+# `snap-cache-max-age` (days) in the Conjurefile.
+DEFAULT_MAX_SIZE = 5 * 1024 ** 3
+DEFAULT_MAX_AGE = 30
+
+REVISION_RE = re.compile(r'\((\d+)\)')
+
+
+def normalize_channel(channel):
+    """ Returns channel with an explicit track, ie stable -> latest/stable
+    """
+    if '/' not in channel:
+        return 'latest/{}'.format(channel)
+    return channel
+
+
+def parse_channel_revisions(out):
+    """ Parses the channel map from `snap info` output
+
+    Returns a dict of normalized channel name to revision string. Channels
+    closed in favour of a more stable one (shown as an arrow) inherit the
+    revision of the channel listed above them.
+    """
+    revisions = {}
+    in_channels = False
+    previous = None
+    for line in out.splitlines():
+        if not line.startswith(' '):
+            in_channels = line.startswith('channels:')
+            previous = None
+            continue
+        if not in_channels or ':' not in line:
+            continue
+        channel, info = line.strip().split(':', 1)
+        match = REVISION_RE.search(info)
+        if match:
+            previous = match.group(1)
+        elif '↑' not in info and '^' not in info:
+            # channel is closed or empty
+            previous = None
+        if previous is not None:
+            revisions[normalize_channel(channel)] = previous
+    return revisions
+
+
+def verify_snap(snap_path, assert_path):
+    """ Checks a snap file against the sha3-384 digest recorded in its
+    snap-revision assertion
+    """
+    try:
+        assertions = Path(assert_path).read_text()
+    except OSError:
+        return False
+    digests = re.findall(r'^snap-sha3-384: (\S+)$', assertions, re.MULTILINE)
+    if not digests:
+        return False
+    sha = hashlib.sha3_384()
+    try:
+        with open(str(snap_path), 'rb') as fp:
+            for chunk in iter(lambda: fp.read(1024 * 1024), b''):
+                sha.update(chunk)
+    except OSError:
+        return False
+    digest = base64.urlsafe_b64encode(sha.digest()).decode().rstrip('=')
+    return digest in digests
+
+
+class SnapCacheEntry:
+    """ A cached snap revision and its assertions
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.revision = path.name
+
+    @property
+    def snap(self):
+        return next(self.path.glob('*.snap'), None)
+
+    @property
+    def assertion(self):
+        return next(self.path.glob('*.assert'), None)
+
+    @property
+    def size(self):
+        return sum(f.stat().st_size for f in self.path.iterdir()
+                   if f.is_file())
+
+    @property
+    def last_used(self):
+        return self.path.stat().st_mtime
+
+    def touch(self):
+        os.utime(str(self.path), None)
+
+    def is_valid(self):
+        return (self.snap is not None and
+                self.assertion is not None and
+                verify_snap(self.snap, self.assertion))
+
+
+class SnapCache:
+    """ Snap downloads keyed by snap name, channel and revision
+    """
+
+    def __init__(self, cache_dir):
+        self.path = Path(cache_dir) / 'snaps'
+
+    def _channel_dir(self, name, channel):
+        return self.path / name / normalize_channel(channel).replace('/', '_')
+
+    def entry(self, name, channel, revision):
+        """ Returns the cache entry for a revision, or None if missing
+        """
+        entry_path = self._channel_dir(name, channel) / str(revision)
+        if not entry_path.is_dir():
+            return None
+        return SnapCacheEntry(entry_path)
+
+    def entries(self, name=None, channel=None):
+        """ Returns all cache entries, optionally limited to a snap/channel
+        """
+        if name is not None and channel is not None:
+            channel_dirs = [self._channel_dir(name, channel)]
+        elif name is not None:
+            channel_dirs = (self.path / name).glob('*')
+        else:
+            channel_dirs = self.path.glob('*/*')
+        return [SnapCacheEntry(entry_path)
+                for channel_dir in channel_dirs if channel_dir.is_dir()
+                for entry_path in channel_dir.iterdir()
+                if entry_path.is_dir()]
+
+    def latest(self, name, channel):
+        """ Returns the most recently fetched valid entry for snap/channel
+        """
+        entries = sorted(self.entries(name, channel),
+                         key=lambda e: e.last_used, reverse=True)
+        for entry in entries:
+            if entry.is_valid():
+                return entry
+        return None
+
+    async def channel_revision(self, name, channel):
+        """ Asks the store which revision a channel currently points at
+
+        Returns None if the store cannot be reached.
+        """
+        ret, out, err = await utils.arun(['snap', 'info', name])
+        if ret > 0:
+            app.log.debug("Unable to query store for {}: {}".format(
+                name, err))
+            return None
+        return parse_channel_revisions(out).get(normalize_channel(channel))
+
+    async def fetch(self, name, channel, msg_cb):
+        """ Returns a valid cache entry for the snap, downloading it from the
+        store only if the channel has moved on or it was never fetched
+        """
+        revision = await self.channel_revision(name, channel)
+        if revision is None:
+            entry = self.latest(name, channel)
+            if entry is None:
+                raise errors.DeploymentFailure(
+                    "Unable to reach the snap store for {} and no cached "
+                    "copy exists in {}".format(name, self.path))
+            msg_cb('Using cached snap {} revision {} (offline)'.format(
+                name, entry.revision))
+            entry.touch()
+            return entry
+
+        entry = self.entry(name, channel, revision)
+        if entry is not None and entry.is_valid():
+            msg_cb('Using cached snap {} revision {}'.format(
+                name, entry.revision))
+            entry.touch()
+            return entry
+
+        entry = await self._download(name, channel, msg_cb)
+        if entry.revision != revision:
+            app.log.debug("Channel {} of {} moved from {} to {} while "
+                          "downloading".format(channel, name, revision,
+                                               entry.revision))
+        return entry
+
+    async def _download(self, name, channel, msg_cb):
+        self.path.mkdir(parents=True, exist_ok=True)
+        msg_cb('Downloading snap {} ({})'.format(name, channel))
+        tmp_dir = Path(tempfile.mkdtemp(prefix='.partial-', dir=str(self.path)))
+        try:
+            ret, out, err = await utils.arun(
+                ['snap', 'download', name, '--channel', channel],
+                cwd=str(tmp_dir))
+            if ret > 0:
+                raise errors.DeploymentFailure(err)
+            snap_file = next(tmp_dir.glob('*.snap'), None)
+            assert_file = next(tmp_dir.glob('*.assert'), None)
+            if snap_file is None or assert_file is None:
+                raise errors.DeploymentFailure(
+                    "Unable to determine downloaded snap from: {}".format(out))
+            if not verify_snap(snap_file, assert_file):
+                raise errors.DeploymentFailure(
+                    "Downloaded snap {} does not match its "
+                    "assertion".format(snap_file.name))
+            # snap download names files <name>_<revision>.snap
+            revision = snap_file.stem.rsplit('_', 1)[-1]
+            entry_path = self._channel_dir(name, channel) / revision
+            shutil.rmtree(str(entry_path), ignore_errors=True)
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_dir.rename(entry_path)
+        finally:
+            shutil.rmtree(str(tmp_dir), ignore_errors=True)
+        msg_cb('Downloaded snap {} revision {}'.format(name, revision))
+        return SnapCacheEntry(entry_path)
+
+    def prune(self, max_size=DEFAULT_MAX_SIZE, max_age=DEFAULT_MAX_AGE,
+              keep=()):
+        """ Removes entries unused for more than max_age days, then the least
+        recently used entries until the cache fits within max_size bytes
+
+        Arguments:
+        max_size: upper bound on total cache size in bytes
+        max_age: days since last use after which an entry is removed
+        keep: entry paths that must not be removed
+        """
+        keep = set(Path(p) for p in keep)
+        entries = sorted(self.entries(), key=lambda e: e.last_used)
+        cutoff = time.time() - max_age * 24 * 60 * 60
+        total = sum(entry.size for entry in entries)
+        for entry in entries:
+            if entry.path in keep:
+                continue
+            if entry.last_used >= cutoff and total <= max_size:
+                continue
+            app.log.debug("Pruning cached snap {}".format(entry.path))
+            total -= entry.size
+            shutil.rmtree(str(entry.path), ignore_errors=True)
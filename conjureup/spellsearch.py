@@ -0,0 +1,204 @@
+""" Spell search index
+
+An inverted index over the spell keys, names, descriptions, categories
+and addon aliases of the spells registry. It is built from
+spells-index.yaml and addons-aliases.yaml the first time it is needed
+after a registry sync and persisted next to them, so later runs only
+have to read it back.
+"""
+
+import bisect
+import difflib
+import json
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+
+INDEX_FILE = 'spells-search-index.json'
+INDEX_VERSION = 1
+
+# Relevance of a query term found in each field of a spell
+FIELD_WEIGHTS = OrderedDict([
+    ('key', 5),
+    ('name', 4),
+    ('alias', 3),
+    ('category', 2),
+    ('description', 1),
+])
+# How close a term must be to an indexed one to count as a fuzzy match
+FUZZY_CUTOFF = 0.75
+FUZZY_MATCHES = 3
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """ Splits text into lowercase alphanumeric terms
+    """
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+def _source_files(spells_dir):
+    return [Path(spells_dir) / 'spells-index.yaml',
+            Path(spells_dir) / 'addons-aliases.yaml']
+
+
+def fingerprint(spells_dir, darwin=False):
+    """ Identifies the registry contents an index was built from
+    """
+    source = []
+    for path in _source_files(spells_dir):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            source.append([path.name, None, None])
+        else:
+            source.append([path.name, st.st_mtime_ns, st.st_size])
+    return {'files': source, 'darwin': darwin}
+
+
+class SpellSearchIndex:
+    """ Inverted index of the spells registry
+
+    Arguments:
+    spells: OrderedDict of spell key to its category and spells-index.yaml
+            entry, in registry order
+    postings: dict of term to a dict of spell key to relevance
+    source: fingerprint of the files the index was built from
+    """
+
+    def __init__(self, spells, postings, source=None):
+        self.spells = spells
+        self.postings = postings
+        self.source = source
+        self.terms = sorted(postings)
+        self.categories = OrderedDict()
+        for key, entry in spells.items():
+            self.categories.setdefault(entry['category'], []).append(key)
+
+    @classmethod
+    def build(cls, spells_index, addons_aliases=None, source=None,
+              available_on_darwin=None):
+        """ Indexes the parsed spells-index.yaml and addons-aliases.yaml
+
+        available_on_darwin, if given, is called with each spell key and
+        its result recorded with the spell so it doesn't have to be worked
+        out again on every search.
+        """
+        spells = OrderedDict()
+        postings = {}
+
+        def _add(text, key, field):
+            weight = FIELD_WEIGHTS[field]
+            for term in tokenize(text):
+                docs = postings.setdefault(term, {})
+                docs[key] = max(docs.get(key, 0), weight)
+
+        for category, cat_dict in (spells_index or {}).items():
+            for spell in cat_dict.get('spells', []):
+                key = spell['key']
+                entry = {'category': category, 'spell': spell}
+                if available_on_darwin is not None:
+                    entry['darwin'] = available_on_darwin(key)
+                spells[key] = entry
+                _add(key, key, 'key')
+                _add(spell.get('name', ''), key, 'name')
+                _add(spell.get('description', ''), key, 'description')
+                if category != '_unassigned_spells':
+                    _add(category, key, 'category')
+        for alias, addon in (addons_aliases or {}).items():
+            if addon.get('spell') in spells:
+                _add(alias, addon['spell'], 'alias')
+        return cls(spells, postings, source)
+
+    @classmethod
+    def load(cls, path):
+        """ Reads a persisted index, returning None if it is missing or was
+        written by a different version
+        """
+        try:
+            with open(str(path)) as fp:
+                data = json.load(fp, object_pairs_hook=OrderedDict)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != INDEX_VERSION:
+            return None
+        return cls(data['spells'], data['postings'], data['source'])
+
+    def save(self, path):
+        """ Persists the index, atomically replacing any previous one
+        """
+        path = Path(path)
+        # several runs sharing a registry may save it at the same time
+        with NamedTemporaryFile('w', dir=str(path.parent), prefix=path.name,
+                                delete=False) as fp:
+            json.dump({'version': INDEX_VERSION,
+                       'source': self.source,
+                       'spells': self.spells,
+                       'postings': self.postings}, fp)
+        os.replace(fp.name, str(path))
+
+    def _term_matches(self, term):
+        """ Returns the relevance of each spell matching a query term, by
+        prefix or, failing that, fuzzily
+        """
+        scores = {}
+        start = bisect.bisect_left(self.terms, term)
+        for indexed in self.terms[start:]:
+            if not indexed.startswith(term):
+                break
+            # whole-word matches rank above prefix matches
+            boost = 2 if indexed == term else 1
+            for key, weight in self.postings[indexed].items():
+                scores[key] = max(scores.get(key, 0), weight * boost)
+        if scores:
+            return scores
+        for indexed in difflib.get_close_matches(term, self.terms,
+                                                 FUZZY_MATCHES,
+                                                 FUZZY_CUTOFF):
+            for key, weight in self.postings[indexed].items():
+                scores[key] = max(scores.get(key, 0), weight / 2)
+        return scores
+
+    def search(self, query):
+        """ Returns the keys of the spells matching every term of query,
+        most relevant first. An empty query matches every spell, in
+        registry order.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return list(self.spells)
+        scores = None
+        for term in terms:
+            matches = self._term_matches(term)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {key: score + matches[key]
+                          for key, score in scores.items()
+                          if key in matches}
+            if not scores:
+                return []
+        return sorted(scores, key=lambda key: (-scores[key], key))
+
+
+def load_index(spells_dir, spells_index, addons_aliases=None,
+               available_on_darwin=None):
+    """ Returns the search index of the registry in spells_dir, rebuilding
+    and persisting it if the registry changed since it was last built
+    """
+    path = Path(spells_dir) / INDEX_FILE
+    source = fingerprint(spells_dir, available_on_darwin is not None)
+    index = SpellSearchIndex.load(path)
+    if index is not None and index.source == source:
+        return index
+    index = SpellSearchIndex.build(spells_index, addons_aliases, source,
+                                   available_on_darwin)
+    try:
+        index.save(path)
+    except OSError:
+        # a read-only registry just means rebuilding next time
+        pass
+    return index
@@ -0,0 +1,155 @@
+""" Following the end of a growing file
+
+A Follower keeps the last lines of a log that another process is
+writing, the way tail -F does. It remembers how far it has read, so each
+update only reads what was appended, and it never holds more than the
+lines it keeps. Truncated or replaced files are read again from the
+start.
+
+Once started on an event loop, it is woken up by inotify where it is
+available, and stats the file periodically otherwise. Either way, its
+callback is only called when there are new lines.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+from collections import deque
+
+# read at most this much of the file at a time, the start of a longer
+# read would be dropped from the ring anyway
+MAX_READ = 64 * 1024
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+
+def _inotify_watch(path):
+    """ Returns an inotify descriptor watching the directory of path, or
+    None if inotify is not available
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        init = libc.inotify_init1
+        add_watch = libc.inotify_add_watch
+    except (OSError, AttributeError, TypeError):
+        return None
+    add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        return None
+    # the directory is watched, as the file may not be there yet
+    directory = os.fsencode(os.path.dirname(os.path.abspath(path)))
+    if add_watch(fd, directory, IN_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class Follower:
+    def __init__(self, path, lines=10, callback=None, interval=1):
+        """
+        path: file to follow
+        lines: number of lines to keep
+        callback: called with the kept lines when new ones are read
+        interval: seconds between two stats of the file, when inotify
+                  is not available
+        """
+        self.path = str(path)
+        self.callback = callback
+        self.interval = interval
+        self._lines = deque(maxlen=lines)
+        self._partial = b''
+        self._inode = None
+        self._offset = 0
+        self._loop = None
+        self._fd = None
+        self._task = None
+
+    @property
+    def lines(self):
+        """ The last lines of the file, including the one being written
+        """
+        lines = list(self._lines)
+        if self._partial:
+            lines.append(self._partial.decode('utf8', 'replace'))
+        return lines[-self._lines.maxlen:]
+
+    def poll(self):
+        """ Reads what was appended to the file since the last poll, and
+        returns whether there was anything
+        """
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            # new or truncated file
+            self._inode = st.st_ino
+            self._offset = 0
+            self._partial = b''
+            self._lines.clear()
+        if st.st_size == self._offset:
+            return False
+
+        start = max(self._offset, st.st_size - MAX_READ)
+        with open(self.path, 'rb') as fp:
+            fp.seek(start)
+            data = fp.read(st.st_size - start)
+        if start > self._offset:
+            # skipped ahead, the first line read is incomplete
+            self._partial = b''
+            data = data[data.find(b'\n') + 1:]
+        self._offset = st.st_size
+
+        lines = (self._partial + data).splitlines(keepends=True)
+        if lines and not lines[-1].endswith((b'\n', b'\r')):
+            self._partial = lines.pop()[-MAX_READ:]
+        else:
+            self._partial = b''
+        for line in lines:
+            self._lines.append(line.rstrip(b'\r\n').decode('utf8',
+                                                           'replace'))
+        return True
+
+    def _update(self):
+        if self.poll() and self.callback:
+            self.callback(self.lines)
+
+    def _wake(self):
+        try:
+            # the events themselves don't matter, only that there were
+            os.read(self._fd, 4096)
+        except BlockingIOError:
+            pass
+        self._update()
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self._update()
+
+    def start(self, loop):
+        """ Follows the file on loop until stopped
+        """
+        self._loop = loop
+        self._fd = _inotify_watch(self.path)
+        if self._fd is not None:
+            loop.add_reader(self._fd, self._wake)
+        else:
+            self._task = loop.create_task(self._poll_loop())
+        self._update()
+        return self
+
+    def stop(self):
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -1,6 +1,6 @@
-
-import asyncio
-from functools import partial
+import threading
+from collections import deque
+from urllib.parse import urlencode
 
 import requests
 
@@ -8,9 +8,105 @@ from conjureup import __version__ as VERSION
 from conjureup.app_config import app
 
 GA_ID = "UA-1018242-61"
+GA_COLLECT_URL = "http://www.google-analytics.com/collect"
+GA_BATCH_URL = "http://www.google-analytics.com/batch"
+# Google Analytics accepts at most 20 hits per batch request
+GA_BATCH_SIZE = 20
 SENTRY_DSN = ('https://27ee3b60dbb8412e8acf6bc159979165:'
               'b3828e6bfc05432bb35fb12f6f97fdf6@sentry.io/180147')
 TELEMETRY_ASYNC_QUEUE = "telemetry-async-queue"
+# Upper bound on queued hits and reports; the oldest are dropped first
+TELEMETRY_MAX_QUEUED = 500
+# Seconds to wait for queued telemetry to be sent on shutdown
+TELEMETRY_FLUSH_TIMEOUT = 3
+
+
+class TelemetryQueue:
+    """ Background sender for analytics hits and error reports
+
+    Everything is handed to a single daemon thread so that telemetry never
+    occupies the event loop's default executor. Hits are posted in batches
+    over one HTTP session.
+    """
+
+    def __init__(self, max_queued=TELEMETRY_MAX_QUEUED,
+                 batch_size=GA_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._items = deque(maxlen=max_queued)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._session = None
+
+    def put(self, kind, payload):
+        """ Queue a 'hit' (dict of GA params) or a 'report' (callable)
+        """
+        with self._cond:
+            if self._stopping:
+                return
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append((kind, payload))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name=TELEMETRY_ASYNC_QUEUE,
+                                                daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self, timeout=TELEMETRY_FLUSH_TIMEOUT):
+        """ Stop accepting items and wait up to timeout seconds for the
+        queue to drain
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        if self.dropped:
+            app.log.debug('Dropped {} telemetry items'.format(self.dropped))
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._items and not self._stopping:
+                self._cond.wait()
+            batch = []
+            while self._items and len(batch) < self.batch_size:
+                batch.append(self._items.popleft())
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            hits = [payload for kind, payload in batch if kind == 'hit']
+            reports = [payload for kind, payload in batch if kind == 'report']
+            if hits:
+                self._post_hits(hits)
+            for report in reports:
+                try:
+                    report()
+                except Exception:
+                    pass  # ignore failures to submit reports
+
+    def _post_hits(self, hits):
+        if self._session is None:
+            self._session = requests.Session()
+        try:
+            if len(hits) == 1:
+                self._session.post(GA_COLLECT_URL, data=hits[0])
+            else:
+                self._session.post(GA_BATCH_URL,
+                                   data='\n'.join(urlencode(hit)
+                                                  for hit in hits))
+        except Exception:
+            pass  # ignore failures to submit telemetry
+
+
+queue = TelemetryQueue()
 
 
 def track_screen(screen_name):
@@ -21,10 +117,7 @@ def track_screen(screen_name):
                 t="screenview")
     if 'spell' in app.config:
         args['cd1'] = app.config['spell']
-
-    if not app.loop:
-        app.loop = asyncio.get_event_loop()
-    app.loop.run_in_executor(None, partial(_post_track, args))
+    _post_track(args)
 
 
 def track_event(category, action, label):
@@ -38,9 +131,7 @@ def track_event(category, action, label):
                 t='event')
     if 'spell' in app.config:
         args['cd1'] = app.config['spell']
-    if not app.loop:
-        app.loop = asyncio.get_event_loop()
-    app.loop.run_in_executor(None, partial(_post_track, args))
+    _post_track(args)
 
 
 def track_exception(description, is_fatal=True):
@@ -53,9 +144,19 @@ def track_exception(description, is_fatal=True):
                 exf=exf)
     if 'spell' in app.config:
         args['cd1'] = app.config['spell']
-    if not app.loop:
-        app.loop = asyncio.get_event_loop()
-    app.loop.run_in_executor(None, partial(_post_track, args))
+    _post_track(args)
+
+
+def report(report_fn):
+    """ Queue an error report callable to run on the telemetry thread
+    """
+    queue.put('report', report_fn)
+
+
+def flush(timeout=TELEMETRY_FLUSH_TIMEOUT):
+    """ Send whatever is still queued, waiting at most timeout seconds
+    """
+    queue.flush(timeout)
 
 
 def _post_track(arg_dict):
@@ -63,8 +164,4 @@ def _post_track(arg_dict):
                   av=VERSION, an="Conjure-Up")
 
     params.update(arg_dict)
-    try:
-        requests.post("http://www.google-analytics.com/collect",
-                      data=params)
-    except Exception:
-        pass  # ignore failures to submit telemetry
+    queue.put('hit', params)
@@ -1,8 +1,8 @@
 from tempfile import NamedTemporaryFile
 
-import yaml
 from jinja2 import Environment, FileSystemLoader
 
+from conjureup import yamlio
 from conjureup.utils import spew
 
 
@@ -18,7 +18,7 @@ def render_charm_conf(name, options):
     """
     ctx = dict(name=options)
     with NamedTemporaryFile(mode='w+', encoding='utf-8') as tempf:
-        tempf.write(yaml.dump(ctx, default_flow_style=False))
+        yamlio.dump(ctx, tempf)
         return tempf.name
 
 
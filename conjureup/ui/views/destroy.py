@@ -9,17 +9,43 @@ from urwid import Columns, Filler, Frame, Pile, Text, WidgetWrap
 
 class DestroyView(WidgetWrap):
 
-    def __init__(self, app, models, cb):
+    def __init__(self, app, models, cb, controllers=None):
+        """ models maps controller names to their `juju list-models` output;
+        any of controllers not yet in models are shown as loading until
+        set_models or set_unreachable is called for them.
+        """
         self.app = app
         self.cb = cb
-        self.controllers = models.keys()
-        self.models = models
+        self.controllers = set(controllers or []) | set(models.keys())
+        self.models = dict(models)
+        self.unreachable = {}
         self.config = self.app.config
         self.buttons_pile_selected = False
         self.frame = Frame(body=self._build_widget(),
                            footer=self._build_footer())
         super().__init__(self.frame)
 
+    def set_models(self, controller, models):
+        """ Show the models of a controller that has answered
+        """
+        self.models[controller] = models
+        self._refresh()
+
+    def set_unreachable(self, controller, reason):
+        """ Mark a controller whose models could not be listed
+        """
+        self.unreachable[controller] = reason
+        self._refresh()
+
+    def _refresh(self):
+        # keep the highlighted item when controllers answer behind it
+        focus_key = None
+        if self._pile.contents:
+            focus_key = self._item_keys[self._pile.focus_position]
+        self.frame.body = self._build_widget()
+        if isinstance(focus_key, tuple) and focus_key in self._item_keys:
+            self._pile.focus_position = self._item_keys.index(focus_key)
+
     def keypress(self, size, key):
         if key in ['tab', 'shift tab']:
             self._swap_focus()
@@ -66,10 +92,27 @@ class DestroyView(WidgetWrap):
 
     def _build_widget(self):
         total_items = []
+        self._item_keys = []
+
+        def add(key, widget):
+            self._item_keys.append(key)
+            total_items.append(widget)
+
         for controller in sorted(self.controllers):
+            if controller in self.unreachable:
+                add(controller, Color.label(
+                    Text("{} (unreachable: {})".format(
+                        controller, self.unreachable[controller]))))
+                add(None, Padding.line_break(""))
+                continue
+            if controller not in self.models:
+                add(controller, Color.label(
+                    Text("{} (loading models...)".format(controller))))
+                add(None, Padding.line_break(""))
+                continue
             models = self.models[controller]['models']
             if len(models) > 0:
-                total_items.append(Color.label(
+                add(controller, Color.label(
                     Text("{} ({})".format(controller,
                                           models[0].get('cloud', "")))
                 ))
@@ -85,17 +128,18 @@ class DestroyView(WidgetWrap):
                         ", Running since: {}".format(
                             model['status'].get('since'))
                         if 'since' in model['status'] else '')
-                    total_items.append(
+                    add((controller, model['name']),
                         Color.body(
                             menu_btn(label=label,
                                      on_press=partial(self.submit,
                                                       controller,
                                                       model)),
                             focus_map='menu_button focus'
-                        ))
-                total_items.append(Padding.line_break(""))
-            total_items.append(Padding.line_break(""))
-        return Padding.center_80(Filler(Pile(total_items), valign='top'))
+                    ))
+                add(None, Padding.line_break(""))
+            add(None, Padding.line_break(""))
+        self._pile = Pile(total_items)
+        return Padding.center_80(Filler(self._pile, valign='top'))
 
     def submit(self, controller, model, btn):
         self.cb(controller, model)
@@ -1,12 +1,11 @@
 import asyncio
 import random
 import unicodedata
-from pathlib import Path
 
 from ubuntui.utils import Padding
 from urwid import Columns, Text
 
-from conjureup import events
+from conjureup import events, tail
 from conjureup.app_config import app
 from conjureup.ui.views.base import BaseView
 
@@ -26,10 +25,14 @@ class InterstitialView(BaseView):
         self.title = title
         self.message = message
         self.event = event
-        self.watch_file = Path(watch_file) if watch_file else None
         self.output = Text("", align="left")
         self.loading_boxes = [Text(x) for x in self.icons]
         super().__init__()
+        self.follower = None
+        if watch_file:
+            self.output.set_text("Waiting...")
+            self.follower = tail.Follower(
+                watch_file, callback=self._show_output).start(app.loop)
         app.loop.create_task(self._refresh())
 
     def build_widget(self):
@@ -48,37 +51,31 @@ class InterstitialView(BaseView):
 
         return body
 
-    def _clear_control_characters(self, text):
-        text = text.decode().splitlines()
+    def _clear_control_characters(self, lines):
         new_out = []
-        for t in text:
+        for t in lines:
             sanitize = "".join(ch for ch
                                in t if unicodedata.category(ch)[0] != "C")
             if sanitize.endswith("%"):
                 new_out.append("{}%".format(sanitize.split("%")[0]))
             else:
                 new_out.append(sanitize[:134])
-        if len(new_out) >= 10:
-            return "\n".join(new_out[-10:])
-        else:
-            return "\n".join(new_out)
+        return "\n".join(new_out[-10:])
+
+    def _show_output(self, lines):
+        self.output.set_text(self._clear_control_characters(lines))
 
     async def _refresh(self):
         while self.event.is_set() and not events.Error.is_set():
             self.update()
             await asyncio.sleep(1)
+        if self.follower:
+            self.follower.stop()
 
     def update(self):
-        """ Redraws the KITT bar, and updates the watch file output.
+        """ Redraws the KITT bar, the watch file output is updated as it
+        grows.
         """
         random.shuffle(self.icons)
         for i in self.loading_boxes:
             i.set_text(self.icons[random.randrange(len(self.icons))])
-
-        if self.watch_file:
-            try:
-                text = self.watch_file.read_text().splitlines()[-10:]
-                text = self._clear_control_characters(text)
-            except Exception:
-                text = "Waiting..."
-            self.output.set_text(text)
@@ -1,6 +1,6 @@
 from ubuntui.ev import EventLoop
-from ubuntui.utils import Color
-from urwid import Text
+from ubuntui.utils import Color, Padding
+from urwid import Columns, Edit, Text, connect_signal
 
 from conjureup.ui.views.base import BaseView
 from conjureup.ui.views.bundle_readme_view import BundleReadmeView
@@ -12,20 +12,36 @@ class SpellPickerView(BaseView):
     subtitle = "Choose from this list of recommended spells"
     show_back_button = False
 
-    def __init__(self, app, spells, cb):
+    def __init__(self, app, spells, cb, search=None):
+        """
+        :param search: optional callable returning the keys of the spells
+            matching a query, most relevant first; enables the filter field
+        """
         self.app = app
         self.cb = cb
         self.spells = spells
+        self.search = search
         self.config = self.app.config
+        # option widgets are only built for spells that get shown, and
+        # reused while the filter changes
+        self._spell_widgets = {}
+        self.filter_edit = Edit()
+        connect_signal(self.filter_edit, 'change', self._filter_changed)
         super().__init__()
+        if self.search is not None:
+            # start on the list, '/' jumps to the filter
+            self.widget.focus_position = 2
         self.extend_command_map({
             'r': self.show_readme,
+            '/': self.focus_filter,
         })
         self.update_spell_description()
 
     def show_readme(self):
         _, rows = EventLoop.screen_size()
         cur_spell = self.selected_spell
+        if not cur_spell:
+            return
         spellname = cur_spell['name']
         spelldir = cur_spell['spell-dir']
         brmv = BundleReadmeView(spellname, spelldir,
@@ -37,34 +53,74 @@ class SpellPickerView(BaseView):
     def hide_readme(self):
         self.show()
 
+    def focus_filter(self):
+        if self.search is not None:
+            self.frame.focus_position = 'body'
+            self.widget.focus_position = 0
+
     @property
     def selected_spell(self):
-        return self.widget.selected
+        if not self.spell_list.option_widgets:
+            return None
+        return self.spell_list.selected
 
     def update_spell_description(self):
         spell = self.selected_spell
         if spell:
             self.set_footer(spell['description'])
+        elif self.filter_edit.edit_text.strip():
+            self.set_footer("No spells match the filter")
         else:
             self.set_footer("No spell selected")
 
     def after_keypress(self):
         self.update_spell_description()
 
-    def build_widget(self):
-        widget = MenuSelectButtonList()
+    def _spell_widget(self, spell):
+        if spell['key'] not in self._spell_widgets:
+            self._spell_widgets[spell['key']] = \
+                MenuSelectButtonList.option_type(spell['name'], spell)
+        return self._spell_widgets[spell['key']]
+
+    def _populate(self, spells):
+        """ Fills the list with spells, grouped by category
+        """
+        del self.spell_list.contents[:]
         prev_cat = None
-        for category, spell in self.spells:
+        for category, spell in spells:
             if category == "_unassigned_spells":
                 category = "other"
             if category != prev_cat:
                 if prev_cat:
-                    widget.append(Text(""))
-                widget.append(Color.label(Text(category)))
+                    self.spell_list.append(Text(""))
+                self.spell_list.append(Color.label(Text(category)))
                 prev_cat = category
-            widget.append_option(spell['name'], spell)
-        widget.focus_position = 1
-        return widget
+            self.spell_list.append(self._spell_widget(spell))
+        if spells:
+            self.spell_list.select_first()
+
+    def _filter_changed(self, edit, query):
+        if not query.strip():
+            self._populate(self.spells)
+        else:
+            keys = set(self.search(query))
+            self._populate([(category, spell)
+                            for category, spell in self.spells
+                            if spell['key'] in keys])
+        self.update_spell_description()
+
+    def build_widget(self):
+        self.spell_list = MenuSelectButtonList()
+        self._populate(self.spells)
+        if self.search is None:
+            return self.spell_list
+        filter_row = Columns([
+            ('pack', Text("Filter (/):")),
+            Color.string_input(self.filter_edit,
+                               focus_map='string_input focus'),
+        ], dividechars=1)
+        return [filter_row, Padding.line_break(""), self.spell_list]
 
     def next_screen(self):
-        self.cb(self.selected_spell['key'])
+        if self.selected_spell:
+            self.cb(self.selected_spell['key'])
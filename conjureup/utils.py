@@ -1,6 +1,8 @@
+import argparse
 import asyncio
 import codecs
 import errno
+import fcntl
 import json
 import logging
 import os
@@ -8,12 +10,13 @@ import pty
 import re
 import shutil
 import socket
+import struct
 import subprocess
 import sys
 import uuid
-from collections import Mapping
+from collections import Mapping, OrderedDict, namedtuple
 from contextlib import contextmanager
-from functools import partial
+from functools import lru_cache, partial
 from itertools import chain
 from pathlib import Path
 from subprocess import PIPE, Popen, check_call, check_output
@@ -23,7 +26,7 @@ from pkg_resources import parse_version
 from raven.processors import SanitizePasswordsProcessor
 from termcolor import cprint
 
-from conjureup import consts
+from conjureup import consts, registry, spellsearch, telemetry
 from conjureup.app_config import app
 from conjureup.models.metadata import SpellMetadata
 from conjureup.telemetry import track_event
@@ -202,8 +205,8 @@ async def arun(cmd, input=None, check=False, env=None, encoding='utf8',
 
 
 def sentry_report(message=None, exc_info=None, tags=None, **kwargs):
-    app.loop.run_in_executor(None, partial(_sentry_report,
-                                           message, exc_info, tags, **kwargs))
+    telemetry.report(partial(_sentry_report,
+                             message, exc_info, tags, **kwargs))
 
 
 def _sentry_report(message=None, exc_info=None, tags=None, **kwargs):
@@ -262,12 +265,56 @@ async def can_sudo(password=None):
 
 def juju_version():
     """ Get current Juju version
+
+    The version is detected once per juju binary and cached for the rest of
+    the process.
     """
-    cmd = run_script('{} version'.format(app.juju.bin_path))
-    if cmd.returncode == 0:
-        return parse_version(cmd.stdout.decode().strip())
-    else:
-        raise Exception("Could not determine Juju version.")
+    return _detect_juju_version(app.juju.bin_path)
+
+
+def juju_supports(capability):
+    """ Checks whether the current Juju supports a capability listed in
+    consts.JUJU_CAPABILITIES
+    """
+    return juju_version() >= parse_version(
+        consts.JUJU_CAPABILITIES[capability])
+
+
+def _parse_juju_version(version_str):
+    """ Parses `juju version` output, ie 2.8.1-focal-amd64, dropping the
+    series and architecture so the result compares as a release version
+    """
+    parts = version_str.strip().split('-')
+    if len(parts) >= 3:
+        parts = parts[:-2]
+    return parse_version('-'.join(parts))
+
+
+def _snap_juju_version(bin_path):
+    """ Reads the version of the juju snap from its metadata, or None if
+    bin_path is not provided by the juju snap
+    """
+    if bin_path != '/snap/bin/juju':
+        return None
+    snap_yaml = Path('/snap/juju/current/meta/snap.yaml')
+    try:
+        for line in snap_yaml.read_text().splitlines():
+            if line.startswith('version:'):
+                return line.split(':', 1)[1].strip().strip('\'"')
+    except OSError:
+        pass
+    return None
+
+
+@lru_cache(maxsize=None)
+def _detect_juju_version(bin_path):
+    version_str = _snap_juju_version(bin_path)
+    if version_str is None:
+        cmd = run_script('{} version'.format(bin_path))
+        if cmd.returncode != 0:
+            raise Exception("Could not determine Juju version.")
+        version_str = cmd.stdout.decode()
+    return _parse_juju_version(version_str)
 
 
 def snap_version():
@@ -495,6 +542,10 @@ def set_chosen_spell(spell_name, spell_dir):
 
 
 def set_spell_metadata():
+    compiled = registry.current_spell()
+    if compiled is not None:
+        app.metadata = SpellMetadata(compiled['metadata'])
+        return
     app.metadata = SpellMetadata.load(
         Path(app.config['spell-dir']) / 'metadata.yaml')
 
@@ -502,6 +553,12 @@ def set_spell_metadata():
 def get_spell_metadata(spell):
     """ Returns metadata about spell
     """
+    compiled = None
+    if app.registry is not None:
+        compiled = app.registry.spell(spell)
+    if compiled is not None:
+        return SpellMetadata(compiled['metadata'])
+
     metadata_path = Path(app.config['spells-dir']) / spell / 'metadata.yaml'
 
     return SpellMetadata.load(metadata_path)
@@ -510,7 +567,11 @@ def get_spell_metadata(spell):
 def __available_on_darwin(key):
     """ Returns True if spell is available on macOS
     """
-    metadata = get_spell_metadata(key)
+    if app.registry is not None and key in app.registry:
+        # the compiled index has what we need without decoding the spell
+        metadata = SpellMetadata(app.registry.clouds[key])
+    else:
+        metadata = get_spell_metadata(key)
     if metadata.cloud_whitelist \
        and 'localhost' in metadata.cloud_whitelist:
         return False
@@ -519,18 +580,41 @@ def __available_on_darwin(key):
     return True
 
 
-def find_spells():
-    """ Find spells, excluding localhost only and snap spells if not linux
+def spell_search_index():
+    """ Returns the search index of the spells registry, loading it on
+    first use
     """
+    if app.spells_search is None:
+        app.spells_search = spellsearch.load_index(
+            app.config['spells-dir'], app.spells_index, app.addons_aliases,
+            __available_on_darwin if is_darwin() else None)
+    return app.spells_search
+
+
+def _indexed_spells(keys):
+    """ Returns (category, spell) for each spell key, excluding those not
+    available on this platform
+    """
+    index = spell_search_index()
     _spells = []
-    for category, cat_dict in app.spells_index.items():
-        for sd in cat_dict['spells']:
-            if is_darwin() and not __available_on_darwin(sd['key']):
+    for key in keys:
+        entry = index.spells[key]
+        if is_darwin():
+            available = entry.get('darwin')
+            if available is None:
+                available = __available_on_darwin(key)
+            if not available:
                 continue
-            _spells.append((category, sd))
+        _spells.append((entry['category'], entry['spell']))
     return _spells
 
 
+def find_spells():
+    """ Find spells, excluding localhost only and snap spells if not linux
+    """
+    return _indexed_spells(spell_search_index().spells)
+
+
 def find_addons_matching(key):
     if key in app.addons_aliases:
         return app.addons_aliases[key]
@@ -538,23 +622,23 @@ def find_addons_matching(key):
 
 
 def find_spells_matching(key):
-    if key in app.spells_index:
-        _spells = []
-        for sd in app.spells_index[key]['spells']:
-            if is_darwin() and not __available_on_darwin(sd['key']):
-                continue
-            _spells.append((key, sd))
-        return _spells
-
-    for category, d in app.spells_index.items():
-        for spell in d['spells']:
-            if spell['key'] == key:
-                if is_darwin() and not __available_on_darwin(spell['key']):
-                    continue
-                return [(category, spell)]
+    """ Find the spells of category key, or the spell key itself
+    """
+    index = spell_search_index()
+    if key in index.categories:
+        return _indexed_spells(index.categories[key])
+    if key in index.spells:
+        return _indexed_spells([key])
     return []
 
 
+def search_spells(query):
+    """ Find spells whose key, name, description, category or addon
+    aliases match query by prefix or fuzzily, most relevant first
+    """
+    return _indexed_spells(spell_search_index().search(query))
+
+
 def get_options_whitelist(service_name):
     """returns list of whitelisted option names.
     If there is no whitelist, returns []
@@ -617,12 +701,86 @@ def is_valid_hostname(hostname):
     return all(allowed.match(x) for x in hostname.split("."))
 
 
+def positive_int(value):
+    """ argparse type for options counting things, such as jobs, which
+    must be at least 1
+    """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            '{} is not a positive number'.format(value))
+    return number
+
+
 def set_terminal_title(title):
     """ Sets the terminal title
     """
     sys.stdout.write("\x1b]2;{}\x07".format(title))
 
 
+NetworkInterface = namedtuple('NetworkInterface', ['name', 'physical', 'ipv4'])
+
+# ioctl request for an interface's primary IPv4 address, see netdevice(7)
+SIOCGIFADDR = 0x8915
+
+
+def _get_ipv4_addr(sock, iface):
+    """ Returns the primary IPv4 address of iface, or None if it has none
+    """
+    ifreq = struct.pack('256s', iface.encode('utf8')[:15])
+    try:
+        ifreq = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, ifreq)
+    except OSError:
+        return None
+    return socket.inet_ntoa(ifreq[20:24])
+
+
+@lru_cache(maxsize=None)
+def _enumerate_network_interfaces():
+    interfaces = OrderedDict()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for device in sorted(Path('/sys/class/net').glob('*')):
+            parts = str(device.resolve()).split('/')
+            interfaces[device.name] = NetworkInterface(
+                name=device.name,
+                physical="virtual" not in parts,
+                ipv4=_get_ipv4_addr(sock, device.name))
+    finally:
+        sock.close()
+    return interfaces
+
+
+def get_network_interfaces(refresh=False):
+    """ Returns an OrderedDict of NetworkInterface tuples by name, ipv4 only
+
+    Interfaces and their addresses are read in a single pass over
+    /sys/class/net with SIOCGIFADDR, without running any commands, and
+    kept for the rest of the session.
+
+    Arguments:
+    refresh: re-read interfaces, ie after a bridge has been created
+    """
+    if refresh:
+        _enumerate_network_interfaces.cache_clear()
+    return _enumerate_network_interfaces()
+
+
+def get_network_interface(iface, refresh=False):
+    """ Returns the NetworkInterface for iface, or None if there is no such
+    interface
+
+    Arguments:
+    iface: interface to query
+    refresh: re-read interfaces first
+    """
+    interfaces = get_network_interfaces(refresh)
+    if iface not in interfaces or interfaces[iface].ipv4 is None:
+        # may have been created, or given an address, since we last looked
+        interfaces = get_network_interfaces(refresh=True)
+    return interfaces.get(iface)
+
+
 def get_physical_network_interfaces():
     """ Returns a list of physical network interfaces
 
@@ -631,18 +789,9 @@ def get_physical_network_interfaces():
     all devices are considered virtual and all network device
     naming follows the ethX pattern.
     """
-    sys_class_net = Path('/sys/class/net')
-    devices = []
-    for device in sys_class_net.glob("*"):
-        parts = str(device.resolve()).split('/')
-        if "virtual" in parts and not parts[-1].startswith('eth'):
-            continue
-        try:
-            if not get_physical_network_ipaddr(device.name):
-                continue
-        except Exception:
-            continue
-        devices.append(device.name)
+    devices = [iface.name for iface in get_network_interfaces().values()
+               if (iface.physical or iface.name.startswith('eth')) and
+               iface.ipv4]
     if len(devices) == 0:
         raise Exception(
             "Could not find a suitable physical network interface "
@@ -657,20 +806,11 @@ def get_physical_network_ipaddr(iface):
     Arguments:
     iface: interface to query
     """
-    out = run_script('ip addr show {}'.format(iface))
-    if out.returncode != 0:
+    network_interface = get_network_interface(iface)
+    if network_interface is None:
         raise Exception(
             "Could not determine an IPv4 address for {}".format(iface))
-
-    app.log.debug("Parsing {} for IPv4 address".format(
-        out.stdout.decode('utf8')))
-
-    try:
-        ipv4_addr = out.stdout.decode(
-            'utf8').split('inet ')[1].split('/')[0]
-    except IndexError:
-        return None
-    return ipv4_addr
+    return network_interface.ipv4
 
 
 def get_open_port():
@@ -0,0 +1,120 @@
+""" YAML I/O
+
+Every YAML document conjure-up reads or writes goes through here, so it
+is always parsed and emitted safely, using libyaml when PyYAML was built
+with it.
+
+Files read with load_file() are cached by path, modification time and
+size. The cached documents are shared, so they are handed out as
+read-only views (mappings become MappingProxyType, lists become tuples);
+pass mutable=True to get a private, writable copy instead, which is
+still much cheaper than parsing the file again.
+"""
+
+import threading
+from collections import Mapping, OrderedDict
+from pathlib import Path
+from types import MappingProxyType
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as _SafeDumper
+    from yaml import CSafeLoader as Loader
+except ImportError:
+    from yaml import SafeDumper as _SafeDumper
+    from yaml import SafeLoader as Loader
+
+YAMLError = yaml.YAMLError
+
+
+class Dumper(_SafeDumper):
+    """ Safe dumper that also emits frozen documents, tuples and
+    subclasses of dict (e.g. Bundle) as plain YAML
+    """
+
+
+Dumper.add_representer(MappingProxyType, Dumper.represent_dict)
+Dumper.add_representer(tuple, Dumper.represent_list)
+Dumper.add_multi_representer(dict, Dumper.represent_dict)
+
+# Number of parsed files kept around
+CACHE_SIZE = 64
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def load(stream):
+    """ Parses a YAML document from a string, bytes or file object
+    """
+    return yaml.load(stream, Loader=Loader)
+
+
+def dump(data, stream=None, **kwargs):
+    """ Emits data as YAML, block style unless told otherwise
+
+    If stream is given the document is written to it as it is emitted,
+    otherwise it is returned as a string.
+    """
+    kwargs.setdefault('default_flow_style', False)
+    kwargs.setdefault('Dumper', Dumper)
+    return yaml.dump(data, stream, **kwargs)
+
+
+def dump_file(data, path, **kwargs):
+    """ Writes data to path as YAML, without building the whole document
+    in memory first
+    """
+    with open(str(path), 'w') as fp:
+        dump(data, fp, **kwargs)
+
+
+def freeze(data):
+    """ Returns a read-only view of a parsed document
+    """
+    if isinstance(data, Mapping):
+        return MappingProxyType({k: freeze(v) for k, v in data.items()})
+    if isinstance(data, (list, tuple)):
+        return tuple(freeze(v) for v in data)
+    return data
+
+
+def thaw(data):
+    """ Returns a writable copy of a (possibly frozen) document
+    """
+    if isinstance(data, Mapping):
+        return {k: thaw(v) for k, v in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [thaw(v) for v in data]
+    return data
+
+
+def load_file(path, mutable=False):
+    """ Parses a YAML file, reusing the previous result if the file hasn't
+    changed since
+    """
+    path = Path(path).resolve()
+    st = path.stat()
+    key = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == key:
+            _cache.move_to_end(path)
+            document = cached[1]
+        else:
+            document = None
+    if document is None:
+        document = freeze(load(path.read_text()))
+        with _cache_lock:
+            _cache[path] = (key, document)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    if mutable:
+        return thaw(document)
+    return document
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
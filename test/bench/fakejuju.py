@@ -0,0 +1,908 @@
+#!/usr/bin/env python
+#
+# Stand-ins for the Juju controller API and the charmstore
+#
+# Copyright Canonical, Ltd.
+""" Stand-ins for the Juju controller API and the charmstore
+
+FakeJuju is a websocket server speaking the part of the Juju API that
+conjure-up uses through python-libjuju:
+
+- logging in to the controller and its models, and the pinger
+- listing and creating models
+- deploying bundles: Bundle.GetChanges plans a charm, an application and
+  a unit per unit of the bundle, as a Juju 2.8 controller would for
+  machines, and the Client, Application and Annotations calls apply it
+- the AllWatcher, whose deltas take every unit from allocating to active
+  over the settle time
+
+CharmStoreStub is an HTTP server answering the charmstore metadata
+queries, with made up revisions and no resources.
+
+Both answer after a tunable latency, and can be told to fail a share of
+their requests: FakeJuju by API call ("Application.Deploy", or "*" for
+any call), the charmstore stub for any query. A share of the units can
+also be made to end up blocked.
+
+Clients find the controller through the JujuData written by
+write_juju_data(), and the charmstore through $CHARMSTORE. Run this file
+to serve both until interrupted:
+
+    python test/bench/fakejuju.py --juju-data DIR [--latency SECONDS]
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import re
+import ssl
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import websockets
+import yaml
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+AGENT_VERSION = '2.8.1'
+USER = 'admin'
+PASSWORD = 'fake-juju-password'
+
+# Facade versions spoken, all known to python-libjuju 2.8.1 (see
+# client_facades in juju/client/connection.py)
+FACADES = {
+    'AllWatcher': 1,
+    'Annotations': 2,
+    'Application': 8,
+    'Bundle': 3,
+    'Client': 2,
+    'Controller': 9,
+    'ModelConfig': 2,
+    'ModelManager': 4,
+    'Pinger': 1,
+}
+
+# Agent status, workload status and message of a unit as it settles
+SETTLE_STAGES = [
+    ('allocating', 'waiting', 'waiting for machine'),
+    ('executing', 'maintenance', 'installing charm software'),
+    ('executing', 'waiting', 'waiting for relations'),
+    ('idle', 'active', 'Unit is ready'),
+]
+BLOCKED_STAGE = ('idle', 'blocked', 'Injected failure')
+
+API = {}
+
+
+def api(facade, request):
+    """ Registers the handler of an API call
+    """
+    def register(fn):
+        API['{}.{}'.format(facade, request)] = fn
+        return fn
+    return register
+
+
+class APIError(Exception):
+    def __init__(self, message, code=''):
+        super().__init__(message)
+        self.code = code
+
+
+def _now():
+    return datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _status(current, message=''):
+    return {'current': current, 'message': message, 'since': _now(),
+            'version': ''}
+
+
+def make_certificate():
+    """ Returns a self-signed certificate and its key, both in PEM
+    """
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'fake-juju')])
+    now = datetime.datetime.utcnow()
+    cert = (x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=30))
+            .add_extension(x509.BasicConstraints(ca=True, path_length=None),
+                           critical=True)
+            .sign(key, hashes.SHA256()))
+    return (cert.public_bytes(serialization.Encoding.PEM).decode(),
+            key.private_bytes(serialization.Encoding.PEM,
+                              serialization.PrivateFormat.PKCS8,
+                              serialization.NoEncryption()).decode())
+
+
+class Watcher:
+    """ Deltas not yet collected by an AllWatcher
+
+    Changes to an entity between two calls to Next are coalesced, the way
+    the controller does.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.pending = OrderedDict(
+            ((kind, key), [kind, 'change', data])
+            for (kind, key), data in model.entities.items())
+        self.ready = asyncio.Event()
+        self.ready.set()
+        self.stopped = False
+
+    def push(self, kind, key, change, data):
+        self.pending[(kind, key)] = [kind, change, data]
+        self.ready.set()
+
+    async def next(self):
+        while not self.pending:
+            self.ready.clear()
+            await self.ready.wait()
+            if self.stopped:
+                raise APIError('watcher was stopped', 'stopped')
+        deltas = list(self.pending.values())
+        self.pending.clear()
+        return deltas
+
+    def stop(self):
+        self.stopped = True
+        self.ready.set()
+
+
+class Model:
+    """ Entities of a model, as seen by its AllWatchers
+    """
+
+    def __init__(self, fake, name, cloud, region, is_controller=False):
+        self.fake = fake
+        self.name = name
+        self.uuid = str(uuid.uuid4())
+        self.cloud = cloud
+        self.region = region
+        self.entities = OrderedDict()
+        self.watchers = []
+        self.applications = {}
+        self.next_unit = defaultdict(int)
+        self.next_machine = 0
+        self.next_relation = 0
+        self.emit('model', self.uuid, {
+            'model-uuid': self.uuid,
+            'name': name,
+            'life': 'alive',
+            'owner': USER,
+            'controller-uuid': fake.controller_uuid,
+            'is-controller': is_controller,
+            'config': {'name': name, 'uuid': self.uuid},
+            'status': _status('available'),
+            'constraints': {},
+            'sla': {'level': 'unsupported', 'owner': ''},
+        })
+
+    @property
+    def info(self):
+        return {
+            'name': self.name,
+            'uuid': self.uuid,
+            'type': 'iaas',
+            'owner-tag': 'user-' + USER,
+            'controller-uuid': self.fake.controller_uuid,
+            'cloud-tag': 'cloud-' + self.cloud,
+            'cloud-region': self.region,
+            'provider-type': 'lxd',
+            'default-series': 'focal',
+            'is-controller': self.entities[('model', self.uuid)][
+                'is-controller'],
+            'life': 'alive',
+            'status': {'status': 'available', 'info': '', 'since': _now()},
+            'agent-version': AGENT_VERSION,
+            'users': [],
+            'machines': [],
+        }
+
+    def emit(self, kind, key, data, change='change'):
+        if change == 'remove':
+            self.entities.pop((kind, key), None)
+        else:
+            self.entities[(kind, key)] = data
+        for watcher in self.watchers:
+            watcher.push(kind, key, change, data)
+
+    def add_application(self, name, charm_url):
+        self.applications[name] = {
+            'model-uuid': self.uuid,
+            'name': name,
+            'exposed': False,
+            'charm-url': charm_url,
+            'owner-tag': '',
+            'life': 'alive',
+            'min-units': 0,
+            'constraints': {},
+            'subordinate': False,
+            'status': _status('waiting', 'waiting for machine'),
+            'workload-version': '',
+        }
+        self.emit('application', name, self.applications[name])
+
+    def add_unit(self, application):
+        number = self.next_unit[application]
+        self.next_unit[application] += 1
+        machine_id = str(self.next_machine)
+        self.next_machine += 1
+        machine = {
+            'model-uuid': self.uuid,
+            'id': machine_id,
+            'instance-id': '',
+            'agent-status': _status('pending'),
+            'instance-status': _status('pending'),
+            'life': 'alive',
+            'series': 'focal',
+            'jobs': ['JobHostUnits'],
+            'addresses': [],
+            'has-vote': False,
+            'wants-vote': False,
+        }
+        self.emit('machine', machine_id, machine)
+
+        agent, workload, message = SETTLE_STAGES[0]
+        unit = {
+            'model-uuid': self.uuid,
+            'name': '{}/{}'.format(application, number),
+            'application': application,
+            'series': 'focal',
+            'charm-url': self.applications[application]['charm-url'],
+            'life': 'alive',
+            'public-address': '',
+            'private-address': '',
+            'machine-id': machine_id,
+            'ports': [],
+            'port-ranges': [],
+            'principal': '',
+            'subordinate': False,
+            'agent-status': _status(agent),
+            'workload-status': _status(workload, message),
+        }
+        self.emit('unit', unit['name'], unit)
+        self.fake.settle(self, unit, machine)
+        return unit['name']
+
+    def add_relation(self, endpoints):
+        relation_id = self.next_relation
+        self.next_relation += 1
+        data = {
+            'model-uuid': self.uuid,
+            'key': ' '.join('{}:{}'.format(ep['application-name'],
+                                           ep['relation']['name'])
+                            for ep in endpoints),
+            'id': relation_id,
+            'endpoints': endpoints,
+        }
+        self.emit('relation', relation_id, data)
+
+
+class Connection:
+    """ State of one websocket connection
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.logged_in = False
+
+
+class FakeJuju:
+    """ Websocket server standing in for a Juju controller
+
+    Arguments:
+    latency: seconds taken to answer each API call
+    failures: share of the calls to fail, by "Facade.Request" or "*"
+    settle: seconds units take, on average, to become active
+    unit_failure_rate: share of the units ending up blocked
+    seed: seed of the random draws, for repeatable runs
+    """
+
+    def __init__(self, latency=0, failures=None, settle=5,
+                 unit_failure_rate=0, seed=None):
+        self.latency = latency
+        self.failures = failures or {}
+        self.settle_time = settle
+        self.unit_failure_rate = unit_failure_rate
+        self.random = random.Random(seed)
+        self.controller_uuid = str(uuid.uuid4())
+        self.models = OrderedDict()
+        controller_model = Model(self, 'controller', 'localhost',
+                                 'localhost', is_controller=True)
+        self.models[controller_model.uuid] = controller_model
+        self.watchers = {}
+        self.calls = defaultdict(int)
+        self.cacert, self._key = make_certificate()
+        self.endpoint = None
+        self.loop = None
+        self._thread = None
+        self._server = None
+        self._stopped = None
+        self._tmpdir = tempfile.TemporaryDirectory(prefix='fake-juju-')
+
+    def _ssl_context(self):
+        cert_file = Path(self._tmpdir.name) / 'cert.pem'
+        cert_file.write_text(self.cacert + self._key)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(str(cert_file))
+        return context
+
+    def start(self):
+        """ Serves the API from a thread of its own, so that its work
+        doesn't show in the client's profile
+        """
+        started = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self._stopped = asyncio.Event()
+            self._server = self.loop.run_until_complete(websockets.serve(
+                self._serve, '127.0.0.1', 0, ssl=self._ssl_context(),
+                max_size=None, loop=self.loop))
+            port = self._server.sockets[0].getsockname()[1]
+            self.endpoint = '127.0.0.1:{}'.format(port)
+            started.set()
+            self.loop.run_until_complete(self._stopped.wait())
+            self._server.close()
+            self.loop.run_until_complete(self._server.wait_closed())
+            # units still settling
+            tasks = asyncio.Task.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(
+                asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self._stopped.set)
+        self._thread.join()
+        self._tmpdir.cleanup()
+
+    def call(self, fn, *args):
+        """ Runs fn in the server's thread and returns its result
+        """
+        done = threading.Event()
+        result = []
+        self.loop.call_soon_threadsafe(
+            lambda: (result.append(fn(*args)), done.set()))
+        done.wait()
+        return result[0]
+
+    def add_model(self, name, cloud='localhost', region='localhost'):
+        """ Creates a model, as bootstrap creates the default model
+        """
+        def add():
+            model = Model(self, name, cloud, region)
+            self.models[model.uuid] = model
+            return model
+        return self.call(add)
+
+    def write_juju_data(self, juju_data, controller, cloud='localhost',
+                        region='localhost'):
+        """ Registers the controller and its models in a JujuData
+        directory, with a key to create models with and an empty cookie
+        jar
+        """
+        juju_data = Path(juju_data)
+        for subdir in ['ssh', 'cookies']:
+            (juju_data / subdir).mkdir(parents=True, exist_ok=True)
+        (juju_data / 'ssh' / 'juju_id_rsa.pub').write_text(
+            'ssh-rsa AAAAB3NzaC1yc2E fake-juju\n')
+        (juju_data / 'cookies' / '{}.json'.format(controller)).write_text(
+            '[]')
+        (juju_data / 'controllers.yaml').write_text(yaml.safe_dump({
+            'controllers': {controller: {
+                'uuid': self.controller_uuid,
+                'api-endpoints': [self.endpoint],
+                'ca-cert': self.cacert,
+                'cloud': cloud,
+                'region': region,
+                'type': 'lxd',
+                'agent-version': AGENT_VERSION,
+            }},
+            'current-controller': controller,
+        }))
+        (juju_data / 'accounts.yaml').write_text(yaml.safe_dump({
+            'controllers': {controller: {
+                'user': USER,
+                'password': PASSWORD,
+                'last-known-access': 'superuser',
+            }},
+        }))
+        (juju_data / 'models.yaml').write_text(yaml.safe_dump({
+            'controllers': {controller: {
+                'models': {
+                    '{}/{}'.format(USER, model.name): {
+                        'uuid': model.uuid, 'type': 'iaas'}
+                    for model in self.models.values()},
+            }},
+        }))
+
+    async def _serve(self, ws, path):
+        parts = path.strip('/').split('/')
+        model = None
+        if parts[0] == 'model':
+            model = self.models.get(parts[1])
+            if model is None:
+                await ws.close(code=1011, reason='model not found')
+                return
+        conn = Connection(model)
+        tasks = set()
+        try:
+            while True:
+                msg = json.loads(await ws.recv())
+                task = self.loop.create_task(self._answer(ws, conn, msg))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _answer(self, ws, conn, msg):
+        name = '{}.{}'.format(msg['type'], msg['request'])
+        self.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        reply = {'request-id': msg['request-id']}
+        try:
+            if name not in API:
+                raise APIError('no such request - method {} is not '
+                               'implemented'.format(name), 'not implemented')
+            if name != 'Admin.Login' and not conn.logged_in:
+                raise APIError('not logged in', 'unauthorized access')
+            rate = self.failures.get(name, self.failures.get('*', 0))
+            if rate and self.random.random() < rate:
+                raise APIError('injected failure of {}'.format(name))
+            response = API[name](self, conn, msg.get('params') or {},
+                                 msg.get('Id'))
+            if asyncio.iscoroutine(response):
+                response = await response
+            reply['response'] = response
+        except APIError as e:
+            reply.update({'error': str(e), 'error-code': e.code,
+                          'response': {}})
+        try:
+            await ws.send(json.dumps(reply))
+        except websockets.ConnectionClosed:
+            pass
+
+    def settle(self, model, unit, machine):
+        """ Takes a new unit through its settle stages
+        """
+        stages = SETTLE_STAGES[1:]
+        if self.random.random() < self.unit_failure_rate:
+            stages = stages[:-1] + [BLOCKED_STAGE]
+        delays = [self.random.uniform(0, 2 * self.settle_time / len(stages))
+                  for _ in stages]
+        self.loop.create_task(
+            self._settle(model, unit, machine, zip(delays, stages)))
+
+    async def _settle(self, model, unit, machine, stages):
+        for delay, (agent, workload, message) in stages:
+            await asyncio.sleep(delay)
+            if not machine['instance-id']:
+                address = '10.{}.{}.{}'.format(
+                    *(int(machine['id']) + 1).to_bytes(3, 'big'))
+                machine = dict(machine,
+                               **{'instance-id': 'juju-' + machine['id'],
+                                  'agent-status': _status('started'),
+                                  'instance-status': _status('running'),
+                                  'addresses': [{'value': address,
+                                                 'type': 'ipv4',
+                                                 'scope': 'local-cloud'}]})
+                model.emit('machine', machine['id'], machine)
+                unit = dict(unit, **{'public-address': address,
+                                     'private-address': address})
+            unit = dict(unit, **{'agent-status': _status(agent),
+                                 'workload-status': _status(workload,
+                                                            message)})
+            model.emit('unit', unit['name'], unit)
+
+
+def _model(conn):
+    if conn.model is None:
+        raise APIError('not connected to a model')
+    return conn.model
+
+
+@api('Admin', 'Login')
+def login(fake, conn, params, _):
+    if params.get('auth-tag') != 'user-' + USER or \
+       params.get('credentials') != PASSWORD:
+        raise APIError('invalid entity name or password', 'unauthorized '
+                       'access')
+    conn.logged_in = True
+    response = {
+        'facades': [{'name': name, 'versions': [version]}
+                    for name, version in FACADES.items()],
+        'server-version': AGENT_VERSION,
+        'controller-tag': 'controller-' + fake.controller_uuid,
+        'servers': [[{'value': fake.endpoint.split(':')[0],
+                      'port': int(fake.endpoint.split(':')[1]),
+                      'type': 'ipv4', 'scope': 'local-cloud'}]],
+        'user-info': {
+            'identity': 'user-' + USER,
+            'display-name': USER,
+            'controller-access': 'superuser',
+            'model-access': 'admin' if conn.model else '',
+        },
+    }
+    if conn.model:
+        response['model-tag'] = 'model-' + conn.model.uuid
+    return response
+
+
+@api('Pinger', 'Ping')
+def ping(fake, conn, params, _):
+    return {}
+
+
+@api('Controller', 'AllModels')
+def all_models(fake, conn, params, _):
+    return {'user-models': [
+        {'model': {'name': model.name, 'uuid': model.uuid, 'type': 'iaas',
+                   'owner-tag': 'user-' + USER}}
+        for model in fake.models.values()]}
+
+
+@api('Controller', 'ControllerAPIInfoForModels')
+def controller_api_info(fake, conn, params, _):
+    return {'results': [{'addresses': [fake.endpoint],
+                         'cacert': fake.cacert}
+                        for _ in params.get('entities', [])]}
+
+
+@api('ModelManager', 'CreateModel')
+def create_model(fake, conn, params, _):
+    name = params['name']
+    if any(model.name == name for model in fake.models.values()):
+        raise APIError('model "{}" for {} already exists'.format(name, USER),
+                       'already exists')
+    cloud = params.get('cloud-tag', 'cloud-localhost').split('-', 1)[1]
+    model = Model(fake, name, cloud, params.get('region') or cloud)
+    fake.models[model.uuid] = model
+    return model.info
+
+
+@api('ModelConfig', 'ModelGet')
+def model_get(fake, conn, params, _):
+    return {'config': {key: {'value': value, 'source': 'model'}
+                       for key, value in _model(conn).entities[
+                           ('model', conn.model.uuid)]['config'].items()}}
+
+
+@api('Client', 'ModelInfo')
+def model_info(fake, conn, params, _):
+    return _model(conn).info
+
+
+@api('Client', 'WatchAll')
+def watch_all(fake, conn, params, _):
+    watcher = Watcher(_model(conn))
+    conn.model.watchers.append(watcher)
+    watcher_id = str(len(fake.watchers))
+    fake.watchers[watcher_id] = watcher
+    return {'watcher-id': watcher_id}
+
+
+@api('AllWatcher', 'Next')
+async def watcher_next(fake, conn, params, watcher_id):
+    watcher = fake.watchers.get(watcher_id)
+    if watcher is None or watcher.stopped:
+        raise APIError('watcher was stopped', 'stopped')
+    return {'deltas': await watcher.next()}
+
+
+@api('AllWatcher', 'Stop')
+def watcher_stop(fake, conn, params, watcher_id):
+    watcher = fake.watchers.pop(watcher_id, None)
+    if watcher is not None:
+        watcher.stop()
+        watcher.model.watchers.remove(watcher)
+    return {}
+
+
+def _plan(bundle):
+    """ Plans a bundle deployment the way the controller does for a
+    machine cloud, ignoring placement directives
+    """
+    changes = []
+
+    def add(method, args, requires=()):
+        change_id = '{}-{}'.format(method, len(changes))
+        changes.append({'id': change_id, 'method': method, 'args': args,
+                        'requires': list(requires)})
+        return change_id
+
+    series = bundle.get('series', '')
+    deploys = {}
+    applications = bundle.get('applications', bundle.get('services', {}))
+    for name, application in applications.items():
+        charm = add('addCharm', [application['charm'],
+                                 application.get('series', series), ''])
+        deploy = add('deploy', ['$' + charm,
+                                application.get('series', series),
+                                name,
+                                application.get('options', {}),
+                                application.get('constraints', ''),
+                                {}, {},
+                                application.get('bindings', {}),
+                                {}, 0], [charm])
+        deploys[name] = deploy
+        if application.get('expose'):
+            add('expose', ['$' + deploy], [deploy])
+    for name, application in applications.items():
+        for _ in range(application.get('num_units',
+                                       application.get('scale', 0))):
+            add('addUnit', ['$' + deploys[name], None], [deploys[name]])
+    for relation in bundle.get('relations', []):
+        endpoints, requires = [], []
+        for endpoint in relation:
+            name, _, interface = endpoint.partition(':')
+            if name not in deploys:
+                raise APIError('relation refers to unknown application '
+                               '{}'.format(name))
+            endpoints.append('$' + deploys[name] +
+                             (':' + interface if interface else ''))
+            requires.append(deploys[name])
+        add('addRelation', endpoints, requires)
+    return changes
+
+
+@api('Bundle', 'GetChanges')
+def get_changes(fake, conn, params, _):
+    try:
+        return {'changes': _plan(yaml.safe_load(params['yaml'])),
+                'errors': []}
+    except APIError as e:
+        return {'changes': [], 'errors': [str(e)]}
+
+
+@api('Client', 'AddCharm')
+def add_charm(fake, conn, params, _):
+    return {}
+
+
+@api('Client', 'AddMachines')
+def add_machines(fake, conn, params, _):
+    model = _model(conn)
+    machines = []
+    for _ in params.get('params', []):
+        machines.append({'machine': str(model.next_machine)})
+        model.next_machine += 1
+    return {'machines': machines}
+
+
+@api('Application', 'Deploy')
+def deploy(fake, conn, params, _):
+    model = _model(conn)
+    results = []
+    for application in params['applications']:
+        name = application['application']
+        if name in model.applications:
+            results.append({'error': {
+                'message': 'application already exists',
+                'code': 'already exists'}})
+            continue
+        model.add_application(name, application['charm-url'])
+        for _ in range(application.get('num-units') or 0):
+            model.add_unit(name)
+        results.append({})
+    return {'results': results}
+
+
+@api('Application', 'AddUnits')
+def add_units(fake, conn, params, _):
+    model = _model(conn)
+    name = params['application']
+    if name not in model.applications:
+        raise APIError('application "{}" not found'.format(name),
+                       'not found')
+    return {'units': [model.add_unit(name)
+                      for _ in range(params.get('num-units', 1))]}
+
+
+@api('Application', 'AddRelation')
+def add_relation(fake, conn, params, _):
+    model = _model(conn)
+    endpoints = []
+    for endpoint in params['endpoints']:
+        name, _, relation = endpoint.partition(':')
+        if name not in model.applications:
+            raise APIError('application "{}" not found'.format(name),
+                           'not found')
+        endpoints.append({'application-name': name,
+                          'relation': {'name': relation or 'juju-info',
+                                       'role': 'peer',
+                                       'interface': relation or 'juju-info',
+                                       'optional': False,
+                                       'limit': 0,
+                                       'scope': 'global'}})
+    model.add_relation(endpoints)
+    return {'endpoints': {ep['application-name']: ep['relation']
+                          for ep in endpoints}}
+
+
+@api('Application', 'Expose')
+def expose(fake, conn, params, _):
+    model = _model(conn)
+    application = model.applications[params['application']]
+    model.applications[params['application']] = dict(application,
+                                                     exposed=True)
+    model.emit('application', params['application'],
+               model.applications[params['application']])
+    return {}
+
+
+@api('Annotations', 'Set')
+def set_annotations(fake, conn, params, _):
+    return {'results': []}
+
+
+class CharmStoreHandler(BaseHTTPRequestHandler):
+    """ Answers the charmstore metadata queries made through theblues
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.requests += 1
+        if stub.latency:
+            time.sleep(stub.latency)
+        path = urlsplit(self.path).path
+        match = re.match(r'^/v5/(.+)/meta/(any|id)$', path)
+        if stub.random.random() < stub.failure_rate:
+            return self._reply(500, {'Message': 'injected failure',
+                                     'Code': 'internal error'})
+        if match is None:
+            return self._reply(404, {'Message': 'not found',
+                                     'Code': 'not found'})
+        entity = match.group(1).replace('cs:', '', 1)
+        name = entity.rsplit('/', 1)[-1]
+        revision = re.search(r'-(\d+)$', name)
+        if revision is None:
+            revision = stub.revision(name)
+            entity = '{}-{}'.format(entity, revision)
+            name = '{}-{}'.format(name, revision)
+        else:
+            revision = int(revision.group(1))
+        charm_id = 'cs:' + entity
+        self._reply(200, {
+            'Id': charm_id,
+            'Revision': revision,
+            'Meta': {
+                'id': {'Id': charm_id, 'Revision': revision},
+                'resources': [],
+                'charm-config': {'Options': {}},
+                'charm-metadata': {'Name': name.rsplit('-', 1)[0]},
+            },
+        })
+
+    def _reply(self, code, body):
+        data = json.dumps(body).encode('utf8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class CharmStoreStub:
+    """ HTTP server standing in for the charmstore
+
+    Arguments:
+    latency: seconds taken to answer each query
+    failure_rate: share of the queries answered with an error
+    seed: seed of the random draws, for repeatable runs
+    """
+
+    def __init__(self, latency=0, failure_rate=0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self._server = None
+
+    def revision(self, name):
+        return sum(name.encode('utf8')) % 100
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/v5'.format(
+            self._server.server_address[1])
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0),
+                                           CharmStoreHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        threading.Thread(target=self._server.serve_forever,
+                         daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def parse_failures(values):
+    """ Parses NAME=RATE failure options
+    """
+    failures = {}
+    for value in values or []:
+        name, _, rate = value.partition('=')
+        failures[name] = float(rate)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serves a fake Juju controller and charmstore')
+    parser.add_argument('--juju-data', required=True,
+                        help='JujuData directory to register them in')
+    parser.add_argument('--controller', default='fake-juju')
+    parser.add_argument('--model', default='default',
+                        help='Model to create up front')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Seconds taken by every answer')
+    parser.add_argument('--settle', type=float, default=5,
+                        help='Average seconds for units to become active')
+    parser.add_argument('--fail', action='append', metavar='CALL=RATE',
+                        help='Fail a share of an API call, e.g. '
+                        'Application.Deploy=0.5, or * for any call')
+    parser.add_argument('--charmstore-failure-rate', type=float, default=0)
+    parser.add_argument('--unit-failure-rate', type=float, default=0)
+    opts = parser.parse_args()
+
+    fake = FakeJuju(opts.latency, parse_failures(opts.fail), opts.settle,
+                    opts.unit_failure_rate).start()
+    store = CharmStoreStub(opts.latency,
+                           opts.charmstore_failure_rate).start()
+    fake.add_model(opts.model)
+    fake.write_juju_data(opts.juju_data, opts.controller)
+    print('Controller {} at {}, registered in {}'.format(
+        opts.controller, fake.endpoint, opts.juju_data))
+    print('export JUJU_DATA={} CHARMSTORE={}'.format(opts.juju_data,
+                                                     store.url))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.stop()
+        fake.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+#
+# End-to-end benchmark of a headless run
+#
+# Copyright Canonical, Ltd.
+""" End-to-end benchmark of a headless run
+
+Runs the whole headless path of conjure-up, app.main included, against
+stand-ins for everything outside of it, so what is measured is
+conjure-up's own overhead:
+
+- juju, juju-wait and lxc are the scriptable stand-in in bin/, answering
+  from a scenario file (see scenario.json and bin/standin)
+- the LXD API is served on a unix socket in a temporary $LXD_DIR
+- the Juju controller API and the charmstore are the stand-ins in
+  fakejuju.py, answering after the scenario's api-latency; the controller
+  the juju stand-in bootstraps is registered with them up front
+- spells come from the local registry in spells/
+
+Nothing needs the network, so it can run in CI:
+
+    python test/bench/headless.py [--scenario FILE] [--output FILE]
+
+With --plan, what is measured is a --plan dry run of the same spell
+instead, which is all startup.
+
+Each controller rendered starts a phase, which lasts until the next one
+is; asynchronous controllers (bootstrap, deploy, ...) are credited with
+the work they started. Per phase, the report has the wall time, the time
+spent in stand-ins, the number of processes started and the peak RSS of
+conjure-up so far.
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+TOPDIR = BENCH_DIR.parent.parent
+SPELL = 'bench-spell'
+CONTROLLER = 'bench'
+MODEL = 'bench-model'
+
+LXD_RESPONSES = {
+    '/1.0': {'environment': {'server_version': '3.0.3'}},
+    '/1.0/networks': [{'name': 'lxdbr0',
+                       'type': 'bridge',
+                       'config': {'ipv4.address': '10.0.8.1/24',
+                                  'ipv6.address': 'none'}}],
+    '/1.0/storage-pools': [{'name': 'default', 'driver': 'dir'}],
+}
+
+
+class LXDHandler(BaseHTTPRequestHandler):
+    """ Answers the LXD API requests made by conjure-up
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        path = self.path.split('?', 1)[0]
+        if path in LXD_RESPONSES:
+            body = {'type': 'sync', 'metadata': LXD_RESPONSES[path]}
+        else:
+            body = {'type': 'error', 'error': 'not found'}
+        data = json.dumps(body).encode('utf8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class LXDServer(socketserver.ThreadingMixIn,
+                socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, lxd_dir, latency):
+        self.latency = latency
+        super().__init__(str(lxd_dir / 'unix.socket'), LXDHandler)
+
+
+class Phases:
+    """ Records the phases of a run, as controllers are rendered
+    """
+
+    def __init__(self):
+        self.phases = []
+        self._lock = threading.Lock()
+
+    def _peak_rss(self):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def enter(self, name):
+        now = time.time()
+        with self._lock:
+            if self.phases:
+                self.phases[-1]['end'] = now
+                self.phases[-1]['peak_rss_kib'] = self._peak_rss()
+            self.phases.append({'name': name, 'start': now, 'forks': 0})
+
+    def forked(self):
+        with self._lock:
+            self.phases[-1]['forks'] += 1
+
+    def finish(self):
+        with self._lock:
+            self.phases[-1]['end'] = time.time()
+            self.phases[-1]['peak_rss_kib'] = self._peak_rss()
+
+
+def instrument(phases):
+    """ Records the phases of conjure-up, and the processes it starts
+    """
+    from conjureup import controllers, events
+
+    class CountingPopen(subprocess.Popen):
+        def __init__(self, *args, **kwargs):
+            phases.forked()
+            super().__init__(*args, **kwargs)
+
+    # both subprocess.run and asyncio subprocesses go through this
+    subprocess.Popen = CountingPopen
+
+    use = controllers.use
+
+    def recording_use(name):
+        phases.enter(name)
+        return use(name)
+
+    controllers.use = recording_use
+
+    shutdown = events.Shutdown.set
+
+    def recording_shutdown(*args, **kwargs):
+        if not events.Shutdown.is_set():
+            phases.enter('shutdown')
+        return shutdown(*args, **kwargs)
+
+    events.Shutdown.set = recording_shutdown
+
+
+def run_child(workspace, plan=False):
+    """ Runs conjure-up headless in this process and writes the phases
+    to the report
+    """
+    phases = Phases()
+    phases.enter('startup')
+    instrument(phases)
+
+    from conjureup import app as conjure_app
+    sys.argv = ['conjure-up', SPELL, 'localhost', CONTROLLER, MODEL,
+                '--no-sync', '--notrack', '--noreport',
+                '--spells-dir', str(workspace / 'spells'),
+                '--cache-dir', str(workspace / 'cache')]
+    if plan:
+        sys.argv.append('--plan')
+    exit_code = 1
+    try:
+        conjure_app.main()
+    except SystemExit as e:
+        exit_code = e.code
+    phases.finish()
+    report = {'exit_code': exit_code, 'phases': phases.phases}
+    (workspace / 'report.json').write_text(json.dumps(report))
+
+
+def external_time(phases, log_path):
+    """ Credits the time spent in stand-ins to the phase they started in
+    """
+    for phase in phases:
+        phase['external'] = 0.0
+    if not log_path.exists():
+        return
+    for line in log_path.read_text().splitlines():
+        call = json.loads(line)
+        for phase in phases:
+            if phase['start'] <= call['start'] < phase['end']:
+                phase['external'] += call['end'] - call['start']
+                break
+
+
+def run(scenario, keep=False, plan=False):
+    """ Benchmarks one headless run in a scratch workspace and returns
+    its report
+    """
+    # the stand-ins only run here, so they don't weigh on the child
+    from fakejuju import CharmStoreStub, FakeJuju
+
+    workspace = Path(tempfile.mkdtemp(prefix='conjure-up-bench-'))
+    try:
+        lxd_dir = workspace / 'lxd'
+        home = workspace / 'home'
+        for path in [lxd_dir, home]:
+            path.mkdir()
+        shutil.copytree(str(BENCH_DIR / 'spells'), str(workspace / 'spells'))
+
+        with open(str(scenario)) as fp:
+            api_latency = json.load(fp).get('api-latency', 0)
+        server = LXDServer(lxd_dir, api_latency)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        fake = FakeJuju(api_latency, settle=0).start()
+        store = CharmStoreStub(api_latency).start()
+        juju_data = home / '.local' / 'share' / 'juju'
+        fake.add_model(MODEL)
+        fake.write_juju_data(juju_data, CONTROLLER)
+
+        bin_dir = BENCH_DIR / 'bin'
+        env = dict(os.environ,
+                   HOME=str(home),
+                   JUJU_DATA=str(juju_data),
+                   CHARMSTORE=store.url,
+                   JUJU=str(bin_dir / 'juju'),
+                   JUJU_WAIT=str(bin_dir / 'juju-wait'),
+                   LXC=str(bin_dir / 'lxc'),
+                   LXD_DIR=str(lxd_dir),
+                   PATH='{}:{}'.format(bin_dir, os.environ['PATH']),
+                   PYTHONPATH=str(TOPDIR),
+                   CONJURE_BENCH_SCENARIO=str(Path(scenario).resolve()),
+                   CONJURE_BENCH_LOG=str(workspace / 'standin.log'))
+        try:
+            subprocess.run([sys.executable, str(BENCH_DIR / 'headless.py'),
+                            '--child-plan' if plan else '--child',
+                            str(workspace)],
+                           cwd=str(workspace), env=env,
+                           stdout=subprocess.DEVNULL, check=False)
+        finally:
+            server.shutdown()
+            server.server_close()
+            store.stop()
+            fake.stop()
+
+        report_path = workspace / 'report.json'
+        if not report_path.exists():
+            raise RuntimeError('The run failed, see {}'.format(
+                workspace / 'cache' / 'conjure-up.log'))
+        report = json.loads(report_path.read_text())
+        external_time(report['phases'], workspace / 'standin.log')
+        report['workspace'] = str(workspace)
+        return report
+    finally:
+        if not keep:
+            shutil.rmtree(str(workspace), ignore_errors=True)
+
+
+def print_report(report):
+    from prettytable import PrettyTable
+
+    table = PrettyTable()
+    table.field_names = ['Phase', 'Wall (s)', 'Stand-ins (s)', 'Forks',
+                         'Peak RSS (MiB)']
+    for phase in report['phases']:
+        table.add_row([phase['name'],
+                       '{:.3f}'.format(phase['end'] - phase['start']),
+                       '{:.3f}'.format(phase['external']),
+                       phase['forks'],
+                       '{:.1f}'.format(phase['peak_rss_kib'] / 1024)])
+    phases = report['phases']
+    table.add_row(['total',
+                   '{:.3f}'.format(phases[-1]['end'] - phases[0]['start']),
+                   '{:.3f}'.format(sum(p['external'] for p in phases)),
+                   sum(p['forks'] for p in phases),
+                   '{:.1f}'.format(phases[-1]['peak_rss_kib'] / 1024)])
+    print(table)
+    print('Exit code: {}'.format(report['exit_code']))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmarks a headless conjure-up run')
+    parser.add_argument('--scenario', default=str(BENCH_DIR /
+                                                  'scenario.json'),
+                        help='Responses of the stand-ins')
+    parser.add_argument('--output', help='Also write the report here')
+    parser.add_argument('--keep', action='store_true',
+                        help='Keep the workspace, logs included')
+    parser.add_argument('--plan', action='store_true',
+                        help='Benchmark a --plan dry run instead')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--child-plan', help=argparse.SUPPRESS)
+    opts = parser.parse_args()
+
+    if opts.child:
+        return run_child(Path(opts.child))
+    if opts.child_plan:
+        return run_child(Path(opts.child_plan), plan=True)
+
+    report = run(opts.scenario, opts.keep, opts.plan)
+    print_report(report)
+    if opts.keep:
+        print('Workspace: {}'.format(report['workspace']))
+    if opts.output:
+        Path(opts.output).write_text(json.dumps(report, indent=2))
+    return 0 if report['exit_code'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+#
+# Load test of the deploy screen against a fake controller
+#
+# Copyright Canonical, Ltd.
+""" Load test of the deploy screen against a fake controller
+
+Drives the deploy screen the way DeployController.render does: it
+creates the model, deploys a synthetic bundle through python-libjuju,
+refreshes DeployStatusView until the wait for the applications is over,
+and draws it after every refresh. The controller and the charmstore are
+the stand-ins in fakejuju.py, served from another thread so that their
+work stays out of the numbers; juju-wait is the stand-in in bin/, lasting
+as long as the units take to settle.
+
+    python test/bench/load.py [--applications N] [--units N]
+                              [--latency SECONDS] [--fail CALL=RATE]
+                              [--profile FILE] [--output FILE]
+
+The report has the duration of each phase, the time taken by each part
+of a refresh, and how late the event loop got to a 100ms ticker, which
+is how long the screen was unresponsive. --profile writes cProfile
+statistics of the whole run, to be read with pstats or snakeviz.
+"""
+
+import argparse
+import asyncio
+import cProfile
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+from kv import KV  # noqa isort:skip
+
+from conjureup import charm, events, juju  # noqa isort:skip
+from conjureup.app import parse_options  # noqa isort:skip
+from conjureup.app_config import app  # noqa isort:skip
+from conjureup.bundle import Bundle  # noqa isort:skip
+from conjureup.controllers.juju.deploy import common  # noqa isort:skip
+from conjureup.controllers.juju.deploy.gui import DeployController  # noqa isort:skip
+from conjureup.models.conjurefile import Conjurefile  # noqa isort:skip
+from conjureup.models.metadata import SpellMetadata  # noqa isort:skip
+from conjureup.ui.views.deploystatus import DeployStatusView  # noqa isort:skip
+from fakejuju import CharmStoreStub, FakeJuju, parse_failures  # noqa isort:skip
+
+CONTROLLER = 'load'
+MODEL = 'load-model'
+SCREEN = (200, 60)
+TICK = 0.1
+
+
+def make_bundle(applications, units):
+    """ A bundle of applications related in a chain
+    """
+    names = ['app{:03d}'.format(i) for i in range(applications)]
+    return {
+        'series': 'focal',
+        'applications': {
+            name: {'charm': 'cs:{}'.format(name), 'num_units': units}
+            for name in names},
+        'relations': [['{}:db'.format(a), '{}:db'.format(b)]
+                      for a, b in zip(names, names[1:])],
+    }
+
+
+class Timings:
+    """ Durations of the parts of a run
+    """
+
+    def __init__(self):
+        self.marks = {}
+        self.samples = {}
+        self.error = None
+
+    def mark(self, name):
+        self.marks[name] = time.monotonic()
+
+    def timed(self, name, fn):
+        samples = self.samples.setdefault(name, [])
+
+        def wrapper(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                samples.append(time.monotonic() - start)
+        return wrapper
+
+
+def setup_app(workspace, opts, fake, store):
+    juju_data = workspace / 'juju'
+    fake.write_juju_data(juju_data, CONTROLLER)
+    scenario = workspace / 'scenario.json'
+    scenario.write_text(json.dumps({'commands': {'juju-wait': {
+        'stderr': 'INFO Waiting for the model to settle\n',
+        'latency': 2 * opts.settle,
+    }}}))
+    os.environ.update(JUJU_DATA=str(juju_data),
+                      CONJURE_BENCH_SCENARIO=str(scenario))
+    charm.cs = store.url
+
+    logging.basicConfig(level=logging.WARNING)
+    app.log = logging.getLogger('conjure-up.load')
+    app.loop = asyncio.get_event_loop()
+    app.state = KV(str(workspace / 'state.db'))
+    app.env = dict(os.environ,
+                   CONJURE_UP_CACHEDIR=str(workspace),
+                   CONJURE_UP_SPELL='load')
+    app.config = {'spell': 'load', 'spell-dir': str(workspace)}
+    app.metadata = SpellMetadata({'friendly-name': 'Load test'})
+    app.conjurefile = Conjurefile.load([])
+    app.conjurefile.merge_argv(parse_options([]), parse_options([]))
+    app.provider = SimpleNamespace(controller=CONTROLLER, model=MODEL,
+                                   cloud='localhost', region='localhost',
+                                   credential=None)
+    app.current_bundle = Bundle(make_bundle(opts.applications, opts.units))
+    app.steps = []
+    app.ui = SimpleNamespace(quit=lambda *args: None)
+    app.juju.wait_path = str(BENCH_DIR / 'bin' / 'juju-wait')
+    app.juju.charmstore = charm.CachingCharmStore(app.loop)
+
+
+async def ticker(lags):
+    """ Records how late the event loop runs a periodic callback
+    """
+    while not events.ModelSettled.is_set():
+        start = time.monotonic()
+        await asyncio.sleep(TICK)
+        lags.append(time.monotonic() - start - TICK)
+
+
+async def drive(timings, lags):
+    """ Runs what DeployController.render schedules, with a screen that
+    is drawn after every refresh
+    """
+    controller = DeployController()
+    controller._build_view_data = timings.timed(
+        'build view data', controller._build_view_data)
+    view = DeployStatusView()
+    refresh_nodes = timings.timed('refresh nodes', view.refresh_nodes)
+    draw = timings.timed('draw', lambda: view.render(SCREEN, focus=True))
+
+    def refresh(applications):
+        refresh_nodes(applications)
+        draw()
+    view.refresh_nodes = refresh
+
+    def footer(msg):
+        timings.mark(msg)
+        view.set_footer(msg)
+
+    tick = app.loop.create_task(ticker(lags))
+    timings.mark('start')
+    tasks = [common.prepare_bundle(footer),
+             juju.create_model(),
+             common.do_deploy(footer),
+             controller._refresh(view),
+             common.wait_for_applications(footer)]
+    try:
+        await asyncio.gather(*tasks)
+    except Exception as e:
+        # injected failures end the run the way they would end a deploy
+        timings.error = '{}: {}'.format(type(e).__name__, e)
+    finally:
+        timings.mark('end')
+        tick.cancel()
+        if app.juju.client is not None:
+            await app.juju.client.disconnect()
+
+
+def run(opts, workspace):
+    fake = FakeJuju(opts.latency, parse_failures(opts.fail), opts.settle,
+                    opts.unit_failure_rate, opts.seed).start()
+    store = CharmStoreStub(opts.latency, opts.charmstore_failure_rate,
+                           opts.seed).start()
+    try:
+        setup_app(workspace, opts, fake, store)
+        timings = Timings()
+        lags = []
+        profile = cProfile.Profile() if opts.profile else None
+        if profile:
+            profile.enable()
+        try:
+            app.loop.run_until_complete(drive(timings, lags))
+        finally:
+            if profile:
+                profile.disable()
+                profile.dump_stats(opts.profile)
+        return report(opts, timings, lags, fake, store)
+    finally:
+        store.stop()
+        fake.stop()
+
+
+def _stats(samples):
+    if not samples:
+        return {'count': 0, 'mean': 0, 'max': 0}
+    return {'count': len(samples),
+            'mean': statistics.mean(samples),
+            'max': max(samples)}
+
+
+def report(opts, timings, lags, fake, store):
+    marks = timings.marks
+
+    def between(first, last):
+        return marks.get(last, marks['end']) - marks.get(first, marks['start'])
+
+    lags = sorted(lags)
+    return {
+        'applications': opts.applications,
+        'units': opts.applications * opts.units,
+        'error': timings.error,
+        'phases': {
+            'model': between('start', 'Deploying Applications.'),
+            'deploy': between('Deploying Applications.',
+                              'Waiting for deployment to settle.'),
+            'settle': between('Waiting for deployment to settle.', 'end'),
+            'total': between('start', 'end'),
+        },
+        'refresh': {name: _stats(samples)
+                    for name, samples in timings.samples.items()},
+        'loop_lag': {'p95': lags[int(len(lags) * 0.95)] if lags else 0,
+                     'max': lags[-1] if lags else 0},
+        'api_calls': dict(fake.calls),
+        'charmstore_requests': store.requests,
+    }
+
+
+def print_report(report):
+    from prettytable import PrettyTable
+
+    print('{} units in {} applications'.format(report['units'],
+                                               report['applications']))
+    table = PrettyTable()
+    table.field_names = ['Phase', 'Wall (s)']
+    for name, duration in report['phases'].items():
+        table.add_row([name, '{:.3f}'.format(duration)])
+    print(table)
+
+    table = PrettyTable()
+    table.field_names = ['Refresh', 'Count', 'Mean (ms)', 'Max (ms)']
+    for name, stats in report['refresh'].items():
+        table.add_row([name, stats['count'],
+                       '{:.1f}'.format(stats['mean'] * 1000),
+                       '{:.1f}'.format(stats['max'] * 1000)])
+    print(table)
+    print('Event loop lag: p95 {:.1f}ms, max {:.1f}ms'.format(
+        report['loop_lag']['p95'] * 1000, report['loop_lag']['max'] * 1000))
+    print('API calls: {}, charmstore requests: {}'.format(
+        sum(report['api_calls'].values()), report['charmstore_requests']))
+    if report['error']:
+        print('The run failed: {}'.format(report['error']))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Load test of the deploy screen')
+    parser.add_argument('--applications', type=int, default=10)
+    parser.add_argument('--units', type=int, default=100,
+                        help='Units per application')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Seconds taken by every API answer')
+    parser.add_argument('--settle', type=float, default=10,
+                        help='Average seconds for units to become active')
+    parser.add_argument('--fail', action='append', metavar='CALL=RATE',
+                        help='Fail a share of an API call, e.g. '
+                        'Application.AddUnits=0.01, or * for any call')
+    parser.add_argument('--charmstore-failure-rate', type=float, default=0)
+    parser.add_argument('--unit-failure-rate', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--profile', help='Write cProfile statistics here')
+    parser.add_argument('--output', help='Also write the report here')
+    opts = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='conjure-up-load-') as workspace:
+        result = run(opts, Path(workspace))
+    print_report(result)
+    if opts.output:
+        Path(opts.output).write_text(json.dumps(result, indent=2))
+    return 0 if result['error'] is None else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
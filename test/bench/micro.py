@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+#
+# Micro-benchmarks of the bundle, Conjurefile and step model hot paths
+#
+# Copyright Canonical, Ltd.
+""" Micro-benchmarks of the bundle, Conjurefile and step model hot paths
+
+These run on every navigation step, so they are timed against synthetic
+inputs far larger than any spell ships today: a 500 application bundle
+with deep overlays, a spell with 50 steps and 40 addons, and a
+Conjurefile configuring all of them.
+
+    python test/bench/micro.py [-k PATTERN] [--save FILE] [--compare FILE]
+
+--save writes the results as a JSON baseline, and --compare reports each
+result against a baseline, exiting non-zero if any got slower than the
+threshold allows. Baselines only mean something on the machine that
+recorded them, so save one from the base revision before comparing.
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import sys
+import tempfile
+import timeit
+from collections import OrderedDict
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent.parent))
+
+from kv import KV  # noqa isort:skip
+
+from conjureup import controllers, registry, utils, yamlio  # noqa isort:skip
+from conjureup.app import parse_options  # noqa isort:skip
+from conjureup.app_config import app  # noqa isort:skip
+from conjureup.bundle import Bundle  # noqa isort:skip
+from conjureup.models.addon import AddonModel  # noqa isort:skip
+from conjureup.models.conjurefile import Conjurefile  # noqa isort:skip
+from conjureup.models.metadata import SpellMetadata  # noqa isort:skip
+from conjureup.models.step import StepModel  # noqa isort:skip
+
+BASELINE_VERSION = 1
+
+APPLICATIONS = 500
+OPTIONS = 20
+OVERLAY_DEPTH = 6
+STEPS = 50
+ADDONS = 40
+ADDON_APPLICATIONS = 10
+ADDON_STEPS = 3
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name):
+    """ Registers a benchmark
+
+    The decorated function does any setup and returns the callable to
+    time.
+    """
+    def decorator(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return decorator
+
+
+def make_bundle(applications=APPLICATIONS, prefix='app'):
+    bundle = {'series': 'bionic', 'applications': {}, 'relations': []}
+    for i in range(applications):
+        name = '{}-{}'.format(prefix, i)
+        bundle['applications'][name] = {
+            'charm': 'cs:{}'.format(name),
+            'num_units': i % 3 + 1,
+            'constraints': 'mem=4G cores=2',
+            'to': ['lxd:{}'.format(i % 10)],
+            'options': {'option-{}'.format(j): 'value-{}'.format(j)
+                        for j in range(OPTIONS)},
+        }
+        if i:
+            bundle['relations'].append(
+                ['{}:db'.format(name), '{}-{}:db'.format(prefix, i - 1)])
+    bundle['machines'] = {str(i): {'series': 'bionic'} for i in range(10)}
+    return bundle
+
+
+def _nested(depth, leaf):
+    if depth == 0:
+        return leaf
+    return {'level-{}'.format(depth): _nested(depth - 1, leaf),
+            'value-{}'.format(depth): [depth, leaf]}
+
+
+def make_overlay(applications=APPLICATIONS, prefix='app'):
+    """ Changes every other application, several levels deep
+    """
+    overlay = {'applications': {}}
+    for i in range(0, applications, 2):
+        overlay['applications']['{}-{}'.format(prefix, i)] = {
+            'num_units': 5,
+            'options': {'option-{}'.format(j): 'overlay-{}'.format(j)
+                        for j in range(0, OPTIONS, 2)},
+            'annotations': _nested(OVERLAY_DEPTH, i),
+        }
+    return overlay
+
+
+def make_removal(applications=APPLICATIONS, prefix='app'):
+    """ Drops every fourth application and some options of the others
+    """
+    removal = {'applications': {}}
+    for i in range(applications):
+        name = '{}-{}'.format(prefix, i)
+        if i % 4 == 0:
+            removal['applications'][name] = None
+        else:
+            removal['applications'][name] = {
+                'options': {'option-{}'.format(j): None
+                            for j in range(0, OPTIONS, 4)}}
+    return removal
+
+
+def make_conjurefile(path):
+    data = {
+        'spell': 'micro',
+        'cloud': 'localhost',
+        'model-config': {'key-{}'.format(i): 'value-{}'.format(i)
+                         for i in range(100)},
+        'steps': {'{:02d}_step'.format(i): {'key-{}'.format(j): j
+                                            for j in range(10)}
+                  for i in range(STEPS)},
+        'addons': {'addon-{}'.format(i): {
+            '{:02d}_step'.format(j): {'key-{}'.format(k): k
+                                      for k in range(10)}
+            for j in range(ADDON_STEPS)}
+            for i in range(ADDONS)},
+    }
+    yamlio.dump_file(data, path)
+
+
+def _write_steps(steps_dir, count):
+    for i in range(count):
+        step_dir = steps_dir / '{:02d}_step'.format(i)
+        step_dir.mkdir(parents=True)
+        yamlio.dump_file({
+            'title': 'Step {}'.format(i),
+            'description': 'Benchmark step {}'.format(i),
+            'viewable': True,
+            'additional-input': [{'key': 'key-{}'.format(j),
+                                  'label': 'Key {}'.format(j),
+                                  'type': 'text',
+                                  'default': str(j)}
+                                 for j in range(5)],
+        }, step_dir / 'metadata.yaml')
+        for phase in ['before-config', 'after-deploy']:
+            (step_dir / phase).write_text('#!/bin/sh\n')
+            (step_dir / phase).chmod(0o755)
+
+
+def make_spell(spell_dir):
+    spell_dir.mkdir(parents=True)
+    yamlio.dump_file({'friendly-name': 'Micro',
+                      'cloud-whitelist': ['localhost']},
+                     spell_dir / 'metadata.yaml')
+    yamlio.dump_file(make_bundle(), spell_dir / 'bundle.yaml')
+    yamlio.dump_file(make_overlay(), spell_dir / 'bundle-custom.yaml')
+    _write_steps(spell_dir / 'steps', STEPS)
+    for i in range(ADDONS):
+        addon_dir = spell_dir / 'addons' / 'addon-{}'.format(i)
+        addon_dir.mkdir(parents=True)
+        yamlio.dump_file({'friendly-name': 'Addon {}'.format(i)},
+                         addon_dir / 'metadata.yaml')
+        yamlio.dump_file(make_bundle(ADDON_APPLICATIONS,
+                                     'addon-{}-app'.format(i)),
+                         addon_dir / 'bundle.yaml')
+        _write_steps(addon_dir / 'steps', ADDON_STEPS)
+
+
+class Fixture:
+    """ Synthetic inputs, and an app set up to use them
+    """
+
+    def __init__(self, workdir):
+        self.workdir = Path(workdir)
+        self.bundle = make_bundle()
+        self.overlay = make_overlay()
+        self.removal = make_removal()
+
+        self.conjurefile = self.workdir / 'Conjurefile'
+        make_conjurefile(self.conjurefile)
+        self.spell_dir = self.workdir / 'micro'
+        make_spell(self.spell_dir)
+        self.manifest_dir = self.workdir / 'micro-manifest'
+        make_spell(self.manifest_dir)
+        registry.write_manifest(self.manifest_dir)
+
+        logging.basicConfig(level=logging.WARNING)
+        app.log = logging.getLogger('conjure-up.bench')
+        app.state = KV(str(self.workdir / 'state.db'))
+        app.env = {}
+        app.conjurefile = Conjurefile.load([self.conjurefile])
+        app.conjurefile.merge_argv(parse_options([]), parse_options([]))
+        self.use_spell(self.spell_dir)
+
+    def use_spell(self, spell_dir):
+        app.config = {'spell': 'micro', 'spell-dir': str(spell_dir)}
+        app.metadata = SpellMetadata.load(spell_dir / 'metadata.yaml')
+        app.steps_data = {}
+
+
+@benchmark('bundle.apply')
+def bench_bundle_apply(fixture):
+    def run():
+        Bundle(fixture.bundle).apply(fixture.overlay)
+    return run
+
+
+@benchmark('bundle.subtract')
+def bench_bundle_subtract(fixture):
+    def run():
+        Bundle(fixture.bundle).subtract(fixture.removal)
+    return run
+
+
+@benchmark('bundle.applications')
+def bench_bundle_applications(fixture):
+    bundle = Bundle(fixture.bundle)
+    return lambda: bundle.applications
+
+
+@benchmark('bundle.to_yaml')
+def bench_bundle_to_yaml(fixture):
+    bundle = Bundle(fixture.bundle)
+    bundle.apply(fixture.overlay)
+    return bundle.to_yaml
+
+
+@benchmark('utils.merge_dicts')
+def bench_merge_dicts(fixture):
+    return lambda: utils.merge_dicts(fixture.bundle, fixture.overlay)
+
+
+@benchmark('conjurefile.load')
+def bench_conjurefile_load(fixture):
+    return lambda: Conjurefile.load([fixture.conjurefile])
+
+
+@benchmark('conjurefile.merge_argv')
+def bench_conjurefile_merge_argv(fixture):
+    conjurefile = Conjurefile.load([fixture.conjurefile])
+    opts = parse_options(['micro', 'localhost', '--debug',
+                          '--bootstrap-series', 'bionic'])
+    defaults = parse_options([])
+    return lambda: conjurefile.merge_argv(opts, defaults)
+
+
+def _load_spell(fixture, spell_dir):
+    fixture.use_spell(spell_dir)
+    StepModel.load_spell_steps()
+    AddonModel.load_spell_addons()
+    app.selected_addons = sorted(app.addons)
+
+
+@benchmark('steps.load_spell_steps')
+def bench_load_spell_steps(fixture):
+    fixture.use_spell(fixture.spell_dir)
+    return StepModel.load_spell_steps
+
+
+@benchmark('steps.load_spell_steps[manifest]')
+def bench_load_spell_steps_manifest(fixture):
+    fixture.use_spell(fixture.manifest_dir)
+    return StepModel.load_spell_steps
+
+
+@benchmark('addons.load_spell_addons')
+def bench_load_spell_addons(fixture):
+    fixture.use_spell(fixture.spell_dir)
+    return AddonModel.load_spell_addons
+
+
+@benchmark('addons.load_spell_addons[manifest]')
+def bench_load_spell_addons_manifest(fixture):
+    fixture.use_spell(fixture.manifest_dir)
+    return AddonModel.load_spell_addons
+
+
+@benchmark('controllers.setup_metadata_controller')
+def bench_setup_metadata_controller(fixture):
+    _load_spell(fixture, fixture.spell_dir)
+    return controllers.setup_metadata_controller
+
+
+def measure(fn, repeat):
+    """ Returns the best and median time of a call to fn, in seconds
+    """
+    fn()
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {'min': min(times),
+            'median': statistics.median(times),
+            'number': number}
+
+
+def run(pattern=None, repeat=5):
+    results = OrderedDict()
+    with tempfile.TemporaryDirectory() as workdir:
+        fixture = Fixture(workdir)
+        for name, bench in BENCHMARKS.items():
+            if pattern and pattern not in name:
+                continue
+            results[name] = measure(bench(fixture), repeat)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """ Returns the ratio of each result to its baseline, and the names
+    of those that regressed
+    """
+    ratios = {}
+    regressed = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratios[name] = result['min'] / baseline[name]['min']
+        if ratios[name] > threshold:
+            regressed.append(name)
+    return ratios, regressed
+
+
+def print_results(results, baseline=None, ratios=None):
+    from prettytable import PrettyTable
+
+    table = PrettyTable()
+    table.field_names = ['Benchmark', 'Best (ms)', 'Median (ms)',
+                         'Baseline (ms)', 'Change']
+    table.align['Benchmark'] = 'l'
+    for name, result in results.items():
+        if baseline and name in baseline:
+            base = '{:.3f}'.format(baseline[name]['min'] * 1000)
+            change = '{:+.1%}'.format(ratios[name] - 1)
+        else:
+            base = change = '-'
+        table.add_row([name,
+                       '{:.3f}'.format(result['min'] * 1000),
+                       '{:.3f}'.format(result['median'] * 1000),
+                       base, change])
+    print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Micro-benchmarks of conjure-up hot paths')
+    parser.add_argument('-k', dest='pattern',
+                        help='Only run benchmarks whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Timing rounds per benchmark')
+    parser.add_argument('--save', help='Write the results as a baseline')
+    parser.add_argument('--compare', help='Compare with this baseline')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='Slowdown ratio counted as a regression')
+    opts = parser.parse_args()
+
+    results = run(opts.pattern, opts.repeat)
+
+    baseline = ratios = None
+    regressed = []
+    if opts.compare:
+        data = json.loads(Path(opts.compare).read_text())
+        if data.get('version') != BASELINE_VERSION:
+            parser.error('{} is not a baseline of this version'.format(
+                opts.compare))
+        baseline = data['results']
+        ratios, regressed = compare(results, baseline, opts.threshold)
+    print_results(results, baseline, ratios)
+
+    if opts.save:
+        Path(opts.save).write_text(json.dumps({
+            'version': BASELINE_VERSION,
+            'python': sys.version.split()[0],
+            'results': results,
+        }, indent=2))
+    if regressed:
+        print('Slower than {:.0%} of the baseline: {}'.format(
+            opts.threshold, ', '.join(regressed)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#
+# tests controllers/bootstrap/common.py
+#
+# Copyright Canonical, Ltd.
+
+
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+
+from conjureup.bundle import BundleInvalidFragment
+from conjureup.controllers.juju.bootstrap import common
+from conjureup.controllers.juju.deploy import common as deploy_common
+
+
+def _models(*names):
+    return {'models': [{'name': 'admin/{}'.format(name),
+                        'short-name': name,
+                        'life': 'alive'} for name in names]}
+
+
+class BootstrapCommonPoolTestCase(unittest.TestCase):
+
+    def test_pool_candidates(self):
+        "bootstrap.common.test_pool_candidates"
+        existing = {
+            'warm-1': {'cloud': 'aws', 'region': 'us-east-1'},
+            'warm-2': {'cloud': 'aws', 'region': 'eu-west-1'},
+            'warm-3': {'cloud': 'google', 'region': 'us-east1'},
+            'prod': {'cloud': 'aws', 'region': 'us-east-1'},
+        }
+        self.assertEqual(
+            common.pool_candidates(existing, ['warm-*'], 'aws', 'us-east-1'),
+            ['warm-1'])
+        self.assertEqual(
+            common.pool_candidates(existing, ['warm-*', 'prod'], 'aws'),
+            ['prod', 'warm-1', 'warm-2'])
+
+    @patch.object(common, 'app')
+    @patch.object(common, 'juju')
+    def test_pick_pooled_controller(self, juju, app):
+        "bootstrap.common.test_pick_pooled_controller"
+        async def list_models(name, timeout):
+            if name == 'slow':
+                await asyncio.sleep(0.1)
+                return _models('controller')
+            if name == 'down':
+                raise asyncio.TimeoutError()
+            if name == 'full':
+                return _models('controller', 'a', 'b')
+            return _models('controller', 'k8s')
+        juju.list_models = list_models
+
+        loop = asyncio.new_event_loop()
+        try:
+            pick = common.pick_pooled_controller
+            self.assertEqual(loop.run_until_complete(
+                pick(['down', 'full', 'slow'], 'k8s', 2)), 'slow')
+            self.assertEqual(loop.run_until_complete(
+                pick(['down', 'full', 'has-model', 'slow'], 'new', 2)),
+                'has-model')
+            self.assertIsNone(loop.run_until_complete(
+                pick(['down', 'full', 'has-model'], 'k8s', 2)))
+        finally:
+            loop.close()
+
+
+class BootstrapCommonPrepareTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.app_patcher = patch.object(common, 'app')
+        self.mock_app = self.app_patcher.start()
+        self.mock_app.loop = self.loop
+        self.mock_app.is_jaas = False
+
+        async def noop(*args, **kwargs):
+            pass
+        self.mock_app.provider.configure_tools = noop
+        self.controller = common.BaseBootstrapController()
+        self.controller.emit = MagicMock()
+        self.controller.is_existing_controller = MagicMock(return_value=True)
+        self.controller.do_add_model = noop
+        self.events_patcher = patch.object(deploy_common, 'events')
+        mock_events = self.events_patcher.start()
+        mock_events.ModelConnected.wait = noop
+        mock_events.BundlePrepared.wait = noop
+
+    def tearDown(self):
+        self.events_patcher.stop()
+        self.app_patcher.stop()
+        self.loop.close()
+
+    def test_prepare_failure_stops_deploy(self):
+        "bootstrap.common.test_prepare_failure_stops_deploy"
+        async def prepare_bundle(msg_cb):
+            raise BundleInvalidFragment('Application ghost has no charm')
+
+        with patch.object(deploy_common, 'prepare_bundle', prepare_bundle), \
+                patch.object(deploy_common, 'controllers') as mock_ctrls:
+            mock_ctrls.use.return_value = self.controller
+            self.loop.run_until_complete(self.controller.run())
+            with self.assertRaises(BundleInvalidFragment):
+                self.loop.run_until_complete(
+                    deploy_common.do_deploy(MagicMock()))
+        mock_ctrls.use.assert_called_once_with('bootstrap')
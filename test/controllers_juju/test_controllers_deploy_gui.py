@@ -36,3 +36,47 @@ class DeployGUIRenderTestCase(unittest.TestCase):
         "call render"
         self.controller.render()
         assert self.mock_app.loop.create_task.called
+
+
+class DeployGUIViewDataTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app_patcher = patch(
+            'conjureup.controllers.juju.deploy.gui.app')
+        self.mock_app = self.app_patcher.start()
+        self.controller = DeployController()
+
+    def tearDown(self):
+        self.app_patcher.stop()
+
+    def _unit(self, name, status):
+        unit = MagicMock(application=name.split('/')[0],
+                         public_address='10.0.0.1',
+                         machine_id='0',
+                         agent_status='idle',
+                         agent_status_message='',
+                         workload_status=status,
+                         workload_status_message='ready')
+        unit.name = name
+        return unit
+
+    def test_build_view_data(self):
+        "deploy.gui.test_build_view_data"
+        client = self.mock_app.juju.client
+        client.applications = {'mysql': MagicMock()}
+        client.units = {'mysql/0': self._unit('mysql/0', 'active'),
+                        'ghost/0': self._unit('ghost/0', 'active')}
+        mysql = MagicMock(num_units=2)
+        mysql.name = 'mysql'
+        ghost = MagicMock(num_units=1)
+        ghost.name = 'ghost'
+
+        view_data = self.controller._build_view_data([mysql, ghost])
+        mysql_units = view_data['mysql']['units']
+        self.assertEqual(sorted(mysql_units), ['mysql/0', 'mysql/1'])
+        self.assertEqual(mysql_units['mysql/0']['workload-status'],
+                         {'status': 'active', 'info': 'ready'})
+        # units not in the model yet are shown as placeholders
+        self.assertEqual(mysql_units['mysql/1']['machine'], '')
+        # as are the units of applications not in the model yet
+        self.assertEqual(view_data['ghost']['units']['ghost/0']['machine'],
+                         '')
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#
+# tests controllers/destroy/common.py
+#
+# Copyright Canonical, Ltd.
+
+
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from conjureup.controllers.juju.destroy import common
+
+NOW = datetime(2018, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _model(name, since, life='alive'):
+    return {'name': 'admin/{}'.format(name), 'short-name': name,
+            'life': life, 'status': {'current': 'available', 'since': since}}
+
+
+class DestroyCommonSelectTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.inventory = {
+            'ci-1': {'models': [
+                _model('controller', '2018-01-01T00:00:00Z'),
+                _model('conjure-kubernetes-core-abc', '2018-05-01T00:00:00Z'),
+                _model('conjure-openstack-def', '3 hours ago'),
+                _model('conjure-dying-ghi', '2018-05-01T00:00:00Z',
+                       life='dying'),
+            ]},
+            'prod': {'models': [
+                _model('conjure-kubernetes-core-xyz', '2018-05-01'),
+            ]},
+        }
+
+    def test_parse_since(self):
+        "destroy.common.test_parse_since"
+        self.assertEqual(common.parse_since('2 hours ago', NOW),
+                         NOW - timedelta(hours=2))
+        self.assertEqual(common.parse_since('just now', NOW), NOW)
+        self.assertEqual(common.parse_since('2018-05-01T10:00:00Z', NOW),
+                         datetime(2018, 5, 1, 10, tzinfo=timezone.utc))
+        assert common.parse_since('sometime', NOW) is None
+
+    def test_select_models(self):
+        "destroy.common.test_select_models"
+        self.assertEqual(
+            common.select_models(self.inventory, ['ci-*:conjure-*'],
+                                 now=NOW),
+            [('ci-1', 'conjure-kubernetes-core-abc'),
+             ('ci-1', 'conjure-openstack-def')])
+        self.assertEqual(
+            common.select_models(self.inventory, ['conjure-*'], 7,
+                                 current_controller='ci-1', now=NOW),
+            [('ci-1', 'conjure-kubernetes-core-abc')])
+        self.assertEqual(
+            common.select_models(self.inventory, ['*:*kubernetes*'], 7,
+                                 now=NOW),
+            [('ci-1', 'conjure-kubernetes-core-abc'),
+             ('prod', 'conjure-kubernetes-core-xyz')])
+
+    def test_select_controllers(self):
+        "destroy.common.test_select_controllers"
+        self.assertEqual(
+            common.select_controllers(['ci-1', 'ci-2', 'prod'],
+                                      ['ci-*:conjure-*', 'model'], 'prod'),
+            ['ci-1', 'ci-2', 'prod'])
+        self.assertEqual(
+            common.select_controllers(['ci-1', 'prod'], ['ci-1:*']),
+            ['ci-1'])
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+#
+# tests controllers/destroy/gui.py and ui/views/destroy.py
+#
+# Copyright Canonical, Ltd.
+
+
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from conjureup import juju
+from conjureup.controllers.juju.destroy import gui
+
+
+def _models(cloud, *names):
+    return {'models': [{'name': name, 'life': 'alive', 'cloud': cloud,
+                        'machines': {'0': {}},
+                        'status': {'since': '2 hours ago'}}
+                       for name in ('controller',) + names]}
+
+
+class DestroyGUIRenderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.app_patcher = patch.object(gui, 'app')
+        self.mock_app = self.app_patcher.start()
+        self.mock_app.loop = self.loop
+        self.track_patcher = patch.object(gui, 'track_screen')
+        self.track_patcher.start()
+        self.get_controllers_patcher = patch.object(juju, 'get_controllers')
+        mock_get_controllers = self.get_controllers_patcher.start()
+        mock_get_controllers.return_value = {
+            'controllers': {'ci-1': {}, 'lab': {}, 'prod': {}}}
+
+        # each controller answers when its future is resolved
+        self.answers = {}
+
+        async def list_models(controller, timeout):
+            return await self.answers.setdefault(
+                controller, self.loop.create_future())
+        self.list_models_patcher = patch.object(juju, 'list_models',
+                                                list_models)
+        self.list_models_patcher.start()
+
+    def tearDown(self):
+        self.list_models_patcher.stop()
+        self.get_controllers_patcher.stop()
+        self.track_patcher.stop()
+        self.app_patcher.stop()
+        self.loop.close()
+
+    def _shown(self, view):
+        # the controllers and models listed, as they are on screen
+        lines = [line.decode('utf8').strip()
+                 for line in view.render((120, 20)).text]
+        return [line for line in lines if line and line != 'QUIT']
+
+    def _answer(self, controller, models=None, error=None):
+        if error is not None:
+            self.answers[controller].set_exception(error)
+        else:
+            self.answers[controller].set_result(models)
+        self.loop.run_until_complete(asyncio.sleep(0))
+
+    def test_render_progressively(self):
+        "controllers.destroy.gui.test_render_progressively"
+        controller = gui.Destroy()
+        with patch.object(gui.app.log, 'warning') as mock_warning:
+            controller.render()
+            self.loop.run_until_complete(asyncio.sleep(0))
+            view = controller.view
+            self.assertEqual(self._shown(view), [
+                'ci-1 (loading models...)',
+                'lab (loading models...)',
+                'prod (loading models...)',
+            ])
+
+            self._answer('prod', _models('aws', 'conjure-k8s'))
+            self.assertEqual(self._shown(view), [
+                'ci-1 (loading models...)',
+                'lab (loading models...)',
+                'prod (aws)',
+                'conjure-k8s, Machine Count: 1, Running since: 2 hours ago',
+            ])
+
+            self._answer('lab', error=LookupError('connection refused\n'))
+            self.assertEqual(self._shown(view)[1],
+                             'lab (unreachable: connection refused)')
+            mock_warning.assert_called_once_with(
+                'Unable to list models of lab: connection refused')
+
+            self._answer('ci-1', _models('localhost', 'conjure-ghost'))
+            self.assertEqual(self._shown(view), [
+                'ci-1 (localhost)',
+                'conjure-ghost, Machine Count: 1, Running since: 2 hours ago',
+                'lab (unreachable: connection refused)',
+                'prod (aws)',
+                'conjure-k8s, Machine Count: 1, Running since: 2 hours ago',
+            ])
+        self.loop.run_until_complete(controller.inventory_task)
+
+    def test_keeps_focus(self):
+        "controllers.destroy.gui.test_keeps_focus"
+        controller = gui.Destroy()
+        controller.render()
+        self.loop.run_until_complete(asyncio.sleep(0))
+        view = controller.view
+        self._answer('lab', _models('maas', 'conjure-k8s'))
+        view._pile.focus_position = view._item_keys.index(
+            ('lab', 'conjure-k8s'))
+
+        # a controller answering above the highlighted model moves it down
+        self._answer('ci-1', _models('aws', 'conjure-a', 'conjure-b'))
+        self.assertEqual(view._item_keys[view._pile.focus_position],
+                         ('lab', 'conjure-k8s'))
+
+        with patch.object(gui, 'controllers') as mock_controllers:
+            view.keypress((80, 20), 'enter')
+        mock_controllers.use.assert_called_once_with('destroyconfirm')
+        mock_controllers.use().render.assert_called_once_with(
+            'lab', _models('maas', 'conjure-k8s')['models'][1])
+        # prod never answered, it is no longer waited for
+        with self.assertRaises(asyncio.CancelledError):
+            self.loop.run_until_complete(controller.inventory_task)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#
+# tests controllers/snap/deploy/common.py
+#
+# Copyright Canonical, Ltd.
+
+
+import asyncio
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from conjureup import errors
+from conjureup.controllers.snap.deploy import common
+
+
+class SnapDeployInstallTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.utils_patcher = patch.object(common, 'utils')
+        self.mock_utils = self.utils_patcher.start()
+        self.cmds = []
+        self.result = (0, '', '')
+
+        async def arun(cmd, **kwargs):
+            self.cmds.append(cmd)
+            return self.result
+        self.mock_utils.arun = arun
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        self.utils_patcher.stop()
+
+    def _app(self, snap, channel, confinement=None):
+        _app = MagicMock()
+        _app.snap = snap
+        _app.channel = channel
+        _app.confinement = confinement
+        return _app
+
+    def test_install_snaps(self):
+        "controllers.snap.deploy.common.test_install_snaps"
+        applications = [self._app('microk8s', '1.18/stable', 'classic'),
+                        self._app('kubectl', 'edge', 'classic'),
+                        self._app('lxd', 'stable')]
+        snap_files = [Path('/cache/microk8s.snap'), Path('/cache/kubectl.snap'),
+                      Path('/cache/lxd.snap')]
+        self.loop.run_until_complete(
+            common.install_snaps(applications, snap_files, MagicMock()))
+        self.assertEqual(self.cmds, [
+            ['sudo', 'snap', 'install', '/cache/microk8s.snap', '--classic'],
+            ['sudo', 'snap', 'switch', '--channel', '1.18/stable',
+             'microk8s'],
+            ['sudo', 'snap', 'install', '/cache/kubectl.snap', '--classic'],
+            ['sudo', 'snap', 'switch', '--channel', 'edge', 'kubectl'],
+            ['sudo', 'snap', 'install', '/cache/lxd.snap'],
+            ['sudo', 'snap', 'switch', '--channel', 'stable', 'lxd'],
+        ])
+
+    def test_install_snaps_failure(self):
+        "controllers.snap.deploy.common.test_install_snaps_failure"
+        self.result = (1, '', 'error: cannot install')
+        with self.assertRaises(errors.DeploymentFailure):
+            self.loop.run_until_complete(common.install_snaps(
+                [self._app('lxd', 'stable')], [Path('/cache/lxd.snap')],
+                MagicMock()))
+        self.assertEqual(len(self.cmds), 1)
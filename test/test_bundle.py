@@ -8,9 +8,11 @@
 import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 import yaml
 
+from conjureup import controllers, yamlio
 from conjureup.bundle import Bundle
 
 
@@ -80,3 +82,45 @@ class BundleTestCase(unittest.TestCase):
         # sub-key delete
         self.assertEqual(bundle,
                          {'foo': {'bar': 1}, 'qux': [1, 2]})
+
+
+class BundleFragmentFileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.spell_dir = Path(self.tmpdir.name)
+        (self.spell_dir / 'bundle.yaml').write_text(
+            'applications:\n'
+            '  a: {charm: cs:a, num_units: 1}\n'
+            '  b: {charm: cs:b, num_units: 1}\n'
+            'relations:\n'
+            '- [a:x, b:y]\n'
+            '- [a:z, b:w]\n')
+        self.app_patcher = patch.object(controllers, 'app')
+        self.mock_app = self.app_patcher.start()
+        self.mock_app.config = {'spell-dir': str(self.spell_dir)}
+        self.mock_app.metadata.spell_type = 'juju'
+        self.mock_app.selected_addons = []
+        self.mock_app.steps = []
+        self.mock_app.conjurefile = {'bundle-add': None,
+                                     'bundle-remove': None}
+
+    def tearDown(self):
+        self.app_patcher.stop()
+        self.tmpdir.cleanup()
+        yamlio.clear_cache()
+
+    def test_bundle_remove_relation(self):
+        "bundle.test_bundle_remove_relation"
+        remove = self.spell_dir / 'remove.yaml'
+        remove.write_text('relations:\n- [a:x, b:y]\n')
+        add = self.spell_dir / 'add.yaml'
+        add.write_text('applications:\n  b: {options: {mode: ha}}\n')
+        self.mock_app.conjurefile['bundle-remove'] = remove
+        self.mock_app.conjurefile['bundle-add'] = add
+        controllers.setup_metadata_controller()
+        bundle = self.mock_app.current_bundle
+        self.assertEqual(bundle['relations'], [['a:z', 'b:w']])
+        # the bundle deployed is plain, writable data
+        self.assertEqual(type(bundle['applications']['b']['options']), dict)
+        bundle['applications']['b']['options']['mode'] = 'single'
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+#
+# tests catalogue.py
+#
+# Copyright Canonical, Ltd.
+
+
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from conjureup.catalogue import CloudCatalogue
+
+CLOUDS = {
+    'aws': {'type': 'ec2', 'defined': 'public',
+            'regions': {'us-east-1': {}, 'eu-west-1': {}}},
+    'localhost': {'type': 'lxd', 'defined': 'public'},
+    'mystack': {'type': 'openstack', 'defined': 'local'},
+}
+CREDENTIALS = {'aws': {'default-credential': 'me', 'me': {}}}
+
+
+class CloudCatalogueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.load_clouds = MagicMock(return_value=CLOUDS)
+        self.load_credentials = MagicMock(return_value=CREDENTIALS)
+        self.load_regions = MagicMock(return_value={'region1': {}})
+        self.catalogue = CloudCatalogue(self.load_clouds,
+                                        self.load_credentials,
+                                        self.load_regions)
+
+    def test_preload(self):
+        "catalogue.test_preload"
+        self.catalogue.preload()
+        self.assertEqual(self.catalogue.clouds(), CLOUDS)
+        self.assertEqual(sorted(self.catalogue.regions('aws')),
+                         ['eu-west-1', 'us-east-1'])
+        self.assertEqual(self.catalogue.regions('localhost'), {})
+        self.assertEqual(self.catalogue.regions('mystack'),
+                         {'region1': {}})
+        self.assertEqual(self.catalogue.credentials(), CREDENTIALS)
+
+        # everything was loaded once, regions only where list-clouds
+        # didn't already have them
+        self.load_clouds.assert_called_once_with()
+        self.load_credentials.assert_called_once_with()
+        self.load_regions.assert_called_once_with('mystack')
+
+    def test_returns_copies(self):
+        "catalogue.test_returns_copies"
+        self.catalogue.credentials()['aws'].pop('default-credential')
+        self.assertIn('default-credential',
+                      self.catalogue.credentials()['aws'])
+
+    def test_invalidate(self):
+        "catalogue.test_invalidate"
+        self.catalogue.clouds()
+        self.catalogue.credentials()
+        self.catalogue.invalidate(clouds=False)
+        self.catalogue.clouds()
+        self.catalogue.credentials()
+        self.assertEqual(self.load_clouds.call_count, 1)
+        self.assertEqual(self.load_credentials.call_count, 2)
+
+    def test_failures_not_cached(self):
+        "catalogue.test_failures_not_cached"
+        self.load_clouds.side_effect = [Exception('boom'), CLOUDS]
+        with self.assertRaises(Exception):
+            self.catalogue.clouds()
+        self.assertEqual(self.catalogue.clouds(), CLOUDS)
+
+    def test_background_threads(self):
+        "catalogue.test_background_threads"
+        started = threading.Event()
+        release = threading.Event()
+        threads = []
+
+        def load_clouds():
+            threads.append(threading.current_thread())
+            started.set()
+            release.wait(5)
+            return CLOUDS
+        self.load_clouds.side_effect = load_clouds
+        self.catalogue.preload()
+        try:
+            self.assertTrue(started.wait(5))
+            # nothing waits on loads still running when conjure-up exits
+            self.assertTrue(threads[0].daemon)
+        finally:
+            release.set()
+        self.assertEqual(self.catalogue.clouds(), CLOUDS)
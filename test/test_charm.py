@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+#
+# tests charm.py
+#
+# Copyright Canonical, Ltd.
+
+
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+
+from theblues.errors import ServerError
+
+from conjureup import charm
+
+from .helpers import test_loop
+
+
+class CachingCharmStoreTestCase(unittest.TestCase):
+
+    def test_lookups_are_cached(self):
+        "charm.test_lookups_are_cached"
+        with test_loop() as loop:
+            store = charm.CachingCharmStore(loop)
+            store._cs = MagicMock()
+            store._cs.entityId.side_effect = lambda url: url + '-1'
+            results = loop.run_until_complete(asyncio.gather(
+                store.entityId('cs:ghost'),
+                store.entityId('cs:ghost'),
+                store.entityId('cs:mysql')))
+            self.assertEqual(results, ['cs:ghost-1', 'cs:ghost-1',
+                                       'cs:mysql-1'])
+            self.assertEqual(store._cs.entityId.call_count, 2)
+
+            store._cs.entityId.side_effect = ValueError('unreachable')
+            with self.assertRaises(ValueError):
+                loop.run_until_complete(store.entityId('cs:haproxy'))
+            # failures are retried on the next lookup
+            store._cs.entityId.side_effect = lambda url: url + '-2'
+            self.assertEqual(
+                loop.run_until_complete(store.entityId('cs:haproxy')),
+                'cs:haproxy-2')
+
+    def test_server_errors_are_retried(self):
+        "charm.test_server_errors_are_retried"
+        with test_loop() as loop, \
+                patch.object(charm.CachingCharmStore, 'RETRY_DELAY', 0):
+            store = charm.CachingCharmStore(loop)
+            store._cs = MagicMock()
+            store._cs.entity.side_effect = [
+                ServerError('502 Bad Gateway'), {'Id': 'cs:ghost-1'}]
+            self.assertEqual(
+                loop.run_until_complete(store.entity('cs:ghost')),
+                {'Id': 'cs:ghost-1'})
+            self.assertEqual(store._cs.entity.call_count, 2)
+
+            store._cs.entity.side_effect = ServerError('503')
+            with self.assertRaises(ServerError):
+                loop.run_until_complete(store.entity('cs:mysql'))
+            self.assertEqual(store._cs.entity.call_count,
+                             2 + charm.CachingCharmStore.ATTEMPTS)
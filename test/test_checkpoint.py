@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#
+# tests checkpoint.py
+#
+# Copyright Canonical, Ltd.
+
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from kv import KV
+
+from conjureup import checkpoint
+from conjureup.bundle import Bundle
+from conjureup.consts import PHASES
+
+
+class CheckpointTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app_patcher = patch.object(checkpoint, 'app')
+        self.mock_app = self.app_patcher.start()
+        self.mock_app.state = KV()
+        self.mock_app.config = {'spell': 'kubernetes-core'}
+        self.mock_app.conjurefile = {'resume': True}
+
+    def tearDown(self):
+        self.app_patcher.stop()
+
+    def test_record(self):
+        "checkpoint.test_record"
+        step = MagicMock()
+        step.name = '00_deploy-done'
+        name = checkpoint.step_checkpoint(step, PHASES.AFTER_DEPLOY)
+        checkpoint.record(name, result='done')
+        checkpoint.record(checkpoint.SETTLED)
+        self.assertEqual(checkpoint.resumed(name), {'result': 'done'})
+        self.assertEqual(checkpoint.resumed(checkpoint.SETTLED), {})
+        assert checkpoint.resumed(checkpoint.DEPLOY) is None
+
+        self.mock_app.conjurefile = {'resume': False}
+        assert checkpoint.resumed(name) is None
+        self.assertEqual(checkpoint.get(name), {'result': 'done'})
+
+        self.mock_app.state['conjure-up.other-spell.checkpoint.settled'] = {}
+        checkpoint.clear()
+        assert checkpoint.get(name) is None
+        assert 'conjure-up.other-spell.checkpoint.settled' in \
+            self.mock_app.state
+
+    def test_target(self):
+        "checkpoint.test_target"
+        assert checkpoint.target() is None
+        checkpoint.record(checkpoint.BOOTSTRAP, controller='c1', model='m1')
+        self.assertEqual(checkpoint.target()['model'], 'm1')
+        checkpoint.record(checkpoint.ADD_MODEL, controller='c1', model='m2')
+        self.assertEqual(checkpoint.target()['model'], 'm2')
+
+    def test_bundle_hash(self):
+        "checkpoint.test_bundle_hash"
+        bundle = Bundle({'applications': {'a': {'charm': 'cs:a',
+                                                'num_units': 1}}})
+        digest = checkpoint.bundle_hash(bundle)
+        self.assertEqual(digest, checkpoint.bundle_hash(
+            Bundle({'applications': {'a': {'num_units': 1,
+                                           'charm': 'cs:a'}}})))
+        bundle.apply({'applications': {'a': {'num_units': 2}}})
+        self.assertNotEqual(digest, checkpoint.bundle_hash(bundle))
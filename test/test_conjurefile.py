@@ -9,6 +9,7 @@ import argparse
 import unittest
 from pathlib import Path
 
+from conjureup.app import parse_options
 from conjureup.models.conjurefile import Conjurefile
 
 
@@ -71,3 +72,22 @@ class ConjurefileTestCase(unittest.TestCase):
         self.conjurefile.merge_argv(args, defaults)
         assert self.conjurefile['spell'] == 'canonical-kubernetes'
         assert self.conjurefile['cloud'] == 'aws/us-east-1'
+
+    def test_conjurefile_choices(self):
+        "conjurefile.test_choices"
+        defaults = parse_options([])
+        self.conjurefile['log-level'] = 'verbose'
+        with self.assertRaises(ValueError) as cm:
+            self.conjurefile.merge_argv(defaults, defaults)
+        self.assertEqual(str(cm.exception),
+                         "Invalid log-level 'verbose', choose from "
+                         "debug, info, warning, error")
+
+        # the command line wins over the file
+        self.conjurefile.merge_argv(parse_options(['--log-level', 'info']),
+                                    defaults)
+        self.assertEqual(self.conjurefile['log-level'], 'info')
+
+        self.conjurefile['log-format'] = 'xml'
+        with self.assertRaises(ValueError):
+            self.conjurefile.merge_argv(defaults, defaults)
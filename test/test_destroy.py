@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+#
+# tests destroy.py
+#
+# Copyright Canonical, Ltd.
+
+
+import unittest
+from unittest.mock import patch
+
+from conjureup import destroy
+
+
+class ParseOptionsTestCase(unittest.TestCase):
+
+    def test_jobs(self):
+        "destroy.test_jobs"
+        self.assertEqual(destroy.parse_options([]).jobs,
+                         destroy.DESTROY_CONCURRENCY)
+        self.assertEqual(destroy.parse_options(['-j', '2']).jobs, 2)
+        for jobs in ['0', '-1', 'many']:
+            with patch('sys.stderr'), self.assertRaises(SystemExit):
+                destroy.parse_options(['--jobs', jobs])
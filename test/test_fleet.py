@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+#
+# tests fleet.py
+#
+# Copyright Canonical, Ltd.
+
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from conjureup import fleet, yamlio
+from conjureup.consts import spell_types
+from conjureup.models.conjurefile import Conjurefile
+
+
+class FleetTargetTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.app_patcher = patch.object(fleet, 'app')
+        self.mock_app = self.app_patcher.start()
+        self.mock_app.conjurefile = Conjurefile()
+        self.mock_app.conjurefile.update({
+            'cache-dir': self.tmpdir.name,
+            'spells-dir': '/tmp/spells',
+            'bundle-add': Path('/tmp/fragment.yaml'),
+            'bundle-remove': None,
+            'fleet': ['aws/us-east-1'],
+            'model-config': {'vpc-id': 'VPC1234'},
+        })
+        self.mock_app.config = {'spell-dir': '/tmp/cache/kubernetes-core'}
+        self.mock_app.selected_addons = []
+
+    def tearDown(self):
+        self.app_patcher.stop()
+        self.tmpdir.cleanup()
+
+    def test_parse_spec(self):
+        "fleet.test_parse_spec"
+        target = fleet.FleetTarget.parse('aws/us-east-1:ctrl:k8s')
+        self.assertEqual(target.label, 'aws-us-east-1-ctrl-k8s')
+        self.assertEqual(target.overrides, {'cloud': 'aws/us-east-1',
+                                            'controller': 'ctrl',
+                                            'model': 'k8s'})
+        self.assertEqual(target.cache_dir,
+                         Path(self.tmpdir.name) / 'fleet' / target.label)
+        with self.assertRaises(ValueError):
+            fleet.FleetTarget.parse(':ctrl')
+
+    def test_parse_conjurefile(self):
+        "fleet.test_parse_conjurefile"
+        path = Path(self.tmpdir.name) / 'eu.yaml'
+        path.write_text('cloud: aws/eu-west-1\nmodel-config:\n'
+                        '  vpc-id: VPC5678\n')
+        target = fleet.FleetTarget.parse(str(path))
+        self.assertEqual(target.label, 'eu')
+
+        conf = target.conjurefile()
+        self.assertEqual(conf['cloud'], 'aws/eu-west-1')
+        self.assertEqual(conf['model-config'], {'vpc-id': 'VPC5678'})
+        for key in ['fleet', 'cache-dir', 'bundle-add']:
+            assert key not in conf
+
+        cmd = target.command(target.cache_dir / 'Conjurefile')
+        self.assertEqual(cmd[-1], '/tmp/cache/kubernetes-core')
+        self.assertEqual(cmd[1:3], ['-m', 'conjureup'])
+        assert '--no-sync' in cmd
+        self.assertEqual(cmd[cmd.index('--bundle-add') + 1],
+                         '/tmp/fragment.yaml')
+        assert '--bundle-remove' not in cmd
+
+    def test_selected_addons(self):
+        "fleet.test_selected_addons"
+        # as set by an alias such as canonical-kubernetes-helm
+        self.mock_app.selected_addons = ['helm', 'prometheus']
+        self.mock_app.conjurefile['selected-addons'] = None
+        target = fleet.FleetTarget.parse('localhost')
+        assert 'selected-addons' not in target.conjurefile()
+        cmd = target.command(target.cache_dir / 'Conjurefile')
+        self.assertEqual(cmd[-5:-1], ['--addon', 'helm',
+                                      '--addon', 'prometheus'])
+
+    def test_prefetch_bundle(self):
+        "fleet.test_prefetch_bundle"
+        spell_dir = Path(self.tmpdir.name) / 'kubernetes-core'
+        spell_dir.mkdir()
+        self.mock_app.config['spell-dir'] = str(spell_dir)
+        self.mock_app.conjurefile['channel'] = 'stable'
+        self.mock_app.metadata.spell_type = spell_types.JUJU
+        self.mock_app.metadata.bundle_name = 'kubernetes-core'
+        targets = [fleet.FleetTarget.parse('aws/us-east-1'),
+                   fleet.FleetTarget.parse('aws/eu-west-1')]
+        bundle = {'applications': {'easyrsa': {'charm': 'cs:easyrsa-1'}}}
+        with patch.object(fleet.charm, 'get_bundle',
+                          return_value=bundle) as mock_get_bundle:
+            # targets on different channels fetch their own
+            targets[1].overrides['channel'] = 'edge'
+            fleet.prefetch_bundle(targets)
+            assert not mock_get_bundle.called
+
+            del targets[1].overrides['channel']
+            fleet.prefetch_bundle(targets)
+            fleet.prefetch_bundle(targets)
+        mock_get_bundle.assert_called_once_with('kubernetes-core', 'stable')
+        self.assertEqual(yamlio.load_file(spell_dir / 'bundle.yaml',
+                                          mutable=True), bundle)
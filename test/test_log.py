@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+#
+# tests log.py
+#
+# Copyright Canonical, Ltd.
+
+
+import json
+import logging
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from conjureup import log
+
+
+class SetupLoggingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.logfile = Path(self.tmpdir.name) / 'conjure-up.log'
+        self.app = MagicMock()
+        self.app.config = {'spell': 'kubernetes-core'}
+        self.root_logger = logging.getLogger()
+        self.saved = (logging.getLogRecordFactory(),
+                      self.root_logger.handlers[:],
+                      self.root_logger.level,
+                      logging.getLogger('conjure-up').level)
+        # syslog is left out
+        self.exists_patcher = patch.object(log.os.path, 'exists',
+                                           return_value=False)
+        self.exists_patcher.start()
+
+    def tearDown(self):
+        self.exists_patcher.stop()
+        log._stop_listener()
+        log.set_context(phase=None)
+        factory, handlers, root_level, app_level = self.saved
+        logging.setLogRecordFactory(factory)
+        self.root_logger.handlers = handlers
+        self.root_logger.setLevel(root_level)
+        logging.getLogger('conjure-up').setLevel(app_level)
+        self.tmpdir.cleanup()
+
+    def flush(self):
+        # the listener writes everything queued before it stops
+        log._stop_listener()
+        return self.logfile.read_text().splitlines()
+
+    def test_text(self):
+        "log.test_text"
+        app_log = log.setup_logging(self.app, str(self.logfile), False)
+        app_log.debug('Deploying %s', 'kubernetes-master')
+        logging.getLogger('websockets').debug('frame')
+        logging.getLogger('websockets').info('connected')
+        lines = self.flush()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('[DEBUG] conjure-up/kubernetes-core - ', lines[0])
+        self.assertIn('Deploying kubernetes-master', lines[0])
+        self.assertIn('websockets: ', lines[1])
+
+    def test_written_by_listener(self):
+        "log.test_written_by_listener"
+        app_log = log.setup_logging(self.app, str(self.logfile))
+        threads = []
+        handler = log._listener.handlers[0]
+        with patch.object(handler, 'emit',
+                          side_effect=lambda record: threads.append(
+                              threading.current_thread())):
+            app_log.info('Bootstrapping')
+            self.flush()
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.current_thread())
+
+    def test_json(self):
+        "log.test_json"
+        app_log = log.setup_logging(self.app, str(self.logfile),
+                                    level='info', fmt='json')
+        app_log.debug('dropped')
+        log.set_context(phase='bootstrap')
+        app_log.info('Bootstrapping %s', 'c1')
+        log.set_context(phase='deploy')
+        try:
+            raise ValueError('unreachable')
+        except ValueError:
+            app_log.exception('Deploy failed')
+        entries = [json.loads(line) for line in self.flush()]
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]['message'], 'Bootstrapping c1')
+        self.assertEqual(entries[0]['level'], 'INFO')
+        self.assertEqual(entries[0]['name'], 'conjure-up/kubernetes-core')
+        self.assertEqual(entries[0]['phase'], 'bootstrap')
+        self.assertEqual(entries[1]['phase'], 'deploy')
+        self.assertIn('ValueError: unreachable', entries[1]['exception'])
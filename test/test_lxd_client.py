@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+#
+# tests models/provider.py LXDClient
+#
+# Copyright Canonical, Ltd.
+
+
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import websockets
+
+from conjureup.models import provider
+from conjureup.models.provider import LXDAPIError, LXDClient
+
+from .helpers import test_loop
+
+
+class LXDClientTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = Path(self.tmpdir.name) / 'unix.socket'
+        self.connections = 0
+        self.requests = []
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            while (await reader.readline()) != b'\r\n':
+                pass
+            method, url, _ = request_line.decode().split()
+            self.requests.append((method, url))
+            if url == '/1.0/missing':
+                body = {'type': 'error', 'error': 'not found',
+                        'error_code': 404}
+            else:
+                body = {'type': 'sync', 'metadata': [{'name': 'lxdbr0'}]}
+            data = json.dumps(body).encode()
+            if url.endswith('recursion=1'):
+                writer.write(b'HTTP/1.1 200 OK\r\n'
+                             b'Transfer-Encoding: chunked\r\n\r\n' +
+                             b'%x\r\n' % len(data) + data + b'\r\n0\r\n\r\n')
+            else:
+                writer.write(b'HTTP/1.1 200 OK\r\n'
+                             b'Content-Length: %d\r\n\r\n' % len(data) + data)
+            await writer.drain()
+        writer.close()
+
+    def test_query_reuses_connection(self):
+        "lxdclient.test_query_reuses_connection"
+        with test_loop() as loop:
+            server = loop.run_until_complete(
+                asyncio.start_unix_server(self._serve,
+                                          path=str(self.socket_path)))
+            client = LXDClient(self.socket_path)
+            try:
+                for url in ['/1.0/networks?recursion=1', '/1.0/networks']:
+                    self.assertEqual(
+                        loop.run_until_complete(client.query(url)),
+                        [{'name': 'lxdbr0'}])
+                with self.assertRaises(LXDAPIError):
+                    loop.run_until_complete(client.query('/1.0/missing'))
+            finally:
+                client.close()
+                server.close()
+                loop.run_until_complete(server.wait_closed())
+
+        self.assertEqual(self.connections, 1)
+        self.assertEqual([url for _, url in self.requests],
+                         ['/1.0/networks?recursion=1',
+                          '/1.0/networks',
+                          '/1.0/missing'])
+
+    def _lifecycle(self, action):
+        return json.dumps({'type': 'lifecycle',
+                           'metadata': {'action': action}})
+
+    def _serve_events(self, loop, *events):
+        async def events_handler(ws, path):
+            self.requests.append(('GET', path))
+            for event in events:
+                await ws.send(event)
+            await ws.wait_closed()
+
+        return loop.run_until_complete(
+            websockets.unix_serve(events_handler,
+                                  path=str(self.socket_path)))
+
+    def test_wait_for_event(self):
+        "lxdclient.test_wait_for_event"
+        with test_loop() as loop:
+            server = self._serve_events(
+                loop,
+                self._lifecycle('container-started'),
+                'not json',
+                self._lifecycle('network-updated'))
+            client = LXDClient(self.socket_path)
+            try:
+                loop.run_until_complete(asyncio.wait_for(
+                    client.wait_for_event(30, actions=['network-']), 5))
+            finally:
+                server.close()
+                loop.run_until_complete(server.wait_closed())
+
+        self.assertEqual(self.requests,
+                         [('GET', '/1.0/events?type=lifecycle')])
+
+    def test_wait_for_event_ignores_other_actions(self):
+        "lxdclient.test_wait_for_event_ignores_other_actions"
+        with test_loop() as loop:
+            server = self._serve_events(
+                loop, self._lifecycle('container-started'))
+            client = LXDClient(self.socket_path)
+            try:
+                start = loop.time()
+                loop.run_until_complete(
+                    client.wait_for_event(0.3, actions=['network-']))
+                self.assertGreaterEqual(loop.time() - start, 0.3)
+            finally:
+                server.close()
+                loop.run_until_complete(server.wait_closed())
+
+    def test_wait_for_event_unreachable(self):
+        "lxdclient.test_wait_for_event_unreachable"
+        client = LXDClient(self.socket_path)
+        with test_loop() as loop:
+            with self.assertRaises(OSError):
+                loop.run_until_complete(client.wait_for_event(30))
+
+
+class LocalhostClientCompatibleTestCase(unittest.TestCase):
+
+    def test_is_client_compatible(self):
+        "lxd_client.test_is_client_compatible"
+        versions = ['2.21', '3.0.3']
+        calls = []
+
+        async def arun(cmd, **kwargs):
+            calls.append(cmd)
+            return 0, versions.pop(0), ''
+
+        localhost = provider.Localhost()
+        localhost.lxc_bin = '/snap/bin/lxc'
+        with test_loop() as loop, patch.object(provider.utils, 'arun', arun):
+            assert not loop.run_until_complete(
+                localhost.is_client_compatible())
+            # lxd was refreshed in the meantime
+            assert loop.run_until_complete(localhost.is_client_compatible())
+            assert loop.run_until_complete(localhost.is_client_compatible())
+        self.assertEqual(calls, [['/snap/bin/lxc', '--version']] * 2)
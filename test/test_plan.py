@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+#
+# tests plan.py
+#
+# Copyright Canonical, Ltd.
+
+
+import subprocess
+import tempfile
+import unittest
+from collections import defaultdict
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import yaml
+
+from conjureup import juju, plan
+from conjureup.bundle import Bundle
+from conjureup.consts import spell_types
+from conjureup.controllers.juju.regions import common as regions
+from conjureup.models.step import StepModel
+
+
+class PlanTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tests_dir = Path(__file__).absolute().parent
+        self.bundle_dir = self.tests_dir / 'bundle'
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _step(self, name, phases, whitelist=None):
+        step_path = Path(self.tmpdir.name) / name
+        step_path.mkdir()
+        for phase in phases:
+            (step_path / phase).write_text('#!/bin/sh\n')
+        return StepModel({'title': name,
+                          'cloud-whitelist': whitelist or []},
+                         name, step_path, 'spell')
+
+    def test_application_plan(self):
+        "plan.test_application_plan"
+        bundle = Bundle(yaml.safe_load(
+            (self.bundle_dir / 'ghost-bundle.yaml').read_text()))
+        applications, machines = plan.application_plan(bundle)
+        self.assertEqual(list(applications), ['ghost', 'haproxy', 'mysql'])
+        self.assertEqual(applications['mysql'],
+                         {'charm': 'cs:xenial/mysql-58', 'units': 1})
+        self.assertEqual(machines, 3)
+
+        bundle = Bundle(yaml.safe_load(
+            (self.bundle_dir / 'openstack-base-bundle.yaml').read_text()))
+        applications, machines = plan.application_plan(bundle)
+        self.assertEqual(machines, len(bundle.machines))
+
+    def test_step_plan(self):
+        "plan.test_step_plan"
+        steps = [self._step('00_deploy-done', ['after-deploy']),
+                 self._step('01_lxd', ['before-config', 'after-deploy'],
+                            whitelist=['localhost']),
+                 self._step('02_input', ['validate-input', 'after-deploy'])]
+        planned, phases = plan.step_plan(steps, 'ec2')
+        self.assertEqual([s['skipped'] for s in planned],
+                         [False, True, False])
+        self.assertEqual(list(phases.items()), [
+            ('validate-input', ['02_input']),
+            ('after-deploy', ['00_deploy-done', '02_input']),
+        ])
+
+    def test_bootstrap_plan(self):
+        "plan.test_bootstrap_plan"
+        mock_app = MagicMock()
+        mock_app.provider.cloud = 'localhost'
+        mock_app.provider.cloud_type = 'localhost'
+        mock_app.provider.region = None
+        mock_app.provider.credential = None
+        mock_app.provider.model_defaults = None
+        mock_app.juju.bin_path = 'juju'
+        mock_app.metadata.spell_type = spell_types.JUJU
+        mock_app.conjurefile = defaultdict(lambda: None, controller='c1',
+                                           model='m1')
+        controllers = b'controllers:\n  c2:\n    cloud: aws\n'
+        with patch.object(plan, 'app', mock_app), \
+                patch.object(juju, 'app', mock_app), \
+                patch.object(regions, 'app', mock_app), \
+                patch.object(juju, 'run') as mock_run:
+            mock_run.return_value = subprocess.CompletedProcess(
+                [], 0, controllers, b'')
+            bootstrap = plan.bootstrap_plan()
+        self.assertEqual(bootstrap['controller'], 'c1')
+        assert not bootstrap['existing-controller']
+        self.assertEqual(bootstrap['bootstrap'][:4],
+                         ['juju', 'bootstrap', 'localhost', 'c1'])
+        # the controllers are only listed once
+        self.assertEqual(mock_run.call_count, 1)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+#
+# tests registry.py
+#
+# Copyright Canonical, Ltd.
+
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from conjureup import registry
+from conjureup.consts import PHASES
+from conjureup.models.step import StepModel
+
+COMMIT = 'a' * 40
+NEW_COMMIT = 'b' * 40
+
+
+class RegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app_patcher = patch.object(registry, 'app')
+        self.app_patcher.start()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.spells_dir = Path(self.tmpdir.name)
+        git_dir = self.spells_dir / '.git'
+        (git_dir / 'refs' / 'heads').mkdir(parents=True)
+        (git_dir / 'HEAD').write_text('ref: refs/heads/master\n')
+        (git_dir / 'refs' / 'heads' / 'master').write_text(COMMIT + '\n')
+
+        (self.spells_dir / 'spells-index.yaml').write_text(
+            'kubernetes:\n'
+            '  spells:\n'
+            '  - {key: kubernetes-core, name: Kubernetes Core}\n'
+            '  - {key: broken, name: Broken}\n')
+        (self.spells_dir / 'addons-aliases.yaml').write_text(
+            'kubeflow: {spell: kubernetes-core, addons: [kubeflow]}\n')
+        spell_dir = self.spells_dir / 'kubernetes-core'
+        self._write(spell_dir / 'metadata.yaml',
+                    'friendly-name: Kubernetes Core\n'
+                    'cloud-whitelist: [aws]\n')
+        self._write(spell_dir / 'steps' / '00_deploy' / 'metadata.yaml',
+                    'title: Deploy\n')
+        self._write(spell_dir / 'steps' / '00_deploy' / 'before-config',
+                    '#!/bin/sh\n')
+        (spell_dir / 'steps' / '00_deploy' / 'before-config').chmod(0o755)
+        self._write(spell_dir / 'steps' / '00_deploy' / 'after-deploy',
+                    '#!/bin/sh\n')
+        addon_dir = spell_dir / 'addons' / 'kubeflow'
+        self._write(addon_dir / 'metadata.yaml', 'friendly-name: Kubeflow\n')
+        self._write(addon_dir / 'bundle.yaml', 'applications: {}\n')
+
+    def tearDown(self):
+        self.app_patcher.stop()
+        self.tmpdir.cleanup()
+
+    def _write(self, path, text):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+    def test_registry_commit(self):
+        "registry.test_registry_commit"
+        self.assertEqual(registry.registry_commit(self.spells_dir), COMMIT)
+
+        ref = self.spells_dir / '.git' / 'refs' / 'heads' / 'master'
+        ref.unlink()
+        (self.spells_dir / '.git' / 'packed-refs').write_text(
+            '# pack-refs with: peeled\n'
+            '{} refs/heads/master\n'.format(NEW_COMMIT))
+        self.assertEqual(registry.registry_commit(self.spells_dir),
+                         NEW_COMMIT)
+
+        self.assertIsNone(registry.registry_commit(self.spells_dir / 'nope'))
+
+    def test_load_index(self):
+        "registry.test_load_index"
+        index = registry.load_index(self.spells_dir)
+        self.assertEqual(index.commit, COMMIT)
+        self.assertEqual(index.addons_aliases['kubeflow']['spell'],
+                         'kubernetes-core')
+        self.assertEqual(index.clouds['kubernetes-core'],
+                         {'cloud-whitelist': ['aws']})
+        # spells without metadata are left to be read from disk
+        self.assertNotIn('broken', index)
+
+        spell = index.spell('kubernetes-core')
+        self.assertEqual(spell['metadata']['friendly-name'],
+                         'Kubernetes Core')
+        self.assertEqual(spell['steps'], [{
+            'name': '00_deploy',
+            'metadata': {'title': 'Deploy'},
+            'phases': {'before-config': True, 'after-deploy': False},
+        }])
+        self.assertEqual(spell['addons']['kubeflow']['bundle'],
+                         {'applications': {}})
+
+    def test_load_index_unchanged_registry(self):
+        "registry.test_load_index_unchanged_registry"
+        registry.load_index(self.spells_dir)
+        with patch('conjureup.registry.yamlio') as mock_yamlio:
+            index = registry.load_index(self.spells_dir)
+            index.spell('kubernetes-core')
+        mock_yamlio.load.assert_not_called()
+
+    def test_load_index_new_commit(self):
+        "registry.test_load_index_new_commit"
+        registry.load_index(self.spells_dir)
+        ref = self.spells_dir / '.git' / 'refs' / 'heads' / 'master'
+        ref.write_text(NEW_COMMIT + '\n')
+        self.assertIsNone(registry.load_index(self.spells_dir,
+                                              compile=False))
+        self.assertEqual(registry.load_index(self.spells_dir).commit,
+                         NEW_COMMIT)
+
+    def test_load_index_local_changes(self):
+        "registry.test_load_index_local_changes"
+        registry.load_index(self.spells_dir)
+        metadata = self.spells_dir / 'kubernetes-core' / 'metadata.yaml'
+        metadata.write_text('friendly-name: Edited\n')
+        self.assertIsNone(registry.load_index(self.spells_dir,
+                                              compile=False))
+        index = registry.load_index(self.spells_dir)
+        self.assertEqual(
+            index.spell('kubernetes-core')['metadata']['friendly-name'],
+            'Edited')
+
+        # other changes to a spell only leave that spell out
+        (self.spells_dir / 'kubernetes-core' / 'README.md').write_text('')
+        index = registry.load_index(self.spells_dir, compile=False)
+        self.assertIn('kubernetes-core', index.clouds)
+        self.assertIsNone(index.spell('kubernetes-core'))
+
+    def test_load_index_walks_used_spells(self):
+        "registry.test_load_index_walks_used_spells"
+        registry.load_index(self.spells_dir)
+        with patch('conjureup.registry.fingerprint',
+                   wraps=registry.fingerprint) as mock_fingerprint:
+            index = registry.load_index(self.spells_dir)
+            mock_fingerprint.assert_not_called()
+            index.spell('kubernetes-core')
+            index.spell('kubernetes-core')
+        mock_fingerprint.assert_called_once_with(
+            self.spells_dir / 'kubernetes-core',
+            exclude=(registry.MANIFEST_FILE,))
+
+    def test_load_index_not_executed(self):
+        "registry.test_load_index_not_executed"
+        # a pickle that would run code if it were unpickled
+        (self.spells_dir / registry.INDEX_FILE).write_bytes(
+            registry._MAGIC + registry._HEADER_LEN.pack(24) +
+            b'cos\nsystem\n(S"false"\ntR.')
+        with patch('os.system') as mock_system:
+            self.assertIsNone(registry.load_index(self.spells_dir,
+                                                  compile=False))
+        mock_system.assert_not_called()
+
+    def test_manifest(self):
+        "registry.test_manifest"
+        spell_dir = self.spells_dir / 'kubernetes-core'
+        registry.write_manifest(spell_dir)
+        compiled = registry.read_manifest(spell_dir)
+        self.assertEqual(compiled, registry.compile_spell(spell_dir))
+
+        # local edits to the spell are not hidden by its manifest
+        step_dir = spell_dir / 'steps' / '00_deploy'
+        (step_dir / 'after-deploy').chmod(0o755)
+        self.assertIsNone(registry.read_manifest(spell_dir))
+        registry.write_manifest(spell_dir)
+        self.assertTrue(registry.read_manifest(spell_dir)['steps'][0][
+            'phases']['after-deploy'])
+
+        # spells that fail to compile are left without a manifest
+        (spell_dir / 'metadata.yaml').write_text('{')
+        registry.write_manifest(spell_dir)
+        self.assertIsNone(registry.read_manifest(spell_dir))
+
+    def test_step_from_manifest(self):
+        "registry.test_step_from_manifest"
+        step_dir = self.spells_dir / 'kubernetes-core' / 'steps' / '00_deploy'
+        manifest = registry.compile_step(step_dir)
+        with patch('conjureup.models.step.app') as mock_app, \
+                patch('conjureup.registry.os') as mock_os:
+            mock_app.steps_data = {}
+            mock_app.conjurefile.step.return_value = None
+            mock_app.state = MagicMock()
+            step = StepModel.load(step_dir, 'spell', manifest=manifest)
+            self.assertTrue(step.has_before_config)
+            self.assertTrue(step.has_after_deploy)
+            self.assertFalse(step.has_before_wait)
+        mock_os.access.assert_not_called()
+        self.assertEqual(step.phases, {PHASES.BEFORE_CONFIG: True,
+                                       PHASES.AFTER_DEPLOY: False})
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+#
+# tests snapcache.py
+#
+# Copyright Canonical, Ltd.
+
+
+import base64
+import hashlib
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from conjureup import snapcache
+
+SNAP_INFO = """name:      hello
+summary:   GNU Hello, the "hello world" snap
+publisher: Canonical*
+license:   GPL-3.0
+channels:
+  latest/stable:    2.10      2017-05-17 (38) 65kB -
+  latest/candidate: ↑
+  latest/beta:      2.10.1    2017-05-17 (29) 65kB -
+  latest/edge:      --
+"""
+
+
+def _make_entry(root, name, channel, revision, content=b'snap'):
+    entry = root / 'snaps' / name / channel / revision
+    entry.mkdir(parents=True)
+    (entry / '{}_{}.snap'.format(name, revision)).write_bytes(content)
+    digest = base64.urlsafe_b64encode(
+        hashlib.sha3_384(content).digest()).decode().rstrip('=')
+    (entry / '{}_{}.assert'.format(name, revision)).write_text(
+        'type: snap-revision\nsnap-sha3-384: {}\n'.format(digest))
+    return entry
+
+
+class SnapCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name)
+        self.cache = snapcache.SnapCache(self.root)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_parse_channel_revisions(self):
+        "snapcache.test_parse_channel_revisions"
+        self.assertEqual(snapcache.parse_channel_revisions(SNAP_INFO), {
+            'latest/stable': '38',
+            'latest/candidate': '38',
+            'latest/beta': '29',
+        })
+
+    def test_verify_snap(self):
+        "snapcache.test_verify_snap"
+        entry = _make_entry(self.root, 'hello', 'latest_stable', '38')
+        snap = entry / 'hello_38.snap'
+        assertion = entry / 'hello_38.assert'
+        assert snapcache.verify_snap(snap, assertion)
+        snap.write_bytes(b'tampered')
+        assert not snapcache.verify_snap(snap, assertion)
+
+    def test_entry_lookup(self):
+        "snapcache.test_entry_lookup"
+        _make_entry(self.root, 'hello', 'latest_stable', '38')
+        entry = self.cache.entry('hello', 'stable', '38')
+        assert entry.is_valid()
+        assert self.cache.entry('hello', 'stable', '39') is None
+        self.assertEqual(self.cache.latest('hello', 'stable').revision, '38')
+
+    @patch.object(snapcache, 'app')
+    def test_prune(self, app):
+        "snapcache.test_prune"
+        old = _make_entry(self.root, 'hello', 'latest_stable', '30')
+        kept = _make_entry(self.root, 'hello', 'latest_stable', '31')
+        new = _make_entry(self.root, 'hello', 'latest_stable', '38')
+        stale = time.time() - 60 * 24 * 60 * 60
+        os.utime(str(old), (stale, stale))
+        os.utime(str(kept), (stale, stale))
+
+        self.cache.prune(max_age=30, keep=[kept])
+        assert not old.exists()
+        assert kept.exists()
+        assert new.exists()
+
+        self.cache.prune(max_size=0)
+        assert not kept.exists()
+        assert not new.exists()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+# tests spellsearch.py
+#
+# Copyright Canonical, Ltd.
+
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import ANY, patch
+
+from conjureup import spellsearch
+from conjureup.spellsearch import SpellSearchIndex
+
+SPELLS_INDEX = {
+    'kubernetes': {'spells': [
+        {'key': 'canonical-kubernetes', 'name': 'Canonical Kubernetes',
+         'description': 'The full Kubernetes stack'},
+        {'key': 'kubernetes-core', 'name': 'Kubernetes Core',
+         'description': 'A minimal Kubernetes cluster'},
+    ]},
+    '_unassigned_spells': {'spells': [
+        {'key': 'hadoop-spark', 'name': 'Hadoop with Spark',
+         'description': 'Big data processing'},
+    ]},
+}
+ADDONS_ALIASES = {'cdk': {'spell': 'canonical-kubernetes', 'addons': []}}
+
+
+class SpellSearchIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SpellSearchIndex.build(SPELLS_INDEX, ADDONS_ALIASES)
+
+    def test_search_prefix(self):
+        "spellsearch.test_search_prefix"
+        self.assertEqual(self.index.search('kube'),
+                         ['canonical-kubernetes', 'kubernetes-core'])
+        self.assertEqual(self.index.search('kube core'),
+                         ['kubernetes-core'])
+        self.assertEqual(self.index.search('cdk'), ['canonical-kubernetes'])
+
+    def test_search_fuzzy(self):
+        "spellsearch.test_search_fuzzy"
+        self.assertEqual(self.index.search('hadop'), ['hadoop-spark'])
+        self.assertEqual(self.index.search('xyzzy'), [])
+
+    def test_search_empty(self):
+        "spellsearch.test_search_empty"
+        self.assertEqual(self.index.search(' '),
+                         ['canonical-kubernetes', 'kubernetes-core',
+                          'hadoop-spark'])
+
+    def test_unassigned_category_not_indexed(self):
+        "spellsearch.test_unassigned_category_not_indexed"
+        self.assertEqual(self.index.search('unassigned'), [])
+        self.assertEqual(list(self.index.categories),
+                         ['kubernetes', '_unassigned_spells'])
+
+    def test_load_index_persists(self):
+        "spellsearch.test_load_index_persists"
+        with tempfile.TemporaryDirectory() as spells_dir:
+            (Path(spells_dir) / 'spells-index.yaml').write_text('{}')
+            index = spellsearch.load_index(spells_dir, SPELLS_INDEX,
+                                           ADDONS_ALIASES)
+            self.assertTrue(
+                (Path(spells_dir) / spellsearch.INDEX_FILE).exists())
+
+            with patch.object(SpellSearchIndex, 'build') as build:
+                loaded = spellsearch.load_index(spells_dir, SPELLS_INDEX,
+                                                ADDONS_ALIASES)
+            build.assert_not_called()
+            self.assertEqual(loaded.search('kube'), index.search('kube'))
+
+            # a registry sync changes the source files
+            (Path(spells_dir) / 'spells-index.yaml').write_text('{} ')
+            with patch.object(SpellSearchIndex, 'build') as build:
+                spellsearch.load_index(spells_dir, SPELLS_INDEX,
+                                       ADDONS_ALIASES)
+            build.assert_called_once_with(SPELLS_INDEX, ADDONS_ALIASES,
+                                          ANY, None)
+
+    def test_save_concurrently(self):
+        "spellsearch.test_save_concurrently"
+        with tempfile.TemporaryDirectory() as spells_dir:
+            path = Path(spells_dir) / spellsearch.INDEX_FILE
+            # another run half way through saving its copy
+            other = open(str(path) + '.tmp', 'w')
+            other.write('{"version"')
+            self.index.save(path)
+            other.write(': 1}')
+            other.close()
+            loaded = SpellSearchIndex.load(path)
+            self.assertEqual(loaded.search('kube'), self.index.search('kube'))
+            self.assertEqual(sorted(p.name for p in Path(spells_dir).iterdir()),
+                             [spellsearch.INDEX_FILE,
+                              spellsearch.INDEX_FILE + '.tmp'])
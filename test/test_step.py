@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+#
+# tests models/step.py
+#
+# Copyright Canonical, Ltd.
+
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from conjureup.consts import PHASES, spell_types
+from conjureup.models import step
+from conjureup.models.step import StepModel
+
+from .helpers import AsyncMock, test_loop
+
+
+class StepModelEnvTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app_patcher = patch.object(step, 'app')
+        self.mock_app = self.app_patcher.start()
+        self.mock_app.env = {'PATH': '/usr/bin', 'JUJU_MODEL': 'stale',
+                             'CONJURE_UP_SPELL': 'spell', 'UNSET': None}
+        self.mock_app.conjurefile = {'spells-dir': '/spells'}
+        self.mock_app.session_id = 'session'
+        self.mock_app.metadata.spell_type = spell_types.JUJU
+        self.mock_app.provider.cloud = 'localhost'
+        self.mock_app.provider.credential = None
+        self.mock_app.provider.controller = 'c1'
+        self.mock_app.provider.model = 'm1'
+        self.mock_app.provider.region = None
+        self.mock_app.steps_data = {'00_step': {'cidr': '10.0.0.0/24',
+                                                'nodes': 3}}
+        self.juju_patcher = patch.object(step, 'juju')
+        mock_juju = self.juju_patcher.start()
+        mock_juju.get_cloud_types_by_name.return_value = {
+            'localhost': 'localhost'}
+        self.step = StepModel({}, '00_step', Path('/steps/00_step'),
+                              'spell', {'before-deploy': True})
+
+    def tearDown(self):
+        self.juju_patcher.stop()
+        self.app_patcher.stop()
+
+    def test_phase_env(self):
+        "models.step.test_phase_env"
+        env = self.step.phase_env(PHASES.BEFORE_DEPLOY)
+        self.assertEqual(env['CONJURE_UP_STEP'], '00_step')
+        self.assertEqual(env['CONJURE_UP_PHASE'], 'before-deploy')
+        self.assertEqual(env['JUJU_MODEL'], 'm1')
+        self.assertEqual(env['JUJU_CREDENTIAL'], '')
+        self.assertEqual(env['NODES'], '3')
+        self.assertEqual(env['PATH'], '/usr/bin')
+        self.assertEqual(env['UNSET'], '')
+        with self.assertRaises(TypeError):
+            env['PATH'] = '/bin'
+        # the global environment is left as it was
+        self.assertEqual(self.mock_app.env['JUJU_MODEL'], 'stale')
+        assert 'CONJURE_UP_STEP' not in self.mock_app.env
+
+        self.mock_app.steps_data['00_step']['juju_model'] = 'override'
+        env = self.step.phase_env(PHASES.AFTER_DEPLOY)
+        self.assertEqual(env['CONJURE_UP_PHASE'], 'after-deploy')
+        self.assertEqual(env['JUJU_MODEL'], 'override')
+
+    def test_run(self):
+        "models.step.test_run"
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                test_loop() as loop, \
+                patch.object(step, 'checkpoint') as mock_checkpoint, \
+                patch.object(step, 'is_linux', return_value=False), \
+                patch.object(step, 'arun', AsyncMock()) as mock_arun:
+            mock_checkpoint.resumed.return_value = None
+            mock_arun.return_value = (0, '', '')
+            self.mock_app.state = {}
+            self.mock_app.config = {'spell': 'spell'}
+            self.step.step_path = Path(tmpdir) / '00_step'
+            self.step.step_path.mkdir()
+            loop.run_until_complete(self.step.run(PHASES.BEFORE_DEPLOY,
+                                                  MagicMock()))
+
+            stored = self.step.step_path / 'before-deploy.env'
+            self.assertNotIn('PATH=', stored.read_text())
+            self.assertIn('JUJU_MODEL="m1" ', stored.read_text())
+            env = mock_arun.call_args[1]['env']
+            self.assertEqual(env['CONJURE_UP_STEP'], '00_step')
+        assert 'CONJURE_UP_STEP' not in self.mock_app.env
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+#
+# tests tail.py
+#
+# Copyright Canonical, Ltd.
+
+
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from conjureup import tail
+
+from .helpers import test_loop
+
+
+class FollowerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / 'bootstrap.err'
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def append(self, data):
+        with self.path.open('ab') as fp:
+            fp.write(data)
+
+    def test_poll(self):
+        "tail.test_poll"
+        follower = tail.Follower(self.path, lines=3)
+        assert not follower.poll()
+        self.assertEqual(follower.lines, [])
+
+        self.append(b'one\ntwo\nthr')
+        assert follower.poll()
+        self.assertEqual(follower.lines, ['one', 'two', 'thr'])
+        assert not follower.poll()
+
+        self.append(b'ee\nfour\n')
+        assert follower.poll()
+        self.assertEqual(follower.lines, ['two', 'three', 'four'])
+
+        # truncated files are read again from the start
+        self.path.write_bytes(b'five\n')
+        assert follower.poll()
+        self.assertEqual(follower.lines, ['five'])
+
+    def test_poll_skips_ahead(self):
+        "tail.test_poll_skips_ahead"
+        follower = tail.Follower(self.path, lines=2)
+        self.append(b'x' * tail.MAX_READ + b'\nlast but one\nlast\n')
+        with patch('builtins.open', wraps=open) as mock_open:
+            assert follower.poll()
+        self.assertEqual(follower.lines, ['last but one', 'last'])
+        self.assertEqual(mock_open.call_count, 1)
+
+    def _follow(self, inotify):
+        callback = MagicMock()
+        with test_loop() as loop, \
+                patch.object(tail, '_inotify_watch',
+                             wraps=tail._inotify_watch) as mock_watch:
+            if not inotify:
+                mock_watch.side_effect = lambda path: None
+            follower = tail.Follower(self.path, callback=callback,
+                                     interval=0.01).start(loop)
+            loop.run_until_complete(asyncio.sleep(0.05))
+            assert not callback.called
+
+            self.append(b'Running machine configuration script...\n')
+            loop.run_until_complete(asyncio.sleep(0.05))
+            callback.assert_called_once_with(
+                ['Running machine configuration script...'])
+            follower.stop()
+
+    def test_follow(self):
+        "tail.test_follow"
+        fd = tail._inotify_watch(self.path)
+        if fd is None:
+            raise unittest.SkipTest('inotify is not available')
+        os.close(fd)
+        self._follow(inotify=True)
+
+    def test_follow_polling(self):
+        "tail.test_follow_polling"
+        self._follow(inotify=False)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+#
+# tests telemetry.py
+#
+# Copyright Canonical, Ltd.
+
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from conjureup import telemetry
+
+
+class TelemetryQueueTestCase(unittest.TestCase):
+
+    @patch.object(telemetry, 'app')
+    def test_batched_hits(self, app):
+        "telemetry.test_batched_hits"
+        queue = telemetry.TelemetryQueue(batch_size=2)
+        queue._session = MagicMock()
+        with queue._cond:
+            # hold the lock so all hits are queued before the first send
+            for i in range(3):
+                queue.put('hit', {'ea': i})
+        queue.flush(30)
+
+        calls = queue._session.post.call_args_list
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[0][0][0], telemetry.GA_BATCH_URL)
+        self.assertEqual(calls[0][1]['data'], 'ea=0\nea=1')
+        self.assertEqual(calls[1][0][0], telemetry.GA_COLLECT_URL)
+        self.assertEqual(calls[1][1]['data'], {'ea': 2})
+
+    @patch.object(telemetry, 'app')
+    def test_drop_oldest(self, app):
+        "telemetry.test_drop_oldest"
+        queue = telemetry.TelemetryQueue(max_queued=2)
+        queue._session = MagicMock()
+        reports = []
+        with queue._cond:
+            for i in range(3):
+                queue.put('report', lambda i=i: reports.append(i))
+        queue.flush(30)
+
+        self.assertEqual(reports, [1, 2])
+        self.assertEqual(queue.dropped, 1)
+        # nothing is accepted once flushed
+        queue.put('report', lambda: reports.append(3))
+        self.assertEqual(len(queue._items), 0)
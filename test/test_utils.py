@@ -5,14 +5,14 @@
 # Copyright Canonical, Ltd.
 
 
-import asyncio
 import logging
+import threading
 import unittest
 from unittest.mock import patch
 
-from conjureup import utils
+from pkg_resources import parse_version
 
-from .helpers import test_loop
+from conjureup import utils
 
 
 class UtilsTestCase(unittest.TestCase):
@@ -45,14 +45,12 @@ class UtilsTestCase(unittest.TestCase):
     @patch.object(utils, 'juju_version')
     @patch.object(utils, 'app')
     def test_sentry_report(self, app, juju_version):
-        # test task schedule
-        flag = asyncio.Event()
+        # test report is sent from the telemetry queue
+        flag = threading.Event()
         with patch.object(utils, '_sentry_report',
                           lambda *a, **kw: flag.set()):
-            with test_loop() as loop:
-                app.loop = loop
-                utils.sentry_report('m')
-                loop.run_until_complete(asyncio.wait_for(flag.wait(), 30))
+            utils.sentry_report('m')
+            assert flag.wait(30)
 
         # test implementation
         app.config = {'spell': 'spell'}
@@ -114,3 +112,36 @@ class UtilsTestCase(unittest.TestCase):
         # sub-key delete
         self.assertEqual(utils.subtract_dicts(d, {'foo': {'baz': None}}),
                          {'foo': {'bar': 1}, 'qux': [1, 2]})
+
+    def test_parse_juju_version(self):
+        self.assertEqual(utils._parse_juju_version('2.8.1-focal-amd64\n'),
+                         parse_version('2.8.1'))
+        self.assertEqual(utils._parse_juju_version('2.9-rc3-focal-amd64'),
+                         parse_version('2.9rc3'))
+        self.assertEqual(utils._parse_juju_version('2.8.2'),
+                         parse_version('2.8.2'))
+
+    @patch.object(utils, '_detect_juju_version')
+    def test_juju_supports(self, _detect_juju_version):
+        _detect_juju_version.return_value = parse_version('2.4.7')
+        assert not utils.juju_supports('list-clouds-local')
+        _detect_juju_version.return_value = parse_version('2.8.1')
+        assert utils.juju_supports('list-clouds-local')
+
+    def test_get_network_interfaces(self):
+        interfaces = utils.get_network_interfaces(refresh=True)
+        self.assertEqual(interfaces['lo'].ipv4, '127.0.0.1')
+        assert not interfaces['lo'].physical
+        assert utils.get_network_interface('lo') is interfaces['lo']
+        assert utils.get_network_interface('no-such-iface') is None
+
+    def test_get_network_interface_without_address(self):
+        bridge = utils.NetworkInterface(name='lxdbr0', physical=False,
+                                        ipv4=None)
+        addressed = bridge._replace(ipv4='10.0.8.1')
+        with patch.object(utils, '_enumerate_network_interfaces') as enum:
+            enum.side_effect = [{'lxdbr0': bridge}, {'lxdbr0': addressed}]
+            # cached before LXD gave the bridge its address
+            self.assertEqual(utils.get_network_interface('lxdbr0').ipv4,
+                             '10.0.8.1')
+        self.assertEqual(enum.cache_clear.call_count, 1)
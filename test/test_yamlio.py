@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+#
+# tests yamlio.py
+#
+# Copyright Canonical, Ltd.
+
+
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from conjureup import yamlio
+from conjureup.bundle import Bundle
+
+
+class YamlioTestCase(unittest.TestCase):
+
+    def setUp(self):
+        yamlio.clear_cache()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / 'doc.yaml'
+        self.path.write_text('a: {b: [1, 2]}\n')
+
+    def tearDown(self):
+        yamlio.clear_cache()
+        self.tmpdir.cleanup()
+
+    def test_load_file_cached(self):
+        "yamlio.test_load_file_cached"
+        first = yamlio.load_file(self.path)
+        with patch.object(yamlio, 'load') as mock_load:
+            second = yamlio.load_file(str(self.path))
+        mock_load.assert_not_called()
+        self.assertIs(first, second)
+
+        # a rewritten file is parsed again
+        self.path.write_text('a: {b: [1, 2, 3]}\n')
+        st = self.path.stat()
+        os.utime(str(self.path), ns=(st.st_atime_ns,
+                                     st.st_mtime_ns + 1000000000))
+        self.assertEqual(yamlio.load_file(self.path)['a']['b'], (1, 2, 3))
+
+    def test_load_file_frozen(self):
+        "yamlio.test_load_file_frozen"
+        doc = yamlio.load_file(self.path)
+        with self.assertRaises(TypeError):
+            doc['c'] = 1
+        self.assertEqual(doc['a']['b'], (1, 2))
+
+        copy = yamlio.load_file(self.path, mutable=True)
+        copy['a']['b'].append(3)
+        self.assertEqual(copy, {'a': {'b': [1, 2, 3]}})
+        self.assertEqual(yamlio.load_file(self.path)['a']['b'], (1, 2))
+
+    def test_dump(self):
+        "yamlio.test_dump"
+        frozen = yamlio.freeze({'a': {'b': [1, 2]}})
+        self.assertEqual(yamlio.load(yamlio.dump(frozen)),
+                         {'a': {'b': [1, 2]}})
+        bundle = Bundle({'applications': {'mysql': {'charm': 'mysql'}}})
+        self.assertEqual(yamlio.dump(bundle),
+                         'applications:\n  mysql:\n    charm: mysql\n')
+
+    def test_dump_file(self):
+        "yamlio.test_dump_file"
+        yamlio.dump_file({'a': [1]}, self.path)
+        self.assertEqual(self.path.read_text(), 'a:\n- 1\n')
+        stream = io.StringIO()
+        self.assertIsNone(yamlio.dump({'a': 1}, stream))
+        self.assertEqual(stream.getvalue(), 'a: 1\n')